@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import chess
+import chess.polyglot
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from utilities import get_opening_books
+from book import CompiledReader, compile_book, compiled_file
+
+
+def walk_tree(reader, max_plies: int):
+    """Walk the book tree from the start position - return the number of positions, leaves, moves & max depth."""
+    board = chess.Board()
+    seen = set()
+    stats = {'positions': 0, 'leaves': 0, 'depth': 0, 'moves': 0}
+
+    def walk(ply: int):
+        key = chess.polyglot.zobrist_hash(board)
+        if key in seen:
+            return
+        seen.add(key)
+        moves = {entry.move() for entry in reader.find_all(board)}
+        if not moves or ply == max_plies:
+            stats['leaves'] += 1
+            return
+        stats['positions'] += 1
+        stats['moves'] += len(moves)
+        stats['depth'] = max(stats['depth'], ply + 1)
+        for move in moves:
+            board.push(move)
+            walk(ply + 1)
+            board.pop()
+
+    walk(0)
+    return stats
+
+
+def sample_boards(reader, count: int):
+    """Return random positions along weighted book lines (incl. the first position out of book)."""
+    boards = []
+    while len(boards) < count:
+        board = chess.Board()
+        while len(boards) < count:
+            boards.append(board.copy(stack=False))
+            try:
+                board.push(reader.weighted_choice(board).move())
+            except IndexError:
+                break
+    return boards
+
+
+def probe_rate(reader, boards: list, seconds: float):
+    """Return the weighted choices per second on the given positions."""
+    probes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for board in boards:
+            try:
+                reader.weighted_choice(board)
+            except IndexError:
+                pass
+        probes += len(boards)
+    return probes / (time.perf_counter() - start)
+
+
+def compare_readers(polyglot, compiled, boards: list, rounds=5):
+    """Return (probes, mismatches) of the compiled reader against the polyglot one - with random excluded moves."""
+    probes = mismatches = 0
+    for board in boards:
+        entries = [(entry.raw_move, entry.weight) for entry in polyglot.find_all(board)]
+        probes += 1
+        if entries != [(entry.raw_move, entry.weight) for entry in compiled.find_all(board)]:
+            mismatches += 1
+        moves = [entry.move() for entry in polyglot.find_all(board)]
+        exclude = set(random.sample(moves, random.randint(0, len(moves)))) if random.random() < 0.5 else set()
+        seed = random.random()
+        polyglot_random, compiled_random = random.Random(seed), random.Random(seed)
+        for _ in range(rounds):
+            try:
+                expected = polyglot.weighted_choice(board, exclude, random=polyglot_random).move()
+            except IndexError:
+                expected = None
+            try:
+                chosen = compiled.weighted_choice(board, exclude, random=compiled_random).move()
+            except IndexError:
+                chosen = None
+            probes += 1
+            mismatches += expected != chosen
+    return probes, mismatches
+
+
+def bench_books(files: list, max_plies: int, seconds: float):
+    """Print the coverage and the probe speed of the books."""
+    random.seed(4711)
+    print('{:>18} {:>8} {:>8} {:>9} {:>9} {:>7} {:>6} {:>6} {:>11} {:>11} {:>8}'.format(
+        'book', 'size(kB)', 'entries', 'keys', 'tree', 'leaves', 'depth', 'width', 'polyglot/s', 'compiled/s',
+        'mismatch'))
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for file in files:
+            compiled = compiled_file(file)
+            if not os.path.isfile(compiled) or os.path.getmtime(compiled) < os.path.getmtime(file):
+                compiled = os.path.join(temp_dir, os.path.basename(compiled))
+                compile_book(file, compiled)
+            with chess.polyglot.open_reader(file) as reader, CompiledReader(compiled) as compiled_reader:
+                entries = len(reader)
+                keys = len({entry.key for entry in reader})  # the whole file in one sequential pass
+                stats = walk_tree(reader, max_plies)
+                boards = sample_boards(reader, 200)
+                polyglot_rate = probe_rate(reader, boards, seconds)
+                compiled_rate = probe_rate(compiled_reader, boards, seconds)
+                probes, mismatches = compare_readers(reader, compiled_reader, boards)
+            failed = failed or mismatches > 0
+
+            width = stats['moves'] / stats['positions'] if stats['positions'] else 0
+            print('{:>18} {:>8} {:>8} {:>9} {:>9} {:>7} {:>6} {:>6.2f} {:>11.0f} {:>11.0f} {:>8}'.format(
+                os.path.basename(file), os.path.getsize(file) // 1024, entries, keys, stats['positions'],
+                stats['leaves'], stats['depth'], width, polyglot_rate, compiled_rate,
+                '{}/{}'.format(mismatches, probes)))
+            sys.stdout.flush()
+    return not failed
+
+
+parser = argparse.ArgumentParser(description='coverage statistics & probe speed of the opening books')
+parser.add_argument('books', nargs='*', help='book files (default: all books of books.ini)')
+parser.add_argument('-p', '--plies', type=int, default=40, help='max depth of the book tree walk')
+parser.add_argument('-s', '--seconds', type=float, default=1.0, help='probe time per reader and book')
+args = parser.parse_args()
+
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))  # books.ini has relative paths
+if not bench_books(args.books or [book['file'] for book in get_opening_books() if os.path.isfile(book['file'])],
+                   args.plies, args.seconds):
+    sys.exit('compiled reader differs from the polyglot reader')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from dgt.api import Message
+
+
+def bench_dispatch(rounds=200000):
+    """Compare an isinstance() switch-case chain with the type-indexed handler dict."""
+    names = sorted(name for name in vars(Message) if not name.startswith('_'))
+    classes = [getattr(Message, name) for name in names]
+
+    # build the same "if False: ... elif isinstance()" chain as the old displays had
+    source = ['def chain(message):', '    if False:  # switch-case', '        pass']
+    for index, name in enumerate(names):
+        source.append('    elif isinstance(message, Message.{}):'.format(name))
+        source.append('        return {}'.format(index))
+    source.append('    return None')
+    scope = {'Message': Message}
+    exec('\n'.join(source), scope)
+    chain = scope['chain']
+
+    handlers = {cls: index for index, cls in enumerate(classes)}
+
+    def table(message):
+        return handlers.get(type(message))
+
+    print('{} message types, {} rounds'.format(len(classes), rounds))
+    print('{:>26} {:>12} {:>12}'.format('message', 'chain(ns)', 'dict(ns)'))
+    for cls in (classes[0], classes[len(classes) // 2], classes[-1]):
+        message = cls.__new__(cls)
+        results = []
+        for func in (chain, table):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                func(message)
+            results.append((time.perf_counter() - start) / rounds * 1e9)
+        print('{:>26} {:>12.0f} {:>12.0f}'.format(cls.__name__, results[0], results[1]))
+
+
+bench_dispatch()
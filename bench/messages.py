@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import random
+import time
+
+import chess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import utilities
+from utilities import DisplayMsg
+from dgt.api import Message
+
+
+class NullDisplay(DisplayMsg):
+
+    """Display which only empties its queue."""
+
+    def drain(self):
+        """Remove all messages from the queue."""
+        while not self.msg_queue.empty():
+            self.msg_queue.get()
+
+
+def bench_message_fanout(displays=5, plies=160, rounds=20):
+    """Measure the cost of sending a computer move (with the game) to all displays - deepcopy vs. shared."""
+    devices = [NullDisplay() for _ in range(displays)]
+    random.seed(4711)
+    game = chess.Board()
+    boards = []
+    while len(boards) < plies and not game.is_game_over():
+        game.push(random.choice(list(game.legal_moves)))
+        boards.append(game.copy())
+
+    print('{} displays, {} plies, {} rounds'.format(displays, len(boards), rounds))
+    print('{:>8} {:>14} {:>14}'.format('ply', 'deepcopy(us)', 'shared(us)'))
+    totals = {}
+    for shared in (False, True):
+        utilities.shared_messages = shared
+        totals[shared] = []
+        for board in boards:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                # the sender always builds its own copy of the game (as picochess.py does)
+                DisplayMsg.show(Message.COMPUTER_MOVE(move=board.peek(), ponder=None, game=board.copy(), wait=False))
+            totals[shared].append((time.perf_counter() - start) / rounds)
+            for dev in devices:
+                dev.drain()
+    utilities.shared_messages = False
+
+    for index in range(9, len(boards), 10):
+        print('{:>8} {:>14.1f} {:>14.1f}'.format(index + 1, totals[False][index] * 1e6, totals[True][index] * 1e6))
+    old, new = sum(totals[False]), sum(totals[True])
+    print('whole game: deepcopy {:.1f}ms shared {:.1f}ms => {:.1f}x'.format(old * 1e3, new * 1e3, old / new))
+
+
+bench_message_fanout()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import copy
+import random
+import threading
+import time
+
+import chess
+import chess.uci
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from uci.engine import UciEngine
+
+
+class NullEngine(chess.uci.Engine):
+
+    """An uci engine without a process - it only builds the command lines."""
+
+    def __init__(self):
+        self.uci_variant = None
+        self.uci_chess960 = None
+        self.idle = True
+        self.board = None
+        self.state_changed = threading.Condition()
+        self.semaphore = threading.Semaphore()
+        self.terminated = threading.Event()
+
+    def send_line(self, line):
+        pass
+
+    def _queue_command(self, command, async_callback):
+        command()
+
+
+def bench_position(plies=200, games=20, rounds=20):
+    """Compare deepcopy + position() with the incremental UciEngine.position() against the game length."""
+    engine = NullEngine()
+    uci_engine = UciEngine.__new__(UciEngine)  # no process start, only the position tracking is needed
+    uci_engine.engine = NullEngine()
+    uci_engine.shell = None
+
+    random.seed(4711)
+    totals = {'deepcopy': [0.0] * plies, 'incremental': [0.0] * plies}
+    counts = [0] * plies
+    for _ in range(games):
+        game = chess.Board()
+        uci_engine.pos_board = None
+        uci_engine.position(game)
+        for ply in range(plies):
+            moves = list(game.legal_moves)
+            if not moves:
+                break
+            game.push(random.choice(moves))
+            start = time.perf_counter()
+            for _ in range(rounds):
+                engine.position(copy.deepcopy(game))
+            totals['deepcopy'][ply] += (time.perf_counter() - start) / rounds
+            start = time.perf_counter()
+            uci_engine.position(game)  # the normal case: one new move since the last search
+            totals['incremental'][ply] += time.perf_counter() - start
+            counts[ply] += 1
+
+    print('{} games, {} rounds'.format(games, rounds))
+    print('{:>8} {:>14} {:>16}'.format('ply', 'deepcopy(us)', 'incremental(us)'))
+    for ply in range(9, plies, 20):
+        if counts[ply]:
+            print('{:>8} {:>14.1f} {:>16.1f}'.format(ply + 1, totals['deepcopy'][ply] / counts[ply] * 1e6,
+                                                     totals['incremental'][ply] / counts[ply] * 1e6))
+
+
+bench_position()
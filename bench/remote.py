@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Check the shared ssh connection (uci/remote.py) against a real ssh server - a local sshd is enough:
+#
+#   sudo apt-get install openssh-server
+#   ssh-keygen -t rsa -N '' -f /tmp/picotest_key && cat /tmp/picotest_key.pub >> ~/.ssh/authorized_keys
+#   ./bench/remote.py -H localhost -u $USER -k /tmp/picotest_key -r $PWD
+#
+# The engine is started over ssh (relative to the remote home), so the engines of this machine are used.
+# To see the keepalive timeout at work, block the link while the script waits for it (-w) and watch that
+# the check gives up after ROUND_TRIP_TIMEOUT secs instead of hanging:
+#
+#   sudo iptables -A INPUT -p tcp --sport 22 -j DROP   # and afterwards the same with -D to remove it
+
+import os
+import sys
+import time
+import argparse
+import platform
+
+import chess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from uci.remote import ssh_pool
+from uci.engine import UciEngine
+
+
+def bench_remote(args):
+    """Connect, measure the round trips, read a file, start an engine & recover from a dropped link."""
+    start = time.monotonic()
+    shell = ssh_pool.get(args.host, args.user, args.key, args.password)
+    print('connect: {:.1f}ms'.format((time.monotonic() - start) * 1000))
+    assert ssh_pool.get(args.host, args.user, args.key, args.password) is shell, 'connection not shared'
+
+    trips = [ssh_pool.round_trip(shell) for _ in range(10)]
+    assert None not in trips, 'keepalive not answered'
+    print('keepalive round trip: min {:.1f}ms max {:.1f}ms'.format(min(trips), max(trips)))
+
+    engine_path = args.remote_home + '/engines/' + platform.machine()
+    start = time.monotonic()
+    text = ssh_pool.read_text(shell, engine_path + '/engines.ini')
+    print('read engines.ini ({} bytes): {:.1f}ms'.format(len(text), (time.monotonic() - start) * 1000))
+
+    engine_file = args.engine or 'engines/{}/{}'.format(platform.machine(), text.split(']')[0].strip('['))
+    start = time.monotonic()
+    engine = UciEngine(engine_file, hostname=args.host, username=args.user, key_file=args.key,
+                       password=args.password, home=args.remote_home)
+    print('engine [{}] started: {:.1f}ms'.format(engine.get_name(), (time.monotonic() - start) * 1000))
+    assert engine.shell is shell, 'engine didnt use the shared connection'
+    start = time.monotonic()
+    for _ in range(20):
+        engine.engine.isready()
+    print('isready round trip: {:.1f}ms'.format((time.monotonic() - start) * 1000 / 20))
+
+    if args.wait:
+        print('waiting {}secs - block the link now'.format(args.wait))
+        time.sleep(args.wait)
+    else:
+        ssh_pool._transport(shell).close()  # simulate a broken link
+    start = time.monotonic()
+    ssh_pool.check()
+    print('check: {:.1f}ms (timeout {}secs)'.format((time.monotonic() - start) * 1000, ssh_pool.ROUND_TRIP_TIMEOUT))
+    assert args.wait or ssh_pool.get(args.host, args.user, args.key, args.password) is not shell, 'dead link kept'
+
+    if not args.wait:
+        start = time.monotonic()
+        engine.position(chess.Board())  # respawns the engine (if the supervisor didnt yet) on a new link
+        print('engine respawned: {:.1f}ms'.format((time.monotonic() - start) * 1000))
+    engine.quit()
+
+
+parser = argparse.ArgumentParser(description='shared ssh connection check against a (local) ssh server')
+parser.add_argument('-H', '--host', default='localhost', help='ssh server')
+parser.add_argument('-u', '--user', default=os.environ.get('USER'), help='ssh user')
+parser.add_argument('-k', '--key', help='private key file')
+parser.add_argument('-p', '--password', help='password (if no key file)')
+parser.add_argument('-r', '--remote-home', default=os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+                    help='picochess folder on the server')
+parser.add_argument('-e', '--engine', help='engine file relative to the remote home (default: first of engines.ini)')
+parser.add_argument('-w', '--wait', type=int, default=0, help='secs to wait (for blocking the link) before the check')
+bench_remote(parser.parse_args())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import subprocess
+import threading
+import time
+
+import chess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import utilities
+from utilities import DisplayMsg, DisplayDgt, RepeatedTimer, create_timer
+from dgt.api import Message
+from dgt.translate import DgtTranslate
+from dgt.menu import DgtMenu
+from dgt.display import DgtDisplay
+from dispatcher import Dispatcher
+from timecontrol import TimeControl
+
+
+class NullClock(DisplayDgt, threading.Thread):
+
+    """A (non blocking) clock which only counts the received commands."""
+
+    runs_on_loop = True
+
+    def __init__(self):
+        super(NullClock, self).__init__()
+        self.count = 0
+
+    def _create_task(self, msg):
+        self.count += 1
+
+    def run(self):
+        """Call by threading.Thread start() function."""
+        while True:
+            self._create_task(self.dgt_queue.get())
+
+
+def run_scenario(runtime: str, seconds: int):
+    """Run a pondering game for some secs and print the thread count & cpu usage."""
+    if runtime == 'asyncio':
+        utilities.start_runtime_loop()
+    dgttranslate = DgtTranslate('none', 0, 'en', utilities.version)
+    dgtmenu = DgtMenu(False, 3, 2, False, None, dgttranslate)
+    dispatcher = Dispatcher(dgtmenu)
+    dispatcher.register('web')
+    DgtDisplay(dgttranslate, dgtmenu, TimeControl()).start()
+    clock = NullClock()
+    clock.start()
+    dispatcher.start()
+    DisplayMsg.show(Message.DGT_CLOCK_VERSION(main=2, sub=0, dev='web', text=None))
+    RepeatedTimer(1, lambda: DisplayMsg.show(Message.DGT_SERIAL_NR(number='dont_use'))).start()
+
+    game = chess.Board()
+    pv = [chess.Move.from_uci(uci) for uci in ('e2e4', 'e7e5', 'g1f3', 'b8c6')]
+    samples = []
+    cpu_start = time.process_time()
+    end = time.time() + seconds
+    while time.time() < end:
+        # an engine sends ~20 infos per second, each starts a (0.5s) informer timer
+        create_timer(0.5, lambda: None).start()
+        DisplayMsg.show(Message.NEW_DEPTH(depth=len(samples) % 30))
+        DisplayMsg.show(Message.NEW_PV(pv=pv, mode=None, game=game.copy()))
+        samples.append(threading.active_count())
+        time.sleep(0.05)
+    cpu = time.process_time() - cpu_start
+    print('{:>8} {:>12} {:>12.1f} {:>10.2f} {:>10}'.format(
+        runtime, max(samples), sum(samples) / len(samples), cpu, clock.count))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if len(sys.argv) > 1:
+    run_scenario(sys.argv[1], int(sys.argv[2]))
+else:
+    print('{:>8} {:>12} {:>12} {:>10} {:>10}'.format('runtime', 'max threads', 'avg threads', 'cpu secs', 'commands'))
+    for mode in ('threads', 'asyncio'):
+        subprocess.call([sys.executable, __file__, mode, '10'])
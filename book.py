@@ -0,0 +1,345 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import mmap
+import struct
+import random
+import threading
+import queue
+from threading import Lock
+
+import chess
+import chess.polyglot
+
+from utilities import DisplayMsg
+from dgt.api import Message
+from dgt.util import GameResult, PlayMode, Mode
+
+# learn file: one record per computer move of a finished game - key of the position, move and result (+1/0/-1)
+LEARN_STRUCT = struct.Struct('>QHb')
+LEARN_PLIES = 40  # only the opening part of the games is learned (the shipped books are at most 40 plies deep)
+
+# compiled book: header, positions (sorted by key) and for each position its moves with cumulative weights
+COMPILED_MAGIC = b'PCBK'
+COMPILED_VERSION = 1
+HEADER_STRUCT = struct.Struct('>4sHxxII')  # magic, version, number of positions, number of moves
+POSITION_STRUCT = struct.Struct('>QII')  # key, index of the first move, number of moves
+MOVE_STRUCT = struct.Struct('>HHI')  # raw move, weight, cumulative weight (incl. this move)
+
+
+def compiled_file(file: str):
+    """Return the file name of the compiled book."""
+    return os.path.splitext(file)[0] + '.cbk'
+
+
+def compile_book(file: str, target=None):
+    """Compile the polyglot book file - zero weight moves are dropped like the polyglot reader does."""
+    positions = []
+    moves = []
+    with chess.polyglot.open_reader(file) as reader:
+        last_key = None
+        cumulative = 0
+        for entry in reader:
+            if not entry.weight:
+                continue
+            if entry.key != last_key:
+                positions.append([entry.key, len(moves), 0])
+                last_key = entry.key
+                cumulative = 0
+            cumulative += entry.weight
+            moves.append((entry.raw_move, entry.weight, cumulative))
+            positions[-1][2] += 1
+    target = target or compiled_file(file)
+    with open(target + '.tmp', 'wb') as compiled:
+        compiled.write(HEADER_STRUCT.pack(COMPILED_MAGIC, COMPILED_VERSION, len(positions), len(moves)))
+        for position in positions:
+            compiled.write(POSITION_STRUCT.pack(*position))
+        for move in moves:
+            compiled.write(MOVE_STRUCT.pack(*move))
+    os.replace(target + '.tmp', target)
+    return len(positions), len(moves)
+
+
+class CompiledReader(object):
+
+    """Reader for a compiled book - same interface as the polyglot reader but with O(log n) weighted choices."""
+
+    def __init__(self, file: str):
+        super(CompiledReader, self).__init__()
+        with open(file, 'rb') as compiled:
+            self.mmap = mmap.mmap(compiled.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.positions, self.moves = HEADER_STRUCT.unpack_from(self.mmap, 0)
+        if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+            self.mmap.close()
+            raise ValueError('no compiled book: {}'.format(file))
+        self.moves_offset = HEADER_STRUCT.size + self.positions * POSITION_STRUCT.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.close()
+
+    def __len__(self):
+        return self.moves
+
+    def _find_position(self, key: int):
+        """Return (index of the first move, number of moves) for the key - (0, 0) if not in book."""
+        lo, hi = 0, self.positions
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER_STRUCT.size + mid * POSITION_STRUCT.size
+            mid_key, first, count = POSITION_STRUCT.unpack_from(self.mmap, offset)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return first, count
+        return 0, 0
+
+    def _move(self, index: int):
+        return MOVE_STRUCT.unpack_from(self.mmap, self.moves_offset + index * MOVE_STRUCT.size)
+
+    def find_all(self, board, minimum_weight=1, exclude_moves=()):
+        """Yield the (legal) entries of the position like the polyglot reader does."""
+        key = chess.polyglot.zobrist_hash(board)
+        first, count = self._find_position(key)
+        for index in range(first, first + count):
+            raw_move, weight, _ = self._move(index)
+            if weight < minimum_weight:
+                continue
+            entry = chess.polyglot.Entry(key, raw_move, weight, 0)
+            move = entry.move(chess960=board.chess960)
+            if move in exclude_moves or not board.is_legal(move):
+                continue
+            yield entry
+
+    def weighted_choice(self, board, exclude_moves=(), random=random):
+        """
+        Select a random entry by the weights - distributed the same way as the polyglot reader does.
+
+        The choice is a bisection of the cumulative weights - the moves are only decoded to find the excluded ones.
+        """
+        key = chess.polyglot.zobrist_hash(board)
+        first, count = self._find_position(key)
+        if not count:
+            raise IndexError()
+        excluded = {}  # index => weight
+        for index in range(first, first + count) if exclude_moves else ():
+            raw_move, weight, _ = self._move(index)
+            if chess.polyglot.Entry(key, raw_move, weight, 0).move(chess960=board.chess960) in exclude_moves:
+                excluded[index - first] = weight
+        while True:
+            total_weights = self._move(first + count - 1)[2] - sum(excluded.values())
+            if total_weights <= 0:
+                raise IndexError()
+            choice = random.randint(0, total_weights - 1)
+            for index in sorted(excluded):  # skip the weights of the excluded moves
+                if self._move(first + index)[2] - excluded[index] <= choice:
+                    choice += excluded[index]
+                else:
+                    break
+            lo, hi = 0, count - 1  # find the first move with a cumulative weight above the choice
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._move(first + mid)[2] <= choice:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            index = lo
+            raw_move, weight, _ = self._move(first + index)
+            entry = chess.polyglot.Entry(key, raw_move, weight, 0)
+            if board.is_legal(entry.move(chess960=board.chess960)):
+                return entry
+            excluded[index] = weight  # a hash collision - choose again without it
+
+    def close(self):
+        """Close the reader."""
+        self.mmap.close()
+
+
+def open_book(file: str):
+    """Return a reader for the book file - the compiled one if present and up to date."""
+    compiled = compiled_file(file)
+    try:
+        if os.path.getmtime(compiled) >= os.path.getmtime(file):
+            return CompiledReader(compiled)
+        logging.debug('compiled book %s outdated', compiled)
+    except (OSError, ValueError):
+        pass
+    return chess.polyglot.open_reader(file)
+
+
+class BookReaders(object):
+
+    """Open (memory mapped) readers of the opening books - each book file is mapped only once and kept open."""
+
+    def __init__(self):
+        super(BookReaders, self).__init__()
+        self.readers = {}  # file => reader
+        self.lock = Lock()
+
+    def get(self, file: str):
+        """Return the reader for this book file - opened on first use."""
+        with self.lock:
+            reader = self.readers.get(file)
+            if reader is None:
+                reader = open_book(file)
+                self.readers[file] = reader
+                logging.debug('book [%s] opened with %i entries', file, len(reader))
+            return reader
+
+    def open_all(self, books: list):
+        """Open the readers of all books in the library (the missing ones are skipped)."""
+        for book in books:
+            try:
+                self.get(book['file'])
+            except OSError:
+                logging.warning('cant open book %s', book['file'])
+
+    def close(self):
+        """Close all readers."""
+        with self.lock:
+            for reader in self.readers.values():
+                reader.close()
+            self.readers = {}
+
+
+class BookLearning(object):
+
+    """Results of the computer moves in finished games - read from (and appended to) the learn file."""
+
+    def __init__(self, file: str):
+        super(BookLearning, self).__init__()
+        self.file = file
+        self.enabled = True
+        self.scores = None  # key => {move: sum of the results}
+        self.lock = Lock()
+
+    @staticmethod
+    def _pack_move(move: chess.Move):
+        return move.from_square | move.to_square << 6 | (move.promotion - 1 if move.promotion else 0) << 12
+
+    @staticmethod
+    def _unpack_move(raw_move: int):
+        promotion = raw_move >> 12 & 0x7
+        return chess.Move(raw_move & 0x3f, raw_move >> 6 & 0x3f, promotion + 1 if promotion else None)
+
+    def _add(self, key: int, move: chess.Move, result: int):
+        moves = self.scores.setdefault(key, {})
+        moves[move] = moves.get(move, 0) + result
+
+    def _load(self):
+        if self.scores is None:
+            self.scores = {}
+            try:
+                with open(self.file, 'rb') as learn_file:
+                    data = learn_file.read()
+            except OSError:
+                return
+            for offset in range(0, len(data) - LEARN_STRUCT.size + 1, LEARN_STRUCT.size):
+                key, raw_move, result = LEARN_STRUCT.unpack_from(data, offset)
+                self._add(key, self._unpack_move(raw_move), result)
+            logging.debug('book learning loaded: %i positions', len(self.scores))
+
+    def learn(self, game: chess.Board, computer_color: bool, result: int):
+        """Append the result (+1 win, 0 draw, -1 loss for the computer) of the computer moves in the opening."""
+        board = game.copy()
+        while board.move_stack:  # back to the start position of the game
+            board.pop()
+        records = []
+        for move in game.move_stack[:LEARN_PLIES]:
+            if board.turn == computer_color:
+                key = chess.polyglot.zobrist_hash(board)
+                records.append((key, move))
+            board.push(move)
+        if not records:
+            return
+        with self.lock:
+            self._load()
+            for key, move in records:
+                self._add(key, move, result)
+            try:
+                with open(self.file, 'ab') as learn_file:
+                    learn_file.write(b''.join(LEARN_STRUCT.pack(key, self._pack_move(move), result)
+                                              for key, move in records))
+            except OSError:
+                logging.warning('cant write book learn file %s', self.file)
+
+    def losing_moves(self, board: chess.Board):
+        """Return the moves which lost more games than they won from this position."""
+        if not self.enabled:
+            return set()
+        with self.lock:
+            self._load()
+            moves = self.scores.get(chess.polyglot.zobrist_hash(board), {})
+            return {move for move, score in moves.items() if score < 0}
+
+
+class BookLearner(DisplayMsg, threading.Thread):
+
+    """Feed the results of the finished games (against the computer) into the book learning."""
+
+    def __init__(self, learning: BookLearning):
+        super(BookLearner, self).__init__()
+        self.learning = learning
+        self.mode = Mode.NORMAL
+
+        self.handlers = {
+            Message.INTERACTION_MODE: self._process_interaction_mode,
+            Message.GAME_ENDS: self._process_game_ends
+        }
+
+    def _process_interaction_mode(self, message):
+        self.mode = message.mode
+
+    def _process_game_ends(self, message):
+        if not self.learning.enabled or self.mode not in (Mode.NORMAL, Mode.BRAIN):
+            return
+        game = message.game
+        if message.result in (GameResult.WIN_WHITE, GameResult.WIN_BLACK):
+            winner = chess.WHITE if message.result == GameResult.WIN_WHITE else chess.BLACK
+        elif message.result in (GameResult.MATE, GameResult.OUT_OF_TIME):
+            winner = not game.turn
+        elif message.result == GameResult.ABORT:
+            return
+        else:
+            winner = None  # all other results are draws
+        computer_color = chess.BLACK if message.play_mode == PlayMode.USER_WHITE else chess.WHITE
+        result = 0 if winner is None else (1 if winner == computer_color else -1)
+        self.learning.learn(game, computer_color, result)
+
+    def _process_message(self, message):
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
+
+    def run(self):
+        """Call by threading.Thread start() function."""
+        while True:
+            try:
+                message = self.msg_queue.get()
+                self._process_message(message)
+            except queue.Empty:
+                pass
+
+
+book_readers = BookReaders()
+book_learning = BookLearning(os.path.abspath(os.path.join(os.path.dirname(__file__), 'book.learn')))
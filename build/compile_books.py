@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from book import compile_book
+
+
+def compile_books():
+    """Compile all polyglot books of the books folder (run it after changing a book)."""
+    program_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    books_path = program_path + os.sep + 'books'
+
+    for book_file_name in sorted(os.listdir(books_path)):
+        if book_file_name.endswith('.bin'):
+            positions, moves = compile_book(books_path + os.sep + book_file_name)
+            print('{}: {} positions, {} moves'.format(book_file_name, positions, moves))
+
+
+compile_books()
@@ -16,31 +16,161 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
+import sys
+import copy
+
+import chess
+
+import latency
+
+
+class FrozenBoard(chess.Board):
+
+    """A read-only board snapshot which can be shared between all display threads."""
+
+    frozen = False
+
+    def _check_frozen(self):
+        if self.frozen:
+            raise TypeError('board snapshot is read-only - use copy() first')
+
+    def push(self, move):
+        self._check_frozen()
+        super(FrozenBoard, self).push(move)
+
+    def pop(self):
+        self._check_frozen()
+        return super(FrozenBoard, self).pop()
+
+    def clear_stack(self):
+        self._check_frozen()
+        super(FrozenBoard, self).clear_stack()
+
+    def set_fen(self, fen):
+        self._check_frozen()
+        super(FrozenBoard, self).set_fen(fen)
+
+    def set_board_fen(self, fen):
+        self._check_frozen()
+        super(FrozenBoard, self).set_board_fen(fen)
+
+    def set_piece_at(self, square, piece, promoted=False):
+        self._check_frozen()
+        super(FrozenBoard, self).set_piece_at(square, piece, promoted)
+
+    def remove_piece_at(self, square):
+        self._check_frozen()
+        return super(FrozenBoard, self).remove_piece_at(square)
+
+    def copy(self, stack=True):
+        """Return a normal (mutable) chess.Board copy of the snapshot."""
+        board = super(FrozenBoard, self).copy(stack)
+        board.__class__ = chess.Board
+        return board
+
+    def is_fivefold_repetition(self):
+        # python-chess pushes & pops the move stack for this check - do it on a private copy
+        return self.copy().is_fivefold_repetition()
+
+    def can_claim_threefold_repetition(self):
+        return self.copy().can_claim_threefold_repetition()
+
+    def san(self, move):
+        # python-chess pushes & pops the move to find out about check & mate - the stack isnt needed for that
+        return self.copy(stack=False).san(move)
+
+    @classmethod
+    def snapshot(cls, board: chess.Board):
+        """Turn the board (not used by anyone else anymore) into a read-only snapshot without copying it."""
+        board.__class__ = cls
+        board.frozen = True
+        return board
+
+
+def _hashable(value):
+    """Return a hashable stand-in for a field value."""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(val) for val in value)
+    if isinstance(value, dict):
+        return tuple((key, _hashable(val)) for key, val in value.items())
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return str(value)
+
+
 class BaseClass(object):
 
     """Used for creating event, message, dgt classes."""
 
-    def __init__(self, classtype):
-        self._type = classtype
+    __slots__ = ('_frozen', '_hash', '_origin')
+    _type = None  # interned class type (set by ClassFactory)
+    _fields = ()
+
+    def __init__(self):
+        object.__setattr__(self, '_frozen', False)
+        object.__setattr__(self, '_hash', None)
+        object.__setattr__(self, '_origin', latency.origin())
+
+    def __setattr__(self, key, value):
+        if self._frozen:
+            raise AttributeError('{} is frozen - cant set {}'.format(self._type, key))
+        object.__setattr__(self, key, value)
+        object.__setattr__(self, '_hash', None)
+
+    def __getstate__(self):
+        state = {key: getattr(self, key) for key in self._fields if hasattr(self, key)}
+        state['_frozen'] = self._frozen
+        state['_hash'] = self._hash
+        state['_origin'] = self._origin
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+
+    def freeze(self):
+        """Make this instance (and its boards) read-only, so it can be shared instead of deep copied."""
+        for key in self._fields:
+            value = getattr(self, key, None)
+            if type(value) is chess.Board:
+                object.__setattr__(self, key, FrozenBoard.snapshot(value))
+            elif isinstance(value, dict):  # the sender keeps using it (for example the level dict of the menu)
+                object.__setattr__(self, key, copy.deepcopy(value))
+        object.__setattr__(self, '_frozen', True)
+        return self
+
+    def get_origin(self):
+        """Return the (monotonic) time the originating board action happened - None if not traced."""
+        return self._origin
 
     def __repr__(self):
         return self._type
 
     def __hash__(self):
-        return hash(str(self.__class__) + ": " + str(self.__dict__))
+        if self._hash is None:
+            values = tuple(_hashable(getattr(self, key, None)) for key in self._fields)
+            object.__setattr__(self, '_hash', hash((self._type,) + values))
+        return self._hash
 
 
 def ClassFactory(name, argnames, BaseClass=BaseClass):
     """Class factory for generating."""
+    fields = frozenset(argnames)
+
     def __init__(self, **kwargs):
+        BaseClass.__init__(self)
         for key, value in kwargs.items():
             # here, the argnames variable is the one passed to the ClassFactory call
-            if key not in argnames:
+            if key not in fields:
                 raise TypeError("argument {} not valid for {}".format(key, self.__class__.__name__))
-            setattr(self, key, value)
-        BaseClass.__init__(self, name)
+            object.__setattr__(self, key, value)
 
-    newclass = type(name, (BaseClass,), {"__init__": __init__})
+    newclass = type(name, (BaseClass,), {'__init__': __init__, '__slots__': tuple(argnames),
+                                         '_type': sys.intern(name), '_fields': tuple(argnames)})
     return newclass
 
 
@@ -75,6 +205,8 @@ class EventApi():
     NEW_PV = 'EVT_NEW_PV'  # Engine sends a new principal variation
     NEW_SCORE = 'EVT_NEW_SCORE'  # Engine sends a new score
     NEW_DEPTH = 'EVT_NEW_DEPTH'  # Engine sends a new depth
+    NEW_MULTIPV = 'EVT_NEW_MULTIPV'  # Engine sends a snapshot of all its multipv lines
+    ENGINE_RECOVERED = 'EVT_ENGINE_RECOVERED'  # Engine died and got respawned
     START_SEARCH = 'EVT_START_SEARCH'  # Engine starts the search
     STOP_SEARCH = 'EVT_STOP_SEARCH'  # Engine stops the search
     # Timecontrol events
@@ -130,6 +262,8 @@ class MessageApi():
     IP_INFO = 'MSG_IP_INFO'  # Information about the IP adr
     NEW_SCORE = 'MSG_NEW_SCORE'  # Shows a new score
     NEW_DEPTH = 'MSG_NEW_DEPTH'  # Shows a new depth
+    NEW_MULTIPV = 'MSG_NEW_MULTIPV'  # Shows the candidate lines (multipv analysis)
+    ENGINE_RECOVERED = 'MSG_ENGINE_RECOVERED'  # Engine died and is running again
     ALTERNATIVE_MOVE = 'MSG_ALTERNATIVE_MOVE'  # User wants another move to be calculated
     SWITCH_SIDES = 'MSG_SWITCH_SIDES'  # Forget the engines move, and let it be user's turn
     SYSTEM_SHUTDOWN = 'MSG_SYSTEM_SHUTDOWN'  # Sends a Shutdown
@@ -172,8 +306,8 @@ class Dgt():
     LIGHT_CLEAR = ClassFactory(DgtApi.LIGHT_CLEAR, ['devs'])
     LIGHT_SQUARES = ClassFactory(DgtApi.LIGHT_SQUARES, ['uci_move', 'devs'])
     CLOCK_SET = ClassFactory(DgtApi.CLOCK_SET, ['time_left', 'time_right', 'devs'])
-    CLOCK_START = ClassFactory(DgtApi.CLOCK_START, ['side', 'devs', 'wait'])
-    CLOCK_STOP = ClassFactory(DgtApi.CLOCK_STOP, ['devs', 'wait'])
+    CLOCK_START = ClassFactory(DgtApi.CLOCK_START, ['side', 'devs', 'wait', 'ack'])
+    CLOCK_STOP = ClassFactory(DgtApi.CLOCK_STOP, ['devs', 'wait', 'ack'])
     CLOCK_VERSION = ClassFactory(DgtApi.CLOCK_VERSION, ['main', 'sub', 'devs'])
 
 
@@ -212,8 +346,8 @@ class Message():
     SEARCH_STARTED = ClassFactory(MessageApi.SEARCH_STARTED, [])
     SEARCH_STOPPED = ClassFactory(MessageApi.SEARCH_STOPPED, [])
     TAKE_BACK = ClassFactory(MessageApi.TAKE_BACK, ['game'])
-    CLOCK_START = ClassFactory(MessageApi.CLOCK_START, ['turn', 'tc_init', 'devs'])
-    CLOCK_STOP = ClassFactory(MessageApi.CLOCK_STOP, ['devs'])
+    CLOCK_START = ClassFactory(MessageApi.CLOCK_START, ['turn', 'tc_init', 'devs', 'ack'])
+    CLOCK_STOP = ClassFactory(MessageApi.CLOCK_STOP, ['devs', 'ack'])
     CLOCK_TIME = ClassFactory(MessageApi.CLOCK_TIME, ['time_white', 'time_black'])
     USER_MOVE_DONE = ClassFactory(MessageApi.USER_MOVE_DONE, ['move', 'fen', 'turn', 'game'])
     GAME_ENDS = ClassFactory(MessageApi.GAME_ENDS, ['result', 'play_mode', 'game'])
@@ -223,6 +357,8 @@ class Message():
     IP_INFO = ClassFactory(MessageApi.IP_INFO, ['info'])
     NEW_SCORE = ClassFactory(MessageApi.NEW_SCORE, ['score', 'mate', 'mode', 'turn'])
     NEW_DEPTH = ClassFactory(MessageApi.NEW_DEPTH, ['depth'])
+    NEW_MULTIPV = ClassFactory(MessageApi.NEW_MULTIPV, ['lines', 'mode', 'game'])
+    ENGINE_RECOVERED = ClassFactory(MessageApi.ENGINE_RECOVERED, ['msecs'])
     ALTERNATIVE_MOVE = ClassFactory(MessageApi.ALTERNATIVE_MOVE, ['game', 'play_mode'])
     SWITCH_SIDES = ClassFactory(MessageApi.SWITCH_SIDES, ['game', 'move'])
     SYSTEM_SHUTDOWN = ClassFactory(MessageApi.SYSTEM_SHUTDOWN, [])
@@ -267,6 +403,8 @@ class Event():
     NEW_PV = ClassFactory(EventApi.NEW_PV, ['pv'])
     NEW_SCORE = ClassFactory(EventApi.NEW_SCORE, ['score', 'mate'])
     NEW_DEPTH = ClassFactory(EventApi.NEW_DEPTH, ['depth'])
+    NEW_MULTIPV = ClassFactory(EventApi.NEW_MULTIPV, ['lines'])
+    ENGINE_RECOVERED = ClassFactory(EventApi.ENGINE_RECOVERED, ['msecs'])
     START_SEARCH = ClassFactory(EventApi.START_SEARCH, [])
     STOP_SEARCH = ClassFactory(EventApi.STOP_SEARCH, [])
     # Timecontrol events
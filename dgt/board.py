@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import struct
+import copy
 import logging
 import subprocess
 from threading import Timer, Lock
@@ -26,7 +27,8 @@ import time
 
 from dgt.util import DgtAck, DgtClk, DgtCmd, DgtMsg, ClockIcons, ClockSide, enum
 from dgt.api import Message, Dgt
-from utilities import RepeatedTimer, DisplayMsg, hms_time
+import latency
+from utilities import RepeatedTimer, DisplayMsg, ClockAck, hms_time, create_timer
 
 
 class DgtBoard(object):
@@ -50,8 +52,9 @@ class DgtBoard(object):
         # the next three are only used for "not dgtpi" mode
         self.clock_lock = False  # serial connected clock is locked
         self.last_clock_command = []  # Used for resend last (failed) clock command
+        self.clock_ack = None  # round id (see ClockAck) of the last SetNRun command
         self.enable_ser_clock = None  # None = "unknown status" False="only board found" True="clock also found"
-        self.watchdog_timer = RepeatedTimer(1, self._watchdog)
+        self.watchdog_timer = RepeatedTimer(1, self._watchdog, blocking=True)  # serial io
         # bluetooth vars for Jessie upwards & autoconnect
         self.btctl = None
         self.bt_rfcomm = None
@@ -95,7 +98,7 @@ class DgtBoard(object):
         else:
             wait = (0.5 if self.channel == 'BT' else 0.25) + 0.03 * self.field_factor  # BT's scanning in half speed
         logging.debug('board position changed => wait %.2fsecs for a stable result low_time: %s', wait, self.low_time)
-        self.field_timer = Timer(wait, self.expired_field_timer)
+        self.field_timer = create_timer(wait, self.expired_field_timer, blocking=True)  # serial io
         self.field_timer.start()
         self.field_timer_running = True
 
@@ -218,6 +221,8 @@ class DgtBoard(object):
                         cmd = self.last_clock_command[3]  # type: DgtClk
                         if cmd.value != ack1 and ack1 < 0x80:
                             logging.warning('(ser) clock ACK [%s] out of sync - last: [%s]', DgtAck(ack1), cmd)
+                if ack1 == DgtAck.DGT_ACK_CLOCK_SETNRUN.value:
+                    ClockAck.done('ser', self.clock_ack)
                 # @todo these lines are better as what is done on DgtHw but it doesnt work
                 # if ack1 == DgtAck.DGT_ACK_CLOCK_SETNRUN.value:
                 #     logging.info('(ser) clock out of set time now')
@@ -254,6 +259,7 @@ class DgtBoard(object):
                     sub = ack2 & 0x0f
                     logging.debug('(ser) clock version %0.2f', float(str(main) + '.' + str(sub)))
                     if self.bconn_text:
+                        self.bconn_text = copy.copy(self.bconn_text)  # the old one might still be read by a display
                         self.bconn_text.devs = {'ser'}  # Now send the (delayed) message to serial clock
                         dev = 'ser'
                     else:
@@ -351,7 +357,11 @@ class DgtBoard(object):
 
             # Attention! This fen is NOT flipped
             logging.debug('raw fen [%s]', fen)
+            origin = time.monotonic()  # the trace starts with the (stable) board position that has the move
+            latency.begin(origin)
             DisplayMsg.show(Message.DGT_FEN(fen=fen, raw=True))
+            latency.span('board', origin)
+            latency.finish()
 
         elif message_id == DgtMsg.DGT_MSG_FIELD_UPDATE:
             if message_length != 2:
@@ -22,6 +22,7 @@ import queue
 import threading
 
 import chess
+import latency
 from utilities import DisplayMsg, Observable, DispatchDgt, write_picochess_ini
 from dgt.translate import DgtTranslate
 from dgt.menu import DgtMenu
@@ -49,10 +50,60 @@ class DgtDisplay(DisplayMsg, threading.Thread):
         self.play_turn = self.hint_turn = self.last_turn = None
         self.score = self.dgttranslate.text('N10_score', None)
         self.depth = None
+        self.multipv_lines = []  # the candidate lines of a multipv analysis
+        self.multipv_fen = None
+        self.multipv_turn = None
+        self.multipv_index = 0
         self.uci960 = False
         self.play_mode = PlayMode.USER_WHITE
         self.low_time = False
 
+        self.handlers = {
+            Message.ENGINE_READY: self._process_engine_ready,
+            Message.ENGINE_STARTUP: self._process_engine_startup,
+            Message.ENGINE_FAIL: self._process_engine_fail,
+            Message.ENGINE_RECOVERED: self._process_engine_recovered,
+            Message.COMPUTER_MOVE: self._process_computer_move,
+            Message.START_NEW_GAME: self._process_start_new_game,
+            Message.COMPUTER_MOVE_DONE: self._process_computer_move_done,
+            Message.USER_MOVE_DONE: self._process_user_move_done,
+            Message.REVIEW_MOVE_DONE: self._process_review_move_done,
+            Message.ALTERNATIVE_MOVE: self._process_alternative_move,
+            Message.LEVEL: self._process_level,
+            Message.TIME_CONTROL: self._process_time_control,
+            Message.OPENING_BOOK: self._process_opening_book,
+            Message.TAKE_BACK: self._process_take_back,
+            Message.GAME_ENDS: self._process_game_ends,
+            Message.INTERACTION_MODE: self._process_interaction_mode,
+            Message.PLAY_MODE: self._process_play_mode,
+            Message.NEW_SCORE: self._process_new_score,
+            Message.BOOK_MOVE: self._process_book_move,
+            Message.NEW_PV: self._process_new_pv,
+            Message.NEW_DEPTH: self._process_new_depth,
+            Message.NEW_MULTIPV: self._process_new_multipv,
+            Message.IP_INFO: self._process_ip_info,
+            Message.STARTUP_INFO: self._process_startup_info,
+            Message.SEARCH_STARTED: self._process_search_started,
+            Message.SEARCH_STOPPED: self._process_search_stopped,
+            Message.CLOCK_START: self._process_clock_start,
+            Message.CLOCK_STOP: self._process_clock_stop,
+            Message.DGT_BUTTON: self._process_button,
+            Message.DGT_FEN: self._process_dgt_fen,
+            Message.DGT_CLOCK_VERSION: self._process_dgt_clock_version,
+            Message.DGT_CLOCK_TIME: self._process_dgt_clock_time,
+            Message.CLOCK_TIME: self._process_clock_time,
+            Message.DGT_SERIAL_NR: self._process_dgt_serial_nr,
+            Message.DGT_JACK_CONNECTED_ERROR: self._process_dgt_jack_connected_error,
+            Message.DGT_EBOARD_VERSION: self._process_dgt_eboard_version,
+            Message.DGT_NO_EBOARD_ERROR: self._process_dgt_no_eboard_error,
+            Message.SWITCH_SIDES: self._process_switch_sides,
+            Message.EXIT_MENU: self._process_exit_menu,
+            Message.WRONG_FEN: self._process_wrong_fen,
+            Message.UPDATE_PICO: self._process_update_pico,
+            Message.BATTERY: self._process_battery,
+            Message.REMOTE_ROOM: self._process_remote_room
+        }
+
     def _exit_menu(self):
         if self.dgtmenu.exit_menu():
             DispatchDgt.fire(self.dgttranslate.text('K05_exitmenu'))
@@ -81,6 +132,8 @@ class DgtDisplay(DisplayMsg, threading.Thread):
         self.last_turn = None
         self.score = self.dgttranslate.text('N10_score', None)
         self.depth = None
+        self.multipv_lines = []
+        self.multipv_index = 0
 
     def _combine_depth_and_score(self):
         def _score_to_string(score_val, length):
@@ -161,7 +214,9 @@ class DgtDisplay(DisplayMsg, threading.Thread):
             else:
                 Observable.fire(Event.EXIT_MENU())
         else:
-            if self.dgtmenu.get_mode() in (Mode.ANALYSIS, Mode.KIBITZ, Mode.PONDER):
+            if self.dgtmenu.get_mode() in (Mode.ANALYSIS, Mode.KIBITZ) and self.multipv_lines:
+                self._show_next_multipv()
+            elif self.dgtmenu.get_mode() in (Mode.ANALYSIS, Mode.KIBITZ, Mode.PONDER):
                 DispatchDgt.fire(self.dgttranslate.text('B00_nofunction'))
             else:
                 if self.play_move:
@@ -332,7 +387,7 @@ class DgtDisplay(DisplayMsg, threading.Thread):
                 book = self.dgtmenu.all_books[book_index]
                 self.dgtmenu.set_book(book_index)
                 logging.debug('map: Opening book [%s]', book['file'])
-                text = book['text']
+                text = copy.copy(book['text'])  # dont change the (maybe shared) book list
                 text.beep = self.dgttranslate.bl(BeepLevel.MAP)
                 text.maxtime = 1
                 text.wait = self._exit_menu()
@@ -346,7 +401,7 @@ class DgtDisplay(DisplayMsg, threading.Thread):
                     eng = self.dgtmenu.get_engine()
                     level_dict = eng['level_dict']
                     logging.debug('map: Engine name [%s]', eng['name'])
-                    eng_text = eng['text']
+                    eng_text = copy.copy(eng['text'])
                     eng_text.beep = self.dgttranslate.bl(BeepLevel.MAP)
                     eng_text.maxtime = 1
                     eng_text.wait = self._exit_menu()
@@ -495,18 +550,18 @@ class DgtDisplay(DisplayMsg, threading.Thread):
         DispatchDgt.fire(Dgt.LIGHT_SQUARES(uci_move=move.uci(), devs={'ser', 'web'}))
         self.leds_are_on = True
 
-    def _set_clock(self, side=ClockSide.NONE, devs=None):
+    def _set_clock(self, side=ClockSide.NONE, devs=None, ack=None):
         if devs is None:  # prevent W0102 error
             devs = {'ser', 'i2c', 'web'}
         time_left, time_right = self.time_control.get_internal_time(flip_board=self.dgtmenu.get_flip_board())
         DispatchDgt.fire(Dgt.CLOCK_SET(time_left=time_left, time_right=time_right, devs=devs))
-        DispatchDgt.fire(Dgt.CLOCK_START(side=side, wait=True, devs=devs))
+        DispatchDgt.fire(Dgt.CLOCK_START(side=side, wait=True, devs=devs, ack=ack))
 
     def _display_confirm(self, text_key):
         if not self.low_time and not self.dgtmenu.get_confirm():  # only display if the user has >60sec on his clock
             DispatchDgt.fire(self.dgttranslate.text(text_key))
 
-    def _process_computer_move_done(self):
+    def _process_computer_move_done(self, _):
         self.force_leds_off()
         self.last_move = self.play_move
         self.last_fen = self.play_fen
@@ -570,6 +625,23 @@ class DgtDisplay(DisplayMsg, threading.Thread):
                                     lang=self.dgttranslate.language, capital=self.dgttranslate.capital)
             DispatchDgt.fire(disp)
 
+    def _process_new_multipv(self, message):
+        self.multipv_lines = message.lines
+        self.multipv_fen = message.game.fen()
+        self.multipv_turn = message.game.turn
+
+    def _show_next_multipv(self):
+        """Show the next candidate move of the multipv analysis (button2 pages through them)."""
+        self.multipv_index = (self.multipv_index + 1) % len(self.multipv_lines)
+        side = self._get_clock_side(self.multipv_turn)
+        beep = self.dgttranslate.bl(BeepLevel.BUTTON)
+        text = Dgt.DISPLAY_MOVE(move=self.multipv_lines[self.multipv_index]['pv'][0], fen=self.multipv_fen,
+                                side=side, wait=False, maxtime=1, beep=beep, devs={'ser', 'i2c', 'web'},
+                                uci960=self.uci960, lang=self.dgttranslate.language,
+                                capital=self.dgttranslate.capital)
+        DispatchDgt.fire(text)
+        self._exit_display()
+
     def _process_startup_info(self, message):
         self.play_mode = message.info['play_mode']
         self.dgtmenu.set_mode(message.info['interaction_mode'])
@@ -619,9 +691,9 @@ class DgtDisplay(DisplayMsg, threading.Thread):
     def _process_clock_start(self, message):
         self.time_control = TimeControl(**message.tc_init)
         side = ClockSide.LEFT if (message.turn == chess.WHITE) != self.dgtmenu.get_flip_board() else ClockSide.RIGHT
-        self._set_clock(side=side, devs=message.devs)
+        self._set_clock(side=side, devs=message.devs, ack=message.ack)
 
-    def _process_dgt_serial_nr(self):
+    def _process_dgt_serial_nr(self, _):
         # logging.debug('Serial number {}'.format(message.number))  # actually used for watchdog (once a second)
         if self.dgtmenu.get_mode() == Mode.PONDER and not self._inside_main_menu():
             if self.show_move_or_value >= self.dgtmenu.get_ponderinterval():
@@ -662,197 +734,159 @@ class DgtDisplay(DisplayMsg, threading.Thread):
                 text = Dgt.DISPLAY_TIME(force=True, wait=True, devs=devs)
         DispatchDgt.fire(text)
 
-    def _process_message(self, message):
-        if False:  # switch-case
-            pass
-
-        elif isinstance(message, Message.ENGINE_READY):
-            self._process_engine_ready(message)
-
-        elif isinstance(message, Message.ENGINE_STARTUP):
-            self._process_engine_startup(message)
-
-        elif isinstance(message, Message.ENGINE_FAIL):
-            DispatchDgt.fire(self.dgttranslate.text('Y10_erroreng'))
-            self.dgtmenu.set_engine_restart(False)
-
-        elif isinstance(message, Message.COMPUTER_MOVE):
-            self._process_computer_move(message)
-
-        elif isinstance(message, Message.START_NEW_GAME):
-            self._process_start_new_game(message)
-
-        elif isinstance(message, Message.COMPUTER_MOVE_DONE):
-            self._process_computer_move_done()
-
-        elif isinstance(message, Message.USER_MOVE_DONE):
-            self._process_user_move_done(message)
-
-        elif isinstance(message, Message.REVIEW_MOVE_DONE):
-            self._process_review_move_done(message)
-
-        elif isinstance(message, Message.ALTERNATIVE_MOVE):
-            self.force_leds_off()
-            self.play_mode = message.play_mode
-            DispatchDgt.fire(self.dgttranslate.text('B05_altmove'))
-
-        elif isinstance(message, Message.LEVEL):
-            if not self.dgtmenu.get_engine_restart():
-                DispatchDgt.fire(message.level_text)
-
-        elif isinstance(message, Message.TIME_CONTROL):
-            self._process_time_control(message)
-
-        elif isinstance(message, Message.OPENING_BOOK):
-            if not self.dgtmenu.get_confirm() or not message.show_ok:
-                DispatchDgt.fire(message.book_text)
-
-        elif isinstance(message, Message.TAKE_BACK):
-            self.force_leds_off()
-            self._reset_moves_and_score()
-            DispatchDgt.fire(self.dgttranslate.text('C10_takeback'))
-            DispatchDgt.fire(Dgt.DISPLAY_TIME(force=True, wait=True, devs={'ser', 'i2c', 'web'}))
-
-        elif isinstance(message, Message.GAME_ENDS):
-            if not self.dgtmenu.get_engine_restart():  # filter out the shutdown/reboot process
-                text = self.dgttranslate.text(message.result.value)
-                text.beep = self.dgttranslate.bl(BeepLevel.CONFIG)
-                text.maxtime = 0.5
-                DispatchDgt.fire(text)
-
-        elif isinstance(message, Message.INTERACTION_MODE):
-            if not self.dgtmenu.get_confirm() or not message.show_ok:
-                DispatchDgt.fire(message.mode_text)
+    def _process_engine_fail(self, _):
+        DispatchDgt.fire(self.dgttranslate.text('Y10_erroreng'))
+        self.dgtmenu.set_engine_restart(False)
 
-        elif isinstance(message, Message.PLAY_MODE):
-            self.play_mode = message.play_mode
-            DispatchDgt.fire(message.play_mode_text)
+    def _process_engine_recovered(self, message):
+        logging.debug('engine recovered after %.0fms', message.msecs)
+        DispatchDgt.fire(self.dgttranslate.text('Y10_okengine'))
 
-        elif isinstance(message, Message.NEW_SCORE):
-            self._process_new_score(message)
+    def _process_alternative_move(self, message):
+        self.force_leds_off()
+        self.play_mode = message.play_mode
+        DispatchDgt.fire(self.dgttranslate.text('B05_altmove'))
 
-        elif isinstance(message, Message.BOOK_MOVE):
-            self.score = self.dgttranslate.text('N10_score', None)
-            DispatchDgt.fire(self.dgttranslate.text('N10_bookmove'))
+    def _process_level(self, message):
+        if not self.dgtmenu.get_engine_restart():
+            DispatchDgt.fire(message.level_text)
 
-        elif isinstance(message, Message.NEW_PV):
-            self._process_new_pv(message)
+    def _process_opening_book(self, message):
+        if not self.dgtmenu.get_confirm() or not message.show_ok:
+            DispatchDgt.fire(message.book_text)
 
-        elif isinstance(message, Message.NEW_DEPTH):
-            self.depth = message.depth
+    def _process_take_back(self, _):
+        self.force_leds_off()
+        self._reset_moves_and_score()
+        DispatchDgt.fire(self.dgttranslate.text('C10_takeback'))
+        DispatchDgt.fire(Dgt.DISPLAY_TIME(force=True, wait=True, devs={'ser', 'i2c', 'web'}))
+
+    def _process_game_ends(self, message):
+        if not self.dgtmenu.get_engine_restart():  # filter out the shutdown/reboot process
+            text = self.dgttranslate.text(message.result.value)
+            text.beep = self.dgttranslate.bl(BeepLevel.CONFIG)
+            text.maxtime = 0.5
+            DispatchDgt.fire(text)
 
-        elif isinstance(message, Message.IP_INFO):
-            self.dgtmenu.int_ip = message.info['int_ip']
-            self.dgtmenu.ext_ip = message.info['ext_ip']
+    def _process_interaction_mode(self, message):
+        if not self.dgtmenu.get_confirm() or not message.show_ok:
+            DispatchDgt.fire(message.mode_text)
 
-        elif isinstance(message, Message.STARTUP_INFO):
-            self._process_startup_info(message)
+    def _process_play_mode(self, message):
+        self.play_mode = message.play_mode
+        DispatchDgt.fire(message.play_mode_text)
 
-        elif isinstance(message, Message.SEARCH_STARTED):
-            logging.debug('search started')
+    def _process_book_move(self, _):
+        self.score = self.dgttranslate.text('N10_score', None)
+        DispatchDgt.fire(self.dgttranslate.text('N10_bookmove'))
 
-        elif isinstance(message, Message.SEARCH_STOPPED):
-            logging.debug('search stopped')
+    def _process_new_depth(self, message):
+        self.depth = message.depth
 
-        elif isinstance(message, Message.CLOCK_START):
-            self._process_clock_start(message)
+    def _process_ip_info(self, message):
+        self.dgtmenu.int_ip = message.info['int_ip']
+        self.dgtmenu.ext_ip = message.info['ext_ip']
 
-        elif isinstance(message, Message.CLOCK_STOP):
-            DispatchDgt.fire(Dgt.CLOCK_STOP(devs=message.devs, wait=True))
+    def _process_search_started(self, _):
+        logging.debug('search started')
+        self.multipv_lines = []  # belong to the old position
+        self.multipv_index = 0
 
-        elif isinstance(message, Message.DGT_BUTTON):
-            self._process_button(message)
+    def _process_search_stopped(self, _):
+        logging.debug('search stopped')
 
-        elif isinstance(message, Message.DGT_FEN):
-            if self.dgtmenu.inside_updt_menu():
-                logging.debug('inside update menu => ignore fen %s', message.fen)
-            else:
-                self._process_fen(message.fen, message.raw)
+    def _process_clock_stop(self, message):
+        DispatchDgt.fire(Dgt.CLOCK_STOP(devs=message.devs, wait=True, ack=message.ack))
 
-        elif isinstance(message, Message.DGT_CLOCK_VERSION):
-            DispatchDgt.fire(Dgt.CLOCK_VERSION(main=message.main, sub=message.sub, devs={message.dev}))
-            text = self.dgttranslate.text('Y21_picochess', devs={message.dev})
-            text.rd = ClockIcons.DOT
-            DispatchDgt.fire(text)
+    def _process_dgt_fen(self, message):
+        latency.span('display', message.get_origin())
+        if self.dgtmenu.inside_updt_menu():
+            logging.debug('inside update menu => ignore fen %s', message.fen)
+        else:
+            self._process_fen(message.fen, message.raw)
 
-            if message.dev == 'ser':  # send the "board connected message" to serial clock
-                DispatchDgt.fire(message.text)
-            self._set_clock(devs={message.dev})
-            self._exit_display(devs={message.dev})
-
-        elif isinstance(message, Message.DGT_CLOCK_TIME):
-            time_white = message.time_left
-            time_black = message.time_right
-            if self.dgtmenu.get_flip_board():
-                time_white, time_black = time_black, time_white
-            Observable.fire(Event.CLOCK_TIME(time_white=time_white, time_black=time_black, connect=message.connect,
-                                             dev=message.dev))
-
-        elif isinstance(message, Message.CLOCK_TIME):
-            time_u = message.time_white
-            time_c = message.time_black
-            if self.play_mode == PlayMode.USER_BLACK:
-                time_u, time_c = time_c, time_u
-            self.low_time = time_u < 60
-            if self.low_time:
-                logging.debug('time too low, disable confirm - u: %i, c: %i', time_u, time_c)
-
-        elif isinstance(message, Message.DGT_SERIAL_NR):
-            self._process_dgt_serial_nr()
-
-        elif isinstance(message, Message.DGT_JACK_CONNECTED_ERROR):  # only working in case of 2 clocks connected!
-            DispatchDgt.fire(self.dgttranslate.text('Y00_errorjack'))
-
-        elif isinstance(message, Message.DGT_EBOARD_VERSION):
-            if self.dgtmenu.inside_updt_menu():
-                logging.debug('inside update menu => board channel not displayed')
-            else:
-                DispatchDgt.fire(message.text)
-                self._exit_display(devs={'i2c', 'web'})  # ser is done, when clock found
+    def _process_dgt_clock_version(self, message):
+        DispatchDgt.fire(Dgt.CLOCK_VERSION(main=message.main, sub=message.sub, devs={message.dev}))
+        text = self.dgttranslate.text('Y21_picochess', devs={message.dev})
+        text.rd = ClockIcons.DOT
+        DispatchDgt.fire(text)
 
-        elif isinstance(message, Message.DGT_NO_EBOARD_ERROR):
-            if self.dgtmenu.inside_updt_menu() or self.dgtmenu.inside_main_menu():
-                logging.debug('inside menu => board error not displayed')
-            else:
-                DispatchDgt.fire(message.text)
+        if message.dev == 'ser':  # send the "board connected message" to serial clock
+            DispatchDgt.fire(message.text)
+        self._set_clock(devs={message.dev})
+        self._exit_display(devs={message.dev})
+
+    def _process_dgt_clock_time(self, message):
+        time_white = message.time_left
+        time_black = message.time_right
+        if self.dgtmenu.get_flip_board():
+            time_white, time_black = time_black, time_white
+        Observable.fire(Event.CLOCK_TIME(time_white=time_white, time_black=time_black, connect=message.connect,
+                                         dev=message.dev))
+
+    def _process_clock_time(self, message):
+        time_u = message.time_white
+        time_c = message.time_black
+        if self.play_mode == PlayMode.USER_BLACK:
+            time_u, time_c = time_c, time_u
+        self.low_time = time_u < 60
+        if self.low_time:
+            logging.debug('time too low, disable confirm - u: %i, c: %i', time_u, time_c)
+
+    def _process_dgt_jack_connected_error(self, _):  # only working in case of 2 clocks connected!
+        DispatchDgt.fire(self.dgttranslate.text('Y00_errorjack'))
+
+    def _process_dgt_eboard_version(self, message):
+        if self.dgtmenu.inside_updt_menu():
+            logging.debug('inside update menu => board channel not displayed')
+        else:
+            DispatchDgt.fire(message.text)
+            self._exit_display(devs={'i2c', 'web'})  # ser is done, when clock found
 
-        elif isinstance(message, Message.DGT_NO_CLOCK_ERROR):
-            pass
+    def _process_dgt_no_eboard_error(self, message):
+        if self.dgtmenu.inside_updt_menu() or self.dgtmenu.inside_main_menu():
+            logging.debug('inside menu => board error not displayed')
+        else:
+            DispatchDgt.fire(message.text)
 
-        elif isinstance(message, Message.SWITCH_SIDES):
-            self.play_move = chess.Move.null()
-            self.play_fen = None
-            self.play_turn = None
+    def _process_switch_sides(self, message):
+        self.play_move = chess.Move.null()
+        self.play_fen = None
+        self.play_turn = None
 
-            self.hint_move = chess.Move.null()
-            self.hint_fen = None
-            self.hint_turn = None
-            self.force_leds_off()
-            logging.debug('user ignored move %s', message.move)
+        self.hint_move = chess.Move.null()
+        self.hint_fen = None
+        self.hint_turn = None
+        self.force_leds_off()
+        logging.debug('user ignored move %s', message.move)
 
-        elif isinstance(message, Message.EXIT_MENU):
-            self._exit_display()
+    def _process_exit_menu(self, _):
+        self._exit_display()
 
-        elif isinstance(message, Message.WRONG_FEN):
-            DispatchDgt.fire(self.dgttranslate.text('C10_setpieces'))
+    def _process_wrong_fen(self, _):
+        DispatchDgt.fire(self.dgttranslate.text('C10_setpieces'))
 
-        elif isinstance(message, Message.UPDATE_PICO):
-            DispatchDgt.fire(self.dgttranslate.text('Y00_update'))
+    def _process_update_pico(self, _):
+        DispatchDgt.fire(self.dgttranslate.text('Y00_update'))
 
-        elif isinstance(message, Message.BATTERY):
-            if message.percent == 0x7f:
-                percent = ' NA'
-            elif message.percent > 99:
-                percent = ' 99'
-            else:
-                percent = str(message.percent)
-            self.dgtmenu.battery = percent
+    def _process_battery(self, message):
+        if message.percent == 0x7f:
+            percent = ' NA'
+        elif message.percent > 99:
+            percent = ' 99'
+        else:
+            percent = str(message.percent)
+        self.dgtmenu.battery = percent
 
-        elif isinstance(message, Message.REMOTE_ROOM):
-            self.dgtmenu.inside_room = message.inside
+    def _process_remote_room(self, message):
+        self.dgtmenu.inside_room = message.inside
 
-        else:  # Default
-            pass
+    def _process_message(self, message):
+        handler = self.handlers.get(type(message))
+        if handler:
+            latency.begin(message.get_origin())
+            handler(message)
+            latency.finish()
 
     def run(self):
         """Call by threading.Thread start() function."""
@@ -146,6 +146,7 @@ class DgtHw(DgtIface):
         with self.lib_lock:
             l_hms = hms_time(self.dgtboard.l_time)
             r_hms = hms_time(self.dgtboard.r_time)
+            self.dgtboard.clock_ack = self.clock_ack  # for the SetNRun ack
             res = self.dgtboard.set_and_run(l_run, l_hms[0], l_hms[1], l_hms[2], r_run, r_hms[0], r_hms[1], r_hms[2])
             if not res:
                 logging.warning('finally failed %i', res)
@@ -183,3 +184,7 @@ class DgtHw(DgtIface):
     def get_name(self):
         """Get name."""
         return 'ser'
+
+    def _clock_done(self, message):
+        if not self.case_res:  # otherwise the SetNRun ack (see: DgtBoard) does it
+            super(DgtHw, self)._clock_done(message)
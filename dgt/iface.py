@@ -20,7 +20,8 @@ import queue
 from threading import Thread
 
 from chess import Board
-from utilities import hms_time, DisplayDgt, DispatchDgt
+import latency
+from utilities import hms_time, DisplayDgt, DispatchDgt, ClockAck
 from dgt.util import ClockIcons, ClockSide
 from dgt.api import Dgt
 from dgt.translate import DgtTranslate
@@ -39,6 +40,7 @@ class DgtIface(DisplayDgt, Thread):
         self.side_running = ClockSide.NONE
         self.enable_dgt3000 = False
         self.case_res = True
+        self.clock_ack = None  # round id (see ClockAck) of the clock start/stop command processed lately
 
     def display_text_on_clock(self, message):
         """Override this function."""
@@ -80,6 +82,15 @@ class DgtIface(DisplayDgt, Thread):
         """Override this function."""
         raise NotImplementedError()
 
+    def _ack_clock(self, message):
+        """Acknowledge the clock start/stop command - only the addressed device does it."""
+        if self.get_name() in message.devs:
+            ClockAck.done(self.get_name(), message.ack)
+
+    def _clock_done(self, message):
+        """Acknowledge a processed clock start/stop command."""
+        self._ack_clock(message)
+
     def get_san(self, message, is_xl=False):
         """Create a chess.board plus a text ready to display on clock."""
 
@@ -139,12 +150,17 @@ class DgtIface(DisplayDgt, Thread):
         elif isinstance(message, Dgt.CLOCK_SET):
             self.case_res = self.set_clock(message.time_left, message.time_right, message.devs)
         elif isinstance(message, Dgt.CLOCK_START):
+            self.clock_ack = message.ack
             self.case_res = self.start_clock(message.side, message.devs)
+            self._clock_done(message)
         elif isinstance(message, Dgt.CLOCK_STOP):
+            self.clock_ack = message.ack
             if self.side_running != ClockSide.NONE:
                 self.case_res = self.stop_clock(message.devs)
+                self._clock_done(message)
             else:
                 logging.debug('(%s) clock is already stopped', ','.join(message.devs))
+                self._ack_clock(message)  # nothing sent to the clock
         elif isinstance(message, Dgt.CLOCK_VERSION):
             if 'i2c' in message.devs:
                 logging.debug('(i2c) clock found => starting the board connection')
@@ -159,6 +175,8 @@ class DgtIface(DisplayDgt, Thread):
 
     def _create_task(self, msg):
         res = self._process_message(msg)
+        if self.get_name() in msg.devs:
+            latency.span('clock', msg.get_origin())
         if not res:
             logging.warning('DgtApi command %s failed result: %s', msg, res)
 
@@ -17,10 +17,12 @@
 
 import logging
 import queue
-from threading import Timer, Thread, Lock
-from copy import deepcopy
+from threading import Thread, Lock
+from copy import copy, deepcopy
 
-from utilities import DisplayDgt, DispatchDgt, dispatch_queue
+import latency
+import utilities
+from utilities import DisplayDgt, DispatchDgt, ClockAck, dispatch_queue, create_timer
 from dgt.api import Dgt, DgtApi
 from dgt.menu import DgtMenu
 
@@ -29,6 +31,12 @@ class Dispatcher(DispatchDgt, Thread):
 
     """A dispatcher taking the dispatch_queue and fill dgt_queue with the commands in time."""
 
+    RUNNING_TYPES = frozenset([DgtApi.CLOCK_START, DgtApi.CLOCK_STOP, DgtApi.DISPLAY_TIME])
+    DISPLAY_TYPES = frozenset([DgtApi.DISPLAY_MOVE, DgtApi.DISPLAY_TEXT])
+    CLOCK_TYPES = frozenset([DgtApi.DISPLAY_MOVE, DgtApi.DISPLAY_TEXT, DgtApi.DISPLAY_TIME,
+                             DgtApi.CLOCK_SET, DgtApi.CLOCK_START, DgtApi.CLOCK_STOP])
+    ACK_TYPES = frozenset([DgtApi.CLOCK_START, DgtApi.CLOCK_STOP])
+
     def __init__(self, dgtmenu: DgtMenu):
         super(Dispatcher, self).__init__()
 
@@ -96,28 +104,31 @@ class Dispatcher(DispatchDgt, Thread):
 
     def _process_message(self, message, dev: str):
         do_handle = True
-        if repr(message) in (DgtApi.CLOCK_START, DgtApi.CLOCK_STOP, DgtApi.DISPLAY_TIME):
+        msg_type = repr(message)  # interned type string => cheap set lookups
+        if msg_type in self.RUNNING_TYPES:
             self.display_hash[dev] = None  # Cant know the clock display if command changing the running status
         else:
-            if repr(message) in (DgtApi.DISPLAY_MOVE, DgtApi.DISPLAY_TEXT):
-                if self.display_hash[dev] == hash(message) and not message.beep:
+            if msg_type in self.DISPLAY_TYPES:
+                msg_hash = hash(message)  # cached inside the message
+                if self.display_hash[dev] == msg_hash and not message.beep:
                     do_handle = False
                 else:
-                    self.display_hash[dev] = hash(message)
+                    self.display_hash[dev] = msg_hash
 
         if do_handle:
             logging.debug('(%s) handle DgtApi: %s', dev, message)
-            if repr(message) == DgtApi.CLOCK_VERSION:
+            latency.span('dispatcher', message.get_origin())
+            if msg_type == DgtApi.CLOCK_VERSION:
                 logging.debug('(%s) clock registered', dev)
                 self.clock_connected[dev] = True
 
-            clk = (DgtApi.DISPLAY_MOVE, DgtApi.DISPLAY_TEXT, DgtApi.DISPLAY_TIME,
-                   DgtApi.CLOCK_SET, DgtApi.CLOCK_START, DgtApi.CLOCK_STOP)
-            if repr(message) in clk and not self.clock_connected[dev]:
+            if msg_type in self.CLOCK_TYPES and not self.clock_connected[dev]:
                 logging.debug('(%s) clock still not registered => ignore %s', dev, message)
+                if msg_type in self.ACK_TYPES:
+                    ClockAck.done(dev, message.ack)
                 return
             if hasattr(message, 'maxtime'):
-                if repr(message) == DgtApi.DISPLAY_TEXT:
+                if msg_type == DgtApi.DISPLAY_TEXT:
                     if message.maxtime == 2.1:  # 2.1=picochess message
                         self.dgtmenu.enable_picochess_displayed(dev)
                     if self.dgtmenu.inside_updt_menu():
@@ -128,12 +139,13 @@ class Dispatcher(DispatchDgt, Thread):
                             logging.debug('(%s) inside update menu => board connect not displayed', dev)
                             return
                 if message.maxtime > 0.1:  # filter out "all the time" show and "eBoard error" messages
-                    self.maxtimer[dev] = Timer(message.maxtime * self.time_factor, self._stopped_maxtimer, [dev])
+                    self.maxtimer[dev] = create_timer(message.maxtime * self.time_factor, self._stopped_maxtimer, [dev])
                     self.maxtimer[dev].start()
                     logging.debug('(%s) showing %s for %.1f secs', dev, message, message.maxtime * self.time_factor)
                     self.maxtimer_running[dev] = True
-            if repr(message) == DgtApi.CLOCK_START and self.dgtmenu.inside_updt_menu():
+            if msg_type == DgtApi.CLOCK_START and self.dgtmenu.inside_updt_menu():
                 logging.debug('(%s) inside update menu => clock not started', dev)
+                ClockAck.done(dev, message.ack)
                 return
             message.devs = {dev}  # on new system, we only have ONE device each message - force this!
             DisplayDgt.show(message)
@@ -156,14 +168,20 @@ class Dispatcher(DispatchDgt, Thread):
             try:
                 msg = dispatch_queue.get()
                 logging.debug('received command from dispatch_queue: %s devs: %s', msg, ','.join(msg.devs))
+                if repr(msg) in self.ACK_TYPES:
+                    for dev in msg.devs - self.devices:  # nobody there to answer
+                        ClockAck.done(dev, msg.ack)
 
                 for dev in msg.devs & self.devices:
-                    message = deepcopy(msg)
+                    message = copy(msg) if utilities.shared_messages else deepcopy(msg)  # only devs gets replaced
                     if self.maxtimer_running[dev]:
                         if hasattr(message, 'wait'):
                             if message.wait:
                                 self.tasks[dev].append(message)
                                 logging.debug('(%s) tasks delayed: %s', dev, self.tasks[dev])
+                                if repr(message) in self.ACK_TYPES:
+                                    # the order is kept by the task list => dont block picochess
+                                    ClockAck.done(dev, message.ack)
                                 continue
                             else:
                                 logging.debug('ignore former maxtime - dev: %s', dev)
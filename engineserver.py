@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Serve the uci engines of this machine to picochess boards on the LAN (plain tcp or unix socket, no ssh).
+
+There is no authentication: only the engines listed in engines.ini are started, and the server only listens on
+localhost unless another address is given. Dont run it as root.
+"""
+
+import argparse
+import configparser
+import logging
+import os
+import platform
+import shutil
+import socket
+import socketserver
+import subprocess
+import threading
+
+BUFFER_SIZE = 65536
+
+
+class EngineRequestHandler(socketserver.StreamRequestHandler):
+
+    """Handle one client connection: 'engine <file>' runs an engine, 'read <file>' sends a file."""
+
+    def _served_files(self):
+        """Return the engines listed in engines.ini of this machine and the (ini & uci) files which can be read."""
+        engine_path = os.path.join(os.path.realpath(self.server.home), 'engines', platform.machine())
+        config = configparser.ConfigParser()
+        config.optionxform = str
+        try:
+            config.read(os.path.join(engine_path, 'engines.ini'))
+        except configparser.Error:
+            logging.exception('cant read engines.ini of [%s]', engine_path)
+            return set(), set()
+        engines = {os.path.join(engine_path, section) for section in config.sections()}
+        texts = {engine + '.uci' for engine in engines}
+        texts.add(os.path.join(engine_path, 'engines.ini'))
+        return engines, texts
+
+    def _resolve(self, file: str, allowed: set):
+        """Return the path of the file - only the files of the allowed set are served, all others give None."""
+        path = os.path.normpath(os.path.join(os.path.realpath(self.server.home), file))
+        return path if path in allowed and os.path.isfile(path) else None
+
+    def handle(self):
+        try:
+            command, file = self.rfile.readline().decode('utf-8').split(None, 1)
+        except (ValueError, UnicodeDecodeError):
+            return
+        file = file.strip()
+        engines, texts = self._served_files()
+        if command == 'read':
+            self._read(self._resolve(file, texts), file)
+        elif command == 'engine':
+            self._engine(self._resolve(file, engines), file)
+        else:
+            logging.warning('unknown command [%s] from %s', command, self.client_address)
+
+    def _read(self, path: str, file: str):
+        if path is None:
+            logging.warning('refused to send [%s] to %s', file, self.client_address)
+            self.wfile.write(b'error\n')
+            return
+        self.wfile.write(b'ok\n')
+        with open(path, 'rb') as file:
+            shutil.copyfileobj(file, self.wfile)
+
+    def _engine(self, path: str, file: str):
+        if path is None or not os.access(path, os.X_OK):
+            logging.warning('engine [%s] not found or not listed in engines.ini - refused for %s', file,
+                            self.client_address)
+            return
+        if self.connection.family != socket.AF_UNIX:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        logging.info('starting engine [%s] for %s', file, self.client_address)
+        process = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0,
+                                   cwd=os.path.dirname(path), stderr=subprocess.DEVNULL)
+        sender = threading.Thread(target=self._send_output, args=(process,), daemon=True)
+        sender.start()
+        try:
+            while True:
+                data = self.rfile.read1(BUFFER_SIZE)  # any buffered bytes from the first readline() first
+                if not data:
+                    break
+                process.stdin.write(data)
+        except OSError:
+            pass
+        logging.info('client %s gone - stopping engine [%s]', self.client_address, file)
+        try:
+            process.stdin.write(b'quit\n')
+            process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        sender.join()
+
+    def _send_output(self, process: subprocess.Popen):
+        """Pass the engine output - a read returns all lines written so far, so they go out in one packet."""
+        try:
+            while True:
+                data = os.read(process.stdout.fileno(), BUFFER_SIZE)
+                if not data:
+                    break
+                self.connection.sendall(data)
+        except OSError:
+            pass
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)  # engine died => tell the client
+        except OSError:
+            pass
+
+
+class TcpEngineServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class UnixEngineServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-p', '--port', type=int, default=8765, help='tcp port to listen on')
+    parser.add_argument('-a', '--address', type=str, default='127.0.0.1',
+                        help='address to listen on - set the LAN address of this machine to serve other boards')
+    parser.add_argument('-s', '--socket', type=str, help='listen on this unix socket instead of tcp')
+    parser.add_argument('-H', '--home', type=str, default=os.path.dirname(os.path.abspath(__file__)),
+                        help='folder holding the "engines" folder - only the engines listed inside '
+                             'engines/<machine>/engines.ini are served')
+    parser.add_argument('-l', '--log-level', choices=['notset', 'debug', 'info', 'warning', 'error', 'critical'],
+                        default='info', help='logging level')
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        format='%(asctime)s.%(msecs)03d %(levelname)7s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixEngineServer(args.socket, EngineRequestHandler)
+    else:
+        server = TcpEngineServer((args.address, args.port), EngineRequestHandler)
+    server.home = args.home
+    logging.info('serving the engines of [%s] (%s) on %s', args.home, platform.machine(),
+                 args.socket or '{}:{}'.format(args.address, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
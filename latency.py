@@ -0,0 +1,107 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import time
+from bisect import bisect_left
+from threading import local, Lock
+
+# the stages a board move passes - each span is measured from the origin (board position with the move) till the stage
+# only messages/events created while processing a traced one carry an origin, all others have None
+STAGES = ('board', 'display', 'picochess', 'think', 'dispatcher', 'clock', 'web', 'talker')
+# measured on its own (no origin needed): from UciEngine.stop() till the engine is idle again
+OTHERS = ('engine_stop',)
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # histogram bucket limits in ms
+
+_context = local()  # the origin of the message/event the current thread is processing
+_lock = Lock()
+
+
+class Histogram(object):
+
+    """Latency histogram (in ms) of one stage."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, msecs: float):
+        """Add one measured latency."""
+        self.buckets[bisect_left(BOUNDS, msecs)] += 1
+        self.count += 1
+        self.total += msecs
+        self.max = max(self.max, msecs)
+
+    def to_dict(self):
+        """Return the histogram as a json friendly dict."""
+        names = ['<={}ms'.format(bound) for bound in BOUNDS] + ['>{}ms'.format(BOUNDS[-1])]
+        return {'count': self.count, 'avg': round(self.total / self.count, 1) if self.count else 0,
+                'max': round(self.max, 1), 'buckets': dict(zip(names, self.buckets))}
+
+
+histograms = {stage: Histogram() for stage in STAGES + OTHERS}
+_logged_counts = {}
+
+
+def origin():
+    """Return the origin for a new message/event - inherited from the one currently processed (or None)."""
+    return getattr(_context, 'origin', None)
+
+
+def begin(start):
+    """Start processing a message/event - new messages/events created by this thread inherit its origin."""
+    _context.origin = start
+
+
+def finish():
+    """Processing done - forget the origin."""
+    _context.origin = None
+
+
+def span(stage: str, start: float):
+    """Record the latency from origin till now for this stage - untraced (None) origins are ignored."""
+    if start is None:
+        return
+    add(stage, (time.monotonic() - start) * 1000)
+
+
+def add(stage: str, msecs: float):
+    """Record one measured latency (ms) for this stage."""
+    with _lock:
+        histograms[stage].add(msecs)
+
+
+def summary():
+    """Return all histograms as a dict (stage => histogram)."""
+    with _lock:
+        return {stage: histograms[stage].to_dict() for stage in STAGES + OTHERS}
+
+
+def log_summary():
+    """Log a short summary of the stages with new samples."""
+    with _lock:
+        lines = []
+        for stage in STAGES + OTHERS:
+            hist = histograms[stage]
+            if hist.count != _logged_counts.get(stage, 0):
+                _logged_counts[stage] = hist.count
+                lines.append('{}: n={} avg={:.1f}ms max={:.1f}ms'.format(stage, hist.count, hist.total / hist.count,
+                                                                         hist.max))
+    if lines:
+        logging.info('latency %s', ' | '.join(lines))
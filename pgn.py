@@ -162,9 +162,21 @@ class PgnDisplay(DisplayMsg, threading.Thread):
         self.engine_elo = '-'
         self.startime = datetime.datetime.now().strftime('%H:%M:%S')
 
+        self.handlers = {
+            Message.SYSTEM_INFO: self._process_system_info,
+            Message.IP_INFO: self._process_ip_info,
+            Message.STARTUP_INFO: self._process_startup_info,
+            Message.LEVEL: self._process_level,
+            Message.INTERACTION_MODE: self._process_interaction_mode,
+            Message.ENGINE_STARTUP: self._process_engine_startup,
+            Message.ENGINE_READY: self._process_engine_ready,
+            Message.GAME_ENDS: self._process_game_ends,
+            Message.START_NEW_GAME: self._process_start_new_game
+        }
+
     def _save_and_email_pgn(self, message):
         logging.debug('Saving game to [%s]', self.file_name)
-        pgn_game = chess.pgn.Game().from_board(message.game)
+        pgn_game = chess.pgn.Game().from_board(message.game.copy())  # from_board() pops & pushes all moves
 
         # Headers
         pgn_game.headers['Event'] = 'PicoChess game'
@@ -210,57 +222,55 @@ class PgnDisplay(DisplayMsg, threading.Thread):
         file.close()
         self.emailer.send('Game PGN', str(pgn_game), self.file_name)
 
-    def _process_message(self, message):
-        if False:  # switch-case
-            pass
+    def _process_system_info(self, message):
+        self.engine_name = message.info['engine_name']
+        self.old_engine = self.engine_name
+        self.user_name = message.info['user_name']
+        self.user_elo = message.info['user_elo']
 
-        elif isinstance(message, Message.SYSTEM_INFO):
-            self.engine_name = message.info['engine_name']
-            self.old_engine = self.engine_name
-            self.user_name = message.info['user_name']
-            self.user_elo = message.info['user_elo']
+    def _process_ip_info(self, message):
+        self.location = message.info['location']
 
-        elif isinstance(message, Message.IP_INFO):
-            self.location = message.info['location']
+    def _process_startup_info(self, message):
+        self.level_text = message.info['level_text']
+        self.level_name = message.info['level_name']
 
-        elif isinstance(message, Message.STARTUP_INFO):
-            self.level_text = message.info['level_text']
-            self.level_name = message.info['level_name']
+    def _process_level(self, message):
+        self.level_text = message.level_text
+        self.level_name = message.level_name
 
-        elif isinstance(message, Message.LEVEL):
-            self.level_text = message.level_text
-            self.level_name = message.level_name
+    def _process_interaction_mode(self, message):
+        if message.mode == Mode.REMOTE:
+            self.old_engine = self.engine_name
+            self.engine_name = 'Remote Player'
+        else:
+            self.engine_name = self.old_engine
+
+    def _process_engine_startup(self, message):
+        for index in range(0, len(message.installed_engines)):
+            eng = message.installed_engines[index]
+            if eng['file'] == message.file:
+                self.engine_elo = eng['elo']
+                break
+
+    def _process_engine_ready(self, message):
+        self.old_engine = self.engine_name = message.engine_name
+        self.engine_elo = message.eng['elo']
+        if not message.has_levels:
+            self.level_text = None
+            self.level_name = ''
+
+    def _process_game_ends(self, message):
+        if message.game.move_stack:
+            self._save_and_email_pgn(message)
+
+    def _process_start_new_game(self, message):
+        self.startime = datetime.datetime.now().strftime('%H:%M:%S')
 
-        elif isinstance(message, Message.INTERACTION_MODE):
-            if message.mode == Mode.REMOTE:
-                self.old_engine = self.engine_name
-                self.engine_name = 'Remote Player'
-            else:
-                self.engine_name = self.old_engine
-
-        elif isinstance(message, Message.ENGINE_STARTUP):
-            for index in range(0, len(message.installed_engines)):
-                eng = message.installed_engines[index]
-                if eng['file'] == message.file:
-                    self.engine_elo = eng['elo']
-                    break
-
-        elif isinstance(message, Message.ENGINE_READY):
-            self.old_engine = self.engine_name = message.engine_name
-            self.engine_elo = message.eng['elo']
-            if not message.has_levels:
-                self.level_text = None
-                self.level_name = ''
-
-        elif isinstance(message, Message.GAME_ENDS):
-            if message.game.move_stack:
-                self._save_and_email_pgn(message)
-
-        elif isinstance(message, Message.START_NEW_GAME):
-            self.startime = datetime.datetime.now().strftime('%H:%M:%S')
-
-        else:  # Default
-            pass
+    def _process_message(self, message):
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
 
     def run(self):
         """Call by threading.Thread start() function."""
@@ -19,7 +19,6 @@
 
 import sys
 import os
-import threading
 import copy
 import gc
 import logging
@@ -29,14 +28,22 @@ import queue
 import configargparse
 
 from uci.engine import UciEngine
+from uci.pool import EnginePool
 from uci.read import read_engine_ini
+from uci.cache import eval_cache
+from uci.remote import ssh_pool
 import chess
 import chess.polyglot
 import chess.uci
 
-from timecontrol import TimeControl
+from timecontrol import TimeControl, Overhead
+from book import book_readers, book_learning, BookLearner
+import latency
+import utilities
 from utilities import get_location, update_picochess, get_opening_books, shutdown, reboot, checkout_tag
 from utilities import Observable, DisplayMsg, version, evt_queue, write_picochess_ini, hms_time, RepeatedTimer
+from utilities import create_timer, start_runtime_loop, ClockAck, LegalFens, ReachableFens
+from utilities import GameEndTracker, BookPrefetch
 from pgn import Emailer, PgnDisplay
 from server import WebServer
 from talker.picotalker import PicoTalkerDisplay
@@ -58,6 +65,7 @@ class AlternativeMover:
 
     def __init__(self):
         self.excludemoves = set()
+        self.prefetch = BookPrefetch()
 
     def all(self, game: chess.Board):
         """Get all remaining legal moves from game position."""
@@ -70,7 +78,14 @@ class AlternativeMover:
     def book(self, bookreader, game_copy: chess.Board):
         """Get a BookMove or None from game position."""
         try:
-            choice = bookreader.weighted_choice(game_copy, self.excludemoves)
+            # avoid the book moves which lost more games than they won - as long there are others
+            losing_moves = book_learning.losing_moves(game_copy)
+            try:
+                choice = self.prefetch.weighted_choice(bookreader, game_copy, self.excludemoves | losing_moves)
+            except IndexError:
+                if not losing_moves:
+                    raise
+                choice = self.prefetch.weighted_choice(bookreader, game_copy, self.excludemoves)
         except IndexError:
             return None
 
@@ -78,7 +93,7 @@ class AlternativeMover:
         self.add(book_move)
         game_copy.push(book_move)
         try:
-            choice = bookreader.weighted_choice(game_copy)
+            choice = self.prefetch.weighted_choice(bookreader, game_copy)
             book_ponder = choice.move()
         except IndexError:
             book_ponder = None
@@ -123,23 +138,46 @@ def main():
         """Start the fen timer in case an unhandled fen string been received from board."""
         nonlocal fen_timer_running
         nonlocal fen_timer
-        fen_timer = threading.Timer(3, expired_fen_timer)
+        fen_timer = create_timer(3, expired_fen_timer)
         fen_timer.start()
         fen_timer_running = True
 
     def compute_legal_fens(game_copy: chess.Board):
         """
-        Compute a list of legal FENs for the given game.
+        Compute an index of legal FENs for the given game.
 
         :param game_copy: The game
-        :return: A list of legal FENs
+        :return: A (lazy build) index of legal FENs => move
         """
-        fens = []
-        for move in game_copy.legal_moves:
-            game_copy.push(move)
-            fens.append(game_copy.board_fen())
-            game_copy.pop()
-        return fens
+        return LegalFens(game_copy)
+
+    def compute_reachable_fens():
+        """
+        Compute (or reuse) the index of positions up to 3 plies ahead of the current game.
+
+        After a computer move this resolves the computer move & user reply (plus one more ply) done quickly.
+
+        :return: A (lazy build) index of FENs => moves
+        """
+        nonlocal reachable_fens
+        if interaction_mode in (Mode.NORMAL, Mode.BRAIN, Mode.REMOTE):
+            if not done_computer_fen:
+                return {}  # the user cant do more than one ply before the computer moved
+            first_move = done_move
+        else:
+            first_move = None
+        if reachable_fens is None or reachable_fens.key != (game.fen(), first_move):
+            reachable_fens = ReachableFens(game.copy(), plies=3, first_move=first_move)
+        return reachable_fens
+
+    def prefetch_book():
+        """Read the book replies to all user moves while the user is thinking."""
+        if interaction_mode in (Mode.NORMAL, Mode.BRAIN) and not is_not_user_turn(game.turn):
+            searchmoves.prefetch.start(bookreader, game)
+
+    def overhead_key():
+        """Return the key of the current engine & transport for the overhead statistic."""
+        return engine.get_file(), engine.get_transport()
 
     def think(game: chess.Board, timec: TimeControl, msg: Message):
         """
@@ -153,18 +191,18 @@ def main():
         if book_res:
             Observable.fire(Event.BEST_MOVE(move=book_res.bestmove, ponder=book_res.ponder, inbook=True))
         else:
-            while not engine.is_waiting():
-                time.sleep(0.05)
-                logging.warning('engine is still not waiting')
-            uci_dict = timec.uci()
+            if not engine.wait_idle():
+                stop_search()
+            uci_dict = timec.uci(overhead.margin(overhead_key()), game.turn)
             uci_dict['searchmoves'] = searchmoves.all(game)
-            engine.position(copy.deepcopy(game))
+            engine.position(game)
             engine.go(uci_dict)
+        latency.span('think', latency.origin())
 
     def analyse(game: chess.Board, msg: Message):
         """Start a new ponder search on the current game."""
         DisplayMsg.show(msg)
-        engine.position(copy.deepcopy(game))
+        engine.position(game)
         engine.ponder()
 
     def observe(game: chess.Board, msg: Message):
@@ -176,11 +214,9 @@ def main():
         """Start a new permanent brain search on the game with pondering move made."""
         assert not done_computer_fen, 'brain() called with displayed move - fen: %s' % done_computer_fen
         if pb_move:
-            game_copy = copy.deepcopy(game)
-            game_copy.push(pb_move)
-            logging.info('start permanent brain with pondering move [%s] fen: %s', pb_move, game_copy.fen())
-            engine.position(game_copy)
-            engine.brain(timec.uci())
+            logging.info('start permanent brain with pondering move [%s] from fen: %s', pb_move, game.fen())
+            engine.position(game, extra_moves=[pb_move])
+            engine.brain(timec.uci(overhead.margin(overhead_key()), not game.turn))  # engine moves after pb_move
         else:
             logging.info('ignore permanent brain cause no pondering move available')
 
@@ -204,26 +240,33 @@ def main():
     def stop_search():
         """Stop current search."""
         engine.stop()
-        while not engine.is_waiting():
-            time.sleep(0.05)
-            logging.warning('engine is still not waiting')
+        if not engine.wait_idle():
+            logging.error('engine is still not waiting')
 
     def stop_clock():
         """Stop the clock."""
         if interaction_mode in (Mode.NORMAL, Mode.BRAIN, Mode.OBSERVE, Mode.REMOTE):
-            time_control.stop_internal()
-            DisplayMsg.show(Message.CLOCK_STOP(devs={'ser', 'i2c', 'web'}))
-            time.sleep(0.4)  # @todo give some time to clock to really do it. Find a better solution!
+            used_time = time_control.stop_internal()
+            devs = {'ser', 'i2c', 'web'}
+            ack = ClockAck.expect(devs)
+            DisplayMsg.show(Message.CLOCK_STOP(devs=devs, ack=ack))
+            if not ClockAck.wait():
+                logging.warning('clock stop not acknowledged - still waiting for: %s', ClockAck.pending)
+            return used_time
         else:
             logging.warning('wrong function call [stop]! mode: %s', interaction_mode)
+        return None
 
     def start_clock():
         """Start the clock."""
         if interaction_mode in (Mode.NORMAL, Mode.BRAIN, Mode.OBSERVE, Mode.REMOTE):
             time_control.start_internal(game.turn)
             tc_init = time_control.get_parameters()
-            DisplayMsg.show(Message.CLOCK_START(turn=game.turn, tc_init=tc_init, devs={'ser', 'i2c', 'web'}))
-            time.sleep(0.4)  # @todo give some time to clock to really do it. Find a better solution!
+            devs = {'ser', 'i2c', 'web'}
+            ack = ClockAck.expect(devs)
+            DisplayMsg.show(Message.CLOCK_START(turn=game.turn, tc_init=tc_init, devs=devs, ack=ack))
+            if not ClockAck.wait():
+                logging.warning('clock start not acknowledged - still waiting for: %s', ClockAck.pending)
         else:
             logging.warning('wrong function call [start]! mode: %s', interaction_mode)
 
@@ -235,18 +278,7 @@ def main():
         :param play_mode:
         :return: False is the game continues, Game_Ends() Message if it has ended
         """
-        result = None
-        if game.is_stalemate():
-            result = GameResult.STALEMATE
-        if game.is_insufficient_material():
-            result = GameResult.INSUFFICIENT_MATERIAL
-        if game.is_seventyfive_moves():
-            result = GameResult.SEVENTYFIVE_MOVES
-        if game.is_fivefold_repetition():
-            result = GameResult.FIVEFOLD_REPETITION
-        if game.is_checkmate():
-            result = GameResult.MATE
-
+        result = game_end_tracker.result(game)
         if result is None:
             return False
         else:
@@ -331,6 +363,7 @@ def main():
 
     def process_fen(fen: str):
         """Process given fen like doMove, undoMove, takebackPosition, handleSliding."""
+        latency.span('picochess', latency.origin())
         nonlocal last_legal_fens
         nonlocal searchmoves
         nonlocal legal_fens
@@ -376,11 +409,10 @@ def main():
             else:
                 game.pop()
                 logging.info('wrong color move -> sliding, reverting to: %s', game.fen())
-            legal_moves = list(game.legal_moves)
-            move = legal_moves[last_legal_fens.index(fen)]  # type: chess.Move
+            move = last_legal_fens[fen]  # type: chess.Move
             user_move(move, sliding=True)
             if interaction_mode in (Mode.NORMAL, Mode.BRAIN, Mode.REMOTE):
-                legal_fens = []
+                legal_fens = LegalFens()
             else:
                 legal_fens = compute_legal_fens(game.copy())
 
@@ -388,12 +420,11 @@ def main():
         elif fen in legal_fens:
             logging.info('standard move detected')
             # time_control.add_inc(game.turn)  # deactivated and moved to user_move() cause tc still running :-(
-            legal_moves = list(game.legal_moves)
-            move = legal_moves[legal_fens.index(fen)]  # type: chess.Move
+            move = legal_fens[fen]  # type: chess.Move
             user_move(move, sliding=False)
             last_legal_fens = legal_fens
             if interaction_mode in (Mode.NORMAL, Mode.BRAIN, Mode.REMOTE):
-                legal_fens = []
+                legal_fens = LegalFens()
             else:
                 legal_fens = compute_legal_fens(game.copy())
 
@@ -407,7 +438,7 @@ def main():
             done_move = chess.Move.null()
             game_end = check_game_state(game, play_mode)
             if game_end:
-                legal_fens = []
+                legal_fens = LegalFens()
                 DisplayMsg.show(game_end)
             else:
                 searchmoves.reset()
@@ -415,9 +446,22 @@ def main():
                 start_clock()
                 if interaction_mode == Mode.BRAIN:
                     brain(game, time_control)
+                prefetch_book()
 
                 legal_fens = compute_legal_fens(game.copy())
-            last_legal_fens = []
+            last_legal_fens = LegalFens()
+
+        # Player had done several moves quickly one after the other
+        elif fen in compute_reachable_fens():
+            moves = reachable_fens[fen]
+            logging.info('multi ply move detected: %s', moves)
+            game_copy = game.copy()
+            for move in moves:
+                game_copy.push(move)
+                process_fen(game_copy.board_fen())
+                if error_fen:
+                    break
+            handled_fen = not error_fen
 
         # Check if this is a previous legal position and allow user to restart from this position
         else:
@@ -454,7 +498,7 @@ def main():
         if not done_computer_fen:
             nonlocal play_mode, legal_fens, last_legal_fens
             legal_fens = compute_legal_fens(game.copy())
-            last_legal_fens = []
+            last_legal_fens = LegalFens()
         if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # @todo handle Mode.REMOTE too
             if done_computer_fen:
                 logging.debug('best move displayed, dont search and also keep play mode: %s', play_mode)
@@ -534,7 +578,8 @@ def main():
             ponder_mode = True
         elif interaction_mode in (Mode.ANALYSIS, Mode.KIBITZ, Mode.OBSERVE, Mode.PONDER):
             analyse_mode = True
-        engine.mode(ponder=ponder_mode, analyse=analyse_mode)
+        multipv = args.multipv if interaction_mode in (Mode.ANALYSIS, Mode.KIBITZ) else 1
+        engine.mode(ponder=ponder_mode, analyse=analyse_mode, multipv=multipv)
 
     def _dgt_serial_nr():
         DisplayMsg.show(Message.DGT_SERIAL_NR(number='dont_use'))
@@ -553,10 +598,20 @@ def main():
     parser.add_argument('-erk', '--engine-remote-key', type=str, help='key file for the remote engine server')
     parser.add_argument('-erh', '--engine-remote-home', type=str, help='engine home path for the remote engine server',
                         default='/opt/picochess')
+    parser.add_argument('-ens', '--engine-net-server', type=str,
+                        help='address (host:port or unix socket) of an engine server (see engineserver.py)')
+    parser.add_argument('-epm', '--engine-pool-memory', type=int, default=0,
+                        help='memory budget (MB) for keeping the used engines running (0 = quit them)')
+    parser.add_argument('-ecs', '--eval-cache-size', type=int, default=10000,
+                        help='how many position evaluations are kept (on disk) for revisited positions (0 = off)')
+    parser.add_argument('-mpv', '--multipv', type=int, default=1,
+                        help='number of candidate lines the engine reports in analysis & kibitz mode')
     parser.add_argument('-d', '--dgt-port', type=str,
                         help="enable dgt board on the given serial port such as '/dev/ttyUSB0'")
     parser.add_argument('-b', '--book', type=str, help="path of book such as 'books/b-flank.bin'",
                         default='books/h-varied.bin')
+    parser.add_argument('-nobl', '--disable-book-learning', action='store_true',
+                        help='dont avoid the book moves which lost the games against you')
     parser.add_argument('-t', '--time', type=str, default='5 0',
                         help="Time settings <FixSec> or <StMin IncSec> like '10'(move) or '5 0'(game) '3 2'(fischer). \
                         All values must be below 100")
@@ -603,6 +658,12 @@ def main():
     parser.add_argument('-noet', '--disable-et', action='store_true', help='some clocks need this to work - deprecated')
     parser.add_argument('-ss', '--slow-slide', type=int, default=0, choices=range(0, 10),
                         help='extra wait time factor for a stable board position (sliding detect)')
+    parser.add_argument('-sm', '--shared-messages', action='store_true',
+                        help='share one read-only message between all displays instead of deep copying it')
+    parser.add_argument('-rt', '--runtime', choices=['threads', 'asyncio'], default='threads',
+                        help='run the non blocking displays & timers as threads or inside one asyncio loop')
+    parser.add_argument('-ii', '--info-interval', type=float, default=0.5,
+                        help='minimal time in secs between two engine info updates on the displays (default=0.5)')
 
     args, unknown = parser.parse_known_args()
 
@@ -621,6 +682,10 @@ def main():
     logging.debug('startup parameters: %s', a_copy)
     if unknown:
         logging.warning('invalid parameter given %s', unknown)
+    utilities.shared_messages = args.shared_messages
+    utilities.info_interval = args.info_interval
+    if args.runtime == 'asyncio':
+        start_runtime_loop()
     # wire some dgt classes
     dgtboard = DgtBoard(args.dgt_port, args.disable_revelation_leds, args.dgtpi, args.disable_et, args.slow_slide)
     dgttranslate = DgtTranslate(args.beep_config, args.beep_some_level, args.language, version)
@@ -632,6 +697,9 @@ def main():
     time_text.beep = False
     # The class dgtDisplay fires Event (Observable) & DispatchDgt (Dispatcher)
     DgtDisplay(dgttranslate, dgtmenu, time_control).start()
+    RepeatedTimer(60, latency.log_summary).start()  # log the move latencies (only if new ones measured)
+    eval_cache.size = args.eval_cache_size
+    RepeatedTimer(60, eval_cache.save, blocking=True).start()
 
     # Create PicoTalker for speech output
     PicoTalkerDisplay(args.user_voice, args.computer_voice, args.speed_voice, args.enable_setpieces_voice).start()
@@ -663,6 +731,8 @@ def main():
                      sencryption=args.smtp_encryption, sfrom=args.smtp_from)
 
     PgnDisplay('games' + os.sep + args.pgn_file, emailer).start()
+    book_learning.enabled = not args.disable_book_learning
+    BookLearner(book_learning).start()
     if args.pgn_user:
         user_name = args.pgn_user
     else:
@@ -688,7 +758,7 @@ def main():
         # Gentlemen, start your engines...
         engine = UciEngine(file=engine_file, hostname=args.engine_remote_server, username=args.engine_remote_user,
                            key_file=args.engine_remote_key, password=args.engine_remote_pass,
-                           home=args.engine_remote_home)
+                           home=args.engine_remote_home, server=args.engine_net_server)
         try:
             engine_name = engine.get_name()
             break
@@ -696,6 +766,11 @@ def main():
             logging.error('engine %s not started', engine_file)
             engine_file = None
 
+    engine_pool = EnginePool(args.engine_pool_memory)
+    overhead = Overhead()
+    if args.engine_remote_server and not args.engine_net_server:
+        RepeatedTimer(60, ssh_pool.check, blocking=True).start()  # log the round trip & drop dead connections
+
     if engine_tries == 2:
         time.sleep(3)
         DisplayMsg.show(Message.ENGINE_FAIL())
@@ -711,12 +786,15 @@ def main():
     except ValueError:
         logging.warning('selected book not present, defaulting to %s', all_books[7]['file'])
         book_index = 7
-    bookreader = chess.polyglot.open_reader(all_books[book_index]['file'])
+    book_readers.open_all(all_books)
+    bookreader = book_readers.get(all_books[book_index]['file'])
     searchmoves = AlternativeMover()
     interaction_mode = Mode.NORMAL
     play_mode = PlayMode.USER_WHITE  # @todo handle Mode.REMOTE too
 
-    last_legal_fens = []
+    last_legal_fens = LegalFens()
+    reachable_fens = None
+    game_end_tracker = GameEndTracker()
     done_computer_fen = None
     done_move = chess.Move.null()
     game_declared = False  # User declared resignation or draw
@@ -744,396 +822,486 @@ def main():
                                            level_index=level_index,
                                            has_960=engine.has_chess960(), has_ponder=engine.has_ponder()))
 
-    ip_info_thread = threading.Timer(10, display_ip_info)  # give RaspberyPi 10sec time to startup its network devices
+    # give RaspberyPi 10sec time to startup its network devices
+    ip_info_thread = create_timer(10, display_ip_info, blocking=True)
     ip_info_thread.start()
 
-    fen_timer = threading.Timer(3, expired_fen_timer)
+    fen_timer = create_timer(3, expired_fen_timer)
     fen_timer_running = False
     error_fen = None
 
     pb_move = chess.Move.null()  # safes the best ponder move so far (for permanent brain use)
 
-    # Event loop
-    logging.info('evt_queue ready')
-    while True:
-        try:
-            event = evt_queue.get()
-        except queue.Empty:
-            pass
+    def _event_fen(event):
+        process_fen(event.fen)
+
+    def _event_keyboard_move(event):
+        move = event.move
+        logging.debug('keyboard move [%s]', move)
+        if move not in game.legal_moves:
+            logging.warning('illegal move. fen: [%s]', game.fen())
         else:
-            logging.debug('received event from evt_queue: %s', event)
-            if False:  # switch-case
-                pass
-            elif isinstance(event, Event.FEN):
-                process_fen(event.fen)
-
-            elif isinstance(event, Event.KEYBOARD_MOVE):
-                move = event.move
-                logging.debug('keyboard move [%s]', move)
-                if move not in game.legal_moves:
-                    logging.warning('illegal move. fen: [%s]', game.fen())
-                else:
-                    game_copy = game.copy()
-                    game_copy.push(move)
-                    fen = game_copy.board_fen()
-                    DisplayMsg.show(Message.DGT_FEN(fen=fen, raw=False))
-
-            elif isinstance(event, Event.LEVEL):
-                if event.options:
-                    engine.startup(event.options, False)
-                DisplayMsg.show(Message.LEVEL(level_text=event.level_text, level_name=event.level_name,
-                                              do_speak=bool(event.options)))
-                stop_fen_timer()
-
-            elif isinstance(event, Event.NEW_ENGINE):
-                old_file = engine.get_file()
-                old_options = {}
-                raw_options = engine.get_options()
-                for name, value in raw_options.items():  # transfer Option to string by using the "default" value
-                    old_options[name] = str(value.default)
-                engine_fallback = False
-                # Stop the old engine cleanly
-                stop_search()
-                # Closeout the engine process and threads
-                if engine.quit():
-                    # Load the new one and send args.
-                    # Local engines only
-                    engine = UciEngine(event.eng['file'])
-                    try:
-                        engine_name = engine.get_name()
-                    except AttributeError:
-                        # New engine failed to start, restart old engine
-                        logging.error('new engine failed to start, reverting to %s', old_file)
-                        engine_fallback = True
-                        event.options = old_options
-                        engine = UciEngine(old_file)
-                        try:
-                            engine_name = engine.get_name()
-                        except AttributeError:
-                            # Help - old engine failed to restart. There is no engine
-                            logging.error('no engines started')
-                            DisplayMsg.show(Message.ENGINE_FAIL())
-                            time.sleep(3)
-                            sys.exit(-1)
-                    engine.startup(event.options)
+            game_copy = game.copy()
+            game_copy.push(move)
+            fen = game_copy.board_fen()
+            DisplayMsg.show(Message.DGT_FEN(fen=fen, raw=False))
+
+    def _event_level(event):
+        if event.options:
+            engine.startup(event.options, False)
+        DisplayMsg.show(Message.LEVEL(level_text=event.level_text, level_name=event.level_name,
+                                      do_speak=bool(event.options)))
+        stop_fen_timer()
+
+    def _event_new_engine(event):
+        nonlocal engine
+        old_file = engine.get_file()
+        old_options = {}
+        raw_options = engine.get_options()
+        for name, value in raw_options.items():  # transfer Option to string by using the "default" value
+            old_options[name] = str(value.default)
+        engine_fallback = False
+        options = event.options
+        # Stop the old engine cleanly
+        stop_search()
+        # Closeout the engine process and threads (or park it in the pool)
+        if engine_pool.release(engine):
+            # Load the new one (or take it from the pool) and send args.
+            # Local engines only
+            engine = engine_pool.acquire(event.eng['file']) or UciEngine(event.eng['file'])
+            try:
+                engine_name = engine.get_name()
+            except AttributeError:
+                # New engine failed to start, restart old engine
+                logging.error('new engine failed to start, reverting to %s', old_file)
+                engine_fallback = True
+                options = old_options
+                engine = engine_pool.acquire(old_file) or UciEngine(old_file)
+                try:
+                    engine_name = engine.get_name()
+                except AttributeError:
+                    # Help - old engine failed to restart. There is no engine
+                    logging.error('no engines started')
+                    DisplayMsg.show(Message.ENGINE_FAIL())
+                    time.sleep(3)
+                    sys.exit(-1)
+            engine.startup(options)
+            engine.newgame(game.copy())
+            # All done - rock'n'roll
+            if interaction_mode == Mode.BRAIN and not engine.has_ponder():
+                logging.debug('new engine doesnt support brain mode, reverting to %s', old_file)
+                engine_fallback = True
+                if engine_pool.release(engine):
+                    engine = engine_pool.acquire(old_file) or UciEngine(old_file)
+                    engine.startup(old_options)
                     engine.newgame(game.copy())
-                    # All done - rock'n'roll
-                    if interaction_mode == Mode.BRAIN and not engine.has_ponder():
-                        logging.debug('new engine doesnt support brain mode, reverting to %s', old_file)
-                        engine_fallback = True
-                        if engine.quit():
-                            engine = UciEngine(old_file)
-                            engine.startup(old_options)
-                            engine.newgame(game.copy())
-                        else:
-                            logging.error('engine shutdown failure')
-                    engine_mode()
-                    if engine_fallback:
-                        msg = Message.ENGINE_FAIL()
-                    else:
-                        searchmoves.reset()
-                        msg = Message.ENGINE_READY(eng=event.eng, engine_name=engine_name,
-                                                   eng_text=event.eng_text, has_levels=engine.has_levels(),
-                                                   has_960=engine.has_chess960(), has_ponder=engine.has_ponder(),
-                                                   show_ok=event.show_ok)
-                    # Schedule cleanup of old objects
-                    gc.collect()
-                    set_wait_state(msg, not engine_fallback)
-                    if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # engine isnt started/searching => stop the clock
-                        stop_clock()
                 else:
                     logging.error('engine shutdown failure')
-                    DisplayMsg.show(Message.ENGINE_FAIL())
-                if not engine_fallback:  # here dont care if engine supports pondering, cause Mode.NORMAL from startup
-                    write_picochess_ini('engine', event.eng['file'])
-
-            elif isinstance(event, Event.SETUP_POSITION):
-                logging.debug('setting up custom fen: %s', event.fen)
-                uci960 = event.uci960
-
-                if game.move_stack:
-                    if not (game.is_game_over() or game_declared):
-                        result = GameResult.ABORT
-                        DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
-                game = chess.Board(event.fen, uci960)
-                # see new_game
-                stop_search_and_clock()
-                if engine.has_chess960():
-                    engine.option('UCI_Chess960', uci960)
-                    engine.send()
-                engine.newgame(game.copy())
-                done_computer_fen = None
-                done_move = pb_move = chess.Move.null()
-                time_control.reset()
+            engine_mode()
+            if engine_fallback:
+                msg = Message.ENGINE_FAIL()
+            else:
                 searchmoves.reset()
-                game_declared = False
-                set_wait_state(Message.START_NEW_GAME(game=game.copy(), newgame=True))
-
-            elif isinstance(event, Event.NEW_GAME):
-                newgame = game.move_stack or (game.chess960_pos() != event.pos960)
-                if newgame:
-                    logging.debug('starting a new game with code: %s', event.pos960)
-                    uci960 = event.pos960 != 518
-
-                    if not (game.is_game_over() or game_declared):
-                        result = GameResult.ABORT
-                        DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
-
-                    game = chess.Board()
-                    if uci960:
-                        game.set_chess960_pos(event.pos960)
-                    # see setup_position
-                    stop_search_and_clock()
-                    if engine.has_chess960():
-                        engine.option('UCI_Chess960', uci960)
-                        engine.send()
-                    engine.newgame(game.copy())
-                    done_computer_fen = None
-                    done_move = pb_move = chess.Move.null()
-                    time_control.reset()
-                    searchmoves.reset()
-                    game_declared = False
-                    set_wait_state(Message.START_NEW_GAME(game=game.copy(), newgame=newgame))
-                else:
-                    logging.debug('no need to start a new game')
-                    DisplayMsg.show(Message.START_NEW_GAME(game=game.copy(), newgame=newgame))
-
-            elif isinstance(event, Event.PAUSE_RESUME):
-                if engine.is_thinking():
-                    stop_clock()
-                    engine.stop(show_best=True)
-                elif not done_computer_fen:
-                    if time_control.internal_running():
-                        stop_clock()
-                    else:
-                        start_clock()
-                else:
-                    logging.debug('best move displayed, dont start/stop clock')
-
-            elif isinstance(event, Event.ALTERNATIVE_MOVE):
-                if done_computer_fen:
-                    done_computer_fen = None
-                    done_move = chess.Move.null()
-                    if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # @todo handle Mode.REMOTE too
-                        if time_control.mode == TimeMode.FIXED:
-                            time_control.reset()
-                        # set computer to move - in case the user just changed the engine
-                        play_mode = PlayMode.USER_WHITE if game.turn == chess.BLACK else PlayMode.USER_BLACK
-                        if not check_game_state(game, play_mode):
-                            think(game, time_control, Message.ALTERNATIVE_MOVE(game=game.copy(), play_mode=play_mode))
-                    else:
-                        logging.warning('wrong function call [alternative]! mode: %s', interaction_mode)
-
-            elif isinstance(event, Event.SWITCH_SIDES):
-                if interaction_mode in (Mode.NORMAL, Mode.BRAIN):
-                    if not engine.is_waiting():
-                        stop_search_and_clock()
-
-                    last_legal_fens = []
-                    best_move_displayed = done_computer_fen
-                    if best_move_displayed:
-                        move = done_move
-                        done_computer_fen = None
-                        done_move = pb_move = chess.Move.null()
-                    else:
-                        move = chess.Move.null()  # not really needed
-
-                    play_mode = PlayMode.USER_WHITE if play_mode == PlayMode.USER_BLACK else PlayMode.USER_BLACK
-                    text = play_mode.value  # type: str
-                    msg = Message.PLAY_MODE(play_mode=play_mode, play_mode_text=dgttranslate.text(text))
+                msg = Message.ENGINE_READY(eng=event.eng, engine_name=engine_name,
+                                           eng_text=event.eng_text, has_levels=engine.has_levels(),
+                                           has_960=engine.has_chess960(), has_ponder=engine.has_ponder(),
+                                           show_ok=event.show_ok)
+            # Schedule cleanup of old objects
+            gc.collect()
+            set_wait_state(msg, not engine_fallback)
+            if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # engine isnt started/searching => stop the clock
+                stop_clock()
+        else:
+            logging.error('engine shutdown failure')
+            DisplayMsg.show(Message.ENGINE_FAIL())
+        if not engine_fallback:  # here dont care if engine supports pondering, cause Mode.NORMAL from startup
+            write_picochess_ini('engine', event.eng['file'])
 
-                    if time_control.mode == TimeMode.FIXED:
-                        time_control.reset()
+    def _event_setup_position(event):
+        nonlocal game
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal pb_move
+        nonlocal game_declared
+        logging.debug('setting up custom fen: %s', event.fen)
+        uci960 = event.uci960
 
-                    legal_fens = []
-                    game_end = check_game_state(game, play_mode)
-                    if game_end:
-                        DisplayMsg.show(msg)
-                    else:
-                        cond1 = game.turn == chess.WHITE and play_mode == PlayMode.USER_BLACK
-                        cond2 = game.turn == chess.BLACK and play_mode == PlayMode.USER_WHITE
-                        if cond1 or cond2:
-                            time_control.reset_start_time()
-                            think(game, time_control, msg)
-                        else:
-                            DisplayMsg.show(msg)
-                            start_clock()
-                            legal_fens = compute_legal_fens(game.copy())
+        if game.move_stack:
+            if not (game.is_game_over() or game_declared):
+                result = GameResult.ABORT
+                DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
+        game = chess.Board(event.fen, uci960)
+        # see new_game
+        stop_search_and_clock()
+        if engine.has_chess960():
+            engine.option('UCI_Chess960', uci960)
+            engine.send()
+        engine.newgame(game.copy())
+        done_computer_fen = None
+        done_move = pb_move = chess.Move.null()
+        time_control.reset()
+        searchmoves.reset()
+        game_declared = False
+        set_wait_state(Message.START_NEW_GAME(game=game.copy(), newgame=True))
+
+    def _event_new_game(event):
+        nonlocal game
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal pb_move
+        nonlocal game_declared
+        newgame = game.move_stack or (game.chess960_pos() != event.pos960)
+        if newgame:
+            logging.debug('starting a new game with code: %s', event.pos960)
+            uci960 = event.pos960 != 518
 
-                    if best_move_displayed:
-                        DisplayMsg.show(Message.SWITCH_SIDES(game=game.copy(), move=move))
+            if not (game.is_game_over() or game_declared):
+                result = GameResult.ABORT
+                DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
 
-            elif isinstance(event, Event.DRAWRESIGN):
-                if not game_declared:  # in case user leaves kings in place while moving other pieces
-                    stop_search_and_clock()
-                    DisplayMsg.show(Message.GAME_ENDS(result=event.result, play_mode=play_mode, game=game.copy()))
-                    game_declared = True
-                    stop_fen_timer()
+            game = chess.Board()
+            if uci960:
+                game.set_chess960_pos(event.pos960)
+            # see setup_position
+            stop_search_and_clock()
+            if engine.has_chess960():
+                engine.option('UCI_Chess960', uci960)
+                engine.send()
+            engine.newgame(game.copy())
+            done_computer_fen = None
+            done_move = pb_move = chess.Move.null()
+            time_control.reset()
+            searchmoves.reset()
+            game_declared = False
+            set_wait_state(Message.START_NEW_GAME(game=game.copy(), newgame=newgame))
+            prefetch_book()
+        else:
+            logging.debug('no need to start a new game')
+            DisplayMsg.show(Message.START_NEW_GAME(game=game.copy(), newgame=newgame))
 
-            elif isinstance(event, Event.REMOTE_MOVE):
-                if interaction_mode == Mode.REMOTE and is_not_user_turn(game.turn):
-                    stop_search_and_clock()
-                    DisplayMsg.show(Message.COMPUTER_MOVE(move=event.move, ponder=chess.Move.null(), game=game.copy(),
-                                                          wait=False))
-                    game_copy = game.copy()
-                    game_copy.push(event.move)
-                    done_computer_fen = game_copy.board_fen()
-                    done_move = event.move
-                    pb_move = chess.Move.null()
-                else:
-                    logging.warning('wrong function call [remote]! mode: %s turn: %s', interaction_mode, game.turn)
-
-            elif isinstance(event, Event.BEST_MOVE):
-                if interaction_mode in (Mode.NORMAL, Mode.BRAIN) and is_not_user_turn(game.turn):
-                    # clock must be stopped BEFORE the "book_move" event cause SetNRun resets the clock display
-                    stop_clock()
-                    # @todo 8/8/R6P/1R6/7k/2B2K1p/8/8 and sliding Ra6 over a5 to a4 - handle this in correct way!!
-                    if game.is_game_over():
-                        logging.warning('illegal move on game_end - sliding? move: %s fen: %s', event.move, game.fen())
-                    else:
-                        if event.inbook:
-                            DisplayMsg.show(Message.BOOK_MOVE())
-                        searchmoves.add(event.move)
-                        DisplayMsg.show(Message.COMPUTER_MOVE(move=event.move, ponder=event.ponder, game=game.copy(),
-                                                              wait=event.inbook))
-                        game_copy = game.copy()
-                        game_copy.push(event.move)
-                        done_computer_fen = game_copy.board_fen()
-                        done_move = event.move
-                        brain_book = interaction_mode == Mode.BRAIN and event.inbook
-                        pb_move = event.ponder if event.ponder and not brain_book else chess.Move.null()
-                else:
-                    logging.warning('wrong function call [best]! mode: %s turn: %s', interaction_mode, game.turn)
+    def _event_pause_resume(event):
+        if engine.is_thinking():
+            stop_clock()
+            engine.stop(show_best=True)
+        elif not done_computer_fen:
+            if time_control.internal_running():
+                stop_clock()
+            else:
+                start_clock()
+        else:
+            logging.debug('best move displayed, dont start/stop clock')
 
-            elif isinstance(event, Event.NEW_PV):
-                if interaction_mode == Mode.BRAIN and engine.is_pondering():
-                    logging.debug('in brain mode and pondering ignore pv %s', event.pv[:3])
-                else:
-                    # illegal moves can occur if a pv from the engine arrives at the same time as an user move
-                    if game.is_legal(event.pv[0]):
-                        DisplayMsg.show(Message.NEW_PV(pv=event.pv, mode=interaction_mode, game=game.copy()))
-                    else:
-                        logging.info('illegal move can not be displayed. move: %s fen: %s', event.pv[0], game.fen())
-                        logging.info('engine status: t:%s p:%s', engine.is_thinking(), engine.is_pondering())
+    def _event_alternative_move(event):
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal play_mode
+        if done_computer_fen:
+            done_computer_fen = None
+            done_move = chess.Move.null()
+            if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # @todo handle Mode.REMOTE too
+                if time_control.mode == TimeMode.FIXED:
+                    time_control.reset()
+                # set computer to move - in case the user just changed the engine
+                play_mode = PlayMode.USER_WHITE if game.turn == chess.BLACK else PlayMode.USER_BLACK
+                if not check_game_state(game, play_mode):
+                    think(game, time_control, Message.ALTERNATIVE_MOVE(game=game.copy(), play_mode=play_mode))
+            else:
+                logging.warning('wrong function call [alternative]! mode: %s', interaction_mode)
 
-            elif isinstance(event, Event.NEW_SCORE):
-                if interaction_mode == Mode.BRAIN and engine.is_pondering():
-                    logging.debug('in brain mode and pondering, ignore score %s', event.score)
-                else:
-                    DisplayMsg.show(Message.NEW_SCORE(score=event.score, mate=event.mate, mode=interaction_mode,
-                                                      turn=game.turn))
+    def _event_switch_sides(event):
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal pb_move
+        nonlocal last_legal_fens
+        nonlocal legal_fens
+        nonlocal play_mode
+        if interaction_mode in (Mode.NORMAL, Mode.BRAIN):
+            if not engine.is_waiting():
+                stop_search_and_clock()
 
-            elif isinstance(event, Event.NEW_DEPTH):
-                if interaction_mode == Mode.BRAIN and engine.is_pondering():
-                    logging.debug('in brain mode and pondering, ignore depth %s', event.depth)
-                else:
-                    DisplayMsg.show(Message.NEW_DEPTH(depth=event.depth))
+            last_legal_fens = LegalFens()
+            best_move_displayed = done_computer_fen
+            if best_move_displayed:
+                move = done_move
+                done_computer_fen = None
+                done_move = pb_move = chess.Move.null()
+            else:
+                move = chess.Move.null()  # not really needed
 
-            elif isinstance(event, Event.START_SEARCH):
-                DisplayMsg.show(Message.SEARCH_STARTED())
+            play_mode = PlayMode.USER_WHITE if play_mode == PlayMode.USER_BLACK else PlayMode.USER_BLACK
+            text = play_mode.value  # type: str
+            msg = Message.PLAY_MODE(play_mode=play_mode, play_mode_text=dgttranslate.text(text))
 
-            elif isinstance(event, Event.STOP_SEARCH):
-                DisplayMsg.show(Message.SEARCH_STOPPED())
+            if time_control.mode == TimeMode.FIXED:
+                time_control.reset()
 
-            elif isinstance(event, Event.SET_INTERACTION_MODE):
-                if event.mode not in (Mode.NORMAL, Mode.REMOTE) and done_computer_fen:  # @todo check why still needed
-                    dgtmenu.set_mode(interaction_mode)  # undo the button4 stuff
-                    logging.warning('mode cant be changed to a pondering mode as long as a move is displayed')
-                    mode_text = dgttranslate.text('Y10_errormode')
-                    msg = Message.INTERACTION_MODE(mode=interaction_mode, mode_text=mode_text, show_ok=False)
-                    DisplayMsg.show(msg)
-                else:
-                    stop_search_and_clock()
-                    interaction_mode = event.mode
-                    engine_mode()
-                    msg = Message.INTERACTION_MODE(mode=event.mode, mode_text=event.mode_text, show_ok=event.show_ok)
-                    set_wait_state(msg)  # dont clear searchmoves here
-
-            elif isinstance(event, Event.SET_OPENING_BOOK):
-                write_picochess_ini('book', event.book['file'])
-                logging.debug('changing opening book [%s]', event.book['file'])
-                bookreader = chess.polyglot.open_reader(event.book['file'])
-                DisplayMsg.show(Message.OPENING_BOOK(book_text=event.book_text, show_ok=event.show_ok))
-                stop_fen_timer()
-
-            elif isinstance(event, Event.SET_TIME_CONTROL):
-                time_control.stop_internal(log=False)
-                tc_init = event.tc_init
-                time_control = TimeControl(**tc_init)
-                if time_control.mode == TimeMode.BLITZ:
-                    write_picochess_ini('time', '{:d} 0'.format(tc_init['blitz']))
-                elif time_control.mode == TimeMode.FISCHER:
-                    write_picochess_ini('time', '{:d} {:d}'.format(tc_init['blitz'], tc_init['fischer']))
-                elif time_control.mode == TimeMode.FIXED:
-                    write_picochess_ini('time', '{:d}'.format(tc_init['fixed']))
-                text = Message.TIME_CONTROL(time_text=event.time_text, show_ok=event.show_ok, tc_init=tc_init)
-                DisplayMsg.show(text)
-                stop_fen_timer()
-
-            elif isinstance(event, Event.CLOCK_TIME):
-                if dgtdispatcher.is_prio_device(event.dev, event.connect):  # transfer only the most prio clock's time
-                    logging.debug('setting tc clock time - prio: %s w:%s b:%s', event.dev,
-                                  hms_time(event.time_white), hms_time(event.time_black))
-                    time_control.set_clock_times(white_time=event.time_white, black_time=event.time_black)
-                    # find out, if we are in bullet time (<=60secs on users clock or lowest time if user side unknown)
-                    time_u = event.time_white
-                    time_c = event.time_black
-                    if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # @todo handle Mode.REMOTE too
-                        if play_mode == PlayMode.USER_BLACK:
-                            time_u, time_c = time_c, time_u
-                    else:  # here, we use the lowest time
-                        if time_c < time_u:
-                            time_u, time_c = time_c, time_u
-                    dgtboard.low_time = time_u <= 60  # this is used for "piece sliding" factor
-                    DisplayMsg.show(Message.CLOCK_TIME(time_white=event.time_white, time_black=event.time_black))
+            legal_fens = LegalFens()
+            game_end = check_game_state(game, play_mode)
+            if game_end:
+                DisplayMsg.show(msg)
+            else:
+                cond1 = game.turn == chess.WHITE and play_mode == PlayMode.USER_BLACK
+                cond2 = game.turn == chess.BLACK and play_mode == PlayMode.USER_WHITE
+                if cond1 or cond2:
+                    time_control.reset_start_time()
+                    think(game, time_control, msg)
                 else:
-                    logging.debug('ignore clock time - too low prio: %s', event.dev)
+                    DisplayMsg.show(msg)
+                    start_clock()
+                    legal_fens = compute_legal_fens(game.copy())
 
-            elif isinstance(event, Event.OUT_OF_TIME):
-                stop_search_and_clock()
-                result = GameResult.OUT_OF_TIME
-                DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
+            if best_move_displayed:
+                DisplayMsg.show(Message.SWITCH_SIDES(game=game.copy(), move=move))
 
-            elif isinstance(event, Event.SHUTDOWN):
-                result = GameResult.ABORT
-                DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
-                DisplayMsg.show(Message.SYSTEM_SHUTDOWN())
-                shutdown(args.dgtpi, dev=event.dev)
+    def _event_drawresign(event):
+        nonlocal game_declared
+        if not game_declared:  # in case user leaves kings in place while moving other pieces
+            stop_search_and_clock()
+            DisplayMsg.show(Message.GAME_ENDS(result=event.result, play_mode=play_mode, game=game.copy()))
+            game_declared = True
+            stop_fen_timer()
 
-            elif isinstance(event, Event.REBOOT):
-                result = GameResult.ABORT
-                DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
-                DisplayMsg.show(Message.SYSTEM_REBOOT())
-                reboot(args.dgtpi, dev=event.dev)
+    def _event_remote_move(event):
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal pb_move
+        if interaction_mode == Mode.REMOTE and is_not_user_turn(game.turn):
+            stop_search_and_clock()
+            DisplayMsg.show(Message.COMPUTER_MOVE(move=event.move, ponder=chess.Move.null(), game=game.copy(),
+                                                  wait=False))
+            game_copy = game.copy()
+            game_copy.push(event.move)
+            done_computer_fen = game_copy.board_fen()
+            done_move = event.move
+            pb_move = chess.Move.null()
+        else:
+            logging.warning('wrong function call [remote]! mode: %s turn: %s', interaction_mode, game.turn)
 
-            elif isinstance(event, Event.EMAIL_LOG):
-                email_logger = Emailer(email=args.email, mailgun_key=args.mailgun_key)
-                email_logger.set_smtp(sserver=args.smtp_server, suser=args.smtp_user, spass=args.smtp_pass,
-                                      sencryption=args.smtp_encryption, sfrom=args.smtp_from)
-                body = 'You probably want to forward this file to a picochess developer ;-)'
-                email_logger.send('Picochess LOG', body, '/opt/picochess/logs/{}'.format(args.log_file))
+    def _event_best_move(event):
+        nonlocal done_computer_fen
+        nonlocal done_move
+        nonlocal pb_move
+        if interaction_mode in (Mode.NORMAL, Mode.BRAIN) and is_not_user_turn(game.turn):
+            # clock must be stopped BEFORE the "book_move" event cause SetNRun resets the clock display
+            used_time = stop_clock()
+            if interaction_mode == Mode.NORMAL and not event.inbook:  # brain searches started before the clock
+                overhead.add(overhead_key(), used_time, engine.get_search_time())
+            # @todo 8/8/R6P/1R6/7k/2B2K1p/8/8 and sliding Ra6 over a5 to a4 - handle this in correct way!!
+            if game.is_game_over():
+                logging.warning('illegal move on game_end - sliding? move: %s fen: %s', event.move, game.fen())
+            else:
+                if event.inbook:
+                    DisplayMsg.show(Message.BOOK_MOVE())
+                searchmoves.add(event.move)
+                DisplayMsg.show(Message.COMPUTER_MOVE(move=event.move, ponder=event.ponder, game=game.copy(),
+                                                      wait=event.inbook))
+                game_copy = game.copy()
+                game_copy.push(event.move)
+                done_computer_fen = game_copy.board_fen()
+                done_move = event.move
+                brain_book = interaction_mode == Mode.BRAIN and event.inbook
+                pb_move = event.ponder if event.ponder and not brain_book else chess.Move.null()
+        else:
+            logging.warning('wrong function call [best]! mode: %s turn: %s', interaction_mode, game.turn)
 
-            elif isinstance(event, Event.SET_VOICE):
-                DisplayMsg.show(Message.SET_VOICE(type=event.type, lang=event.lang, speaker=event.speaker,
-                                                  speed=event.speed))
+    def _event_new_pv(event):
+        if interaction_mode == Mode.BRAIN and engine.is_pondering():
+            logging.debug('in brain mode and pondering ignore pv %s', event.pv[:3])
+        else:
+            # illegal moves can occur if a pv from the engine arrives at the same time as an user move
+            if game.is_legal(event.pv[0]):
+                DisplayMsg.show(Message.NEW_PV(pv=event.pv, mode=interaction_mode, game=game.copy()))
+            else:
+                logging.info('illegal move can not be displayed. move: %s fen: %s', event.pv[0], game.fen())
+                logging.info('engine status: t:%s p:%s', engine.is_thinking(), engine.is_pondering())
 
-            elif isinstance(event, Event.KEYBOARD_BUTTON):
-                DisplayMsg.show(Message.DGT_BUTTON(button=event.button, dev=event.dev))
+    def _event_new_score(event):
+        if interaction_mode == Mode.BRAIN and engine.is_pondering():
+            logging.debug('in brain mode and pondering, ignore score %s', event.score)
+        else:
+            DisplayMsg.show(Message.NEW_SCORE(score=event.score, mate=event.mate, mode=interaction_mode,
+                                              turn=game.turn))
 
-            elif isinstance(event, Event.KEYBOARD_FEN):
-                DisplayMsg.show(Message.DGT_FEN(fen=event.fen, raw=False))
+    def _event_new_multipv(event):
+        if interaction_mode == Mode.BRAIN and engine.is_pondering():
+            logging.debug('in brain mode and pondering, ignore multipv')
+        else:
+            # same as for a pv: drop the lines already outdated by an user move
+            lines = [line for line in event.lines if game.is_legal(line['pv'][0])]
+            if lines:
+                DisplayMsg.show(Message.NEW_MULTIPV(lines=lines, mode=interaction_mode, game=game.copy()))
 
-            elif isinstance(event, Event.EXIT_MENU):
-                DisplayMsg.show(Message.EXIT_MENU())
+    def _event_engine_recovered(event):
+        DisplayMsg.show(Message.ENGINE_RECOVERED(msecs=event.msecs))
 
-            elif isinstance(event, Event.UPDATE_PICO):
-                DisplayMsg.show(Message.UPDATE_PICO())
-                checkout_tag(event.tag)
-                DisplayMsg.show(Message.EXIT_MENU())
+    def _event_new_depth(event):
+        if interaction_mode == Mode.BRAIN and engine.is_pondering():
+            logging.debug('in brain mode and pondering, ignore depth %s', event.depth)
+        else:
+            DisplayMsg.show(Message.NEW_DEPTH(depth=event.depth))
+
+    def _event_start_search(event):
+        DisplayMsg.show(Message.SEARCH_STARTED())
+
+    def _event_stop_search(event):
+        DisplayMsg.show(Message.SEARCH_STOPPED())
+
+    def _event_set_interaction_mode(event):
+        nonlocal interaction_mode
+        if event.mode not in (Mode.NORMAL, Mode.REMOTE) and done_computer_fen:  # @todo check why still needed
+            dgtmenu.set_mode(interaction_mode)  # undo the button4 stuff
+            logging.warning('mode cant be changed to a pondering mode as long as a move is displayed')
+            mode_text = dgttranslate.text('Y10_errormode')
+            msg = Message.INTERACTION_MODE(mode=interaction_mode, mode_text=mode_text, show_ok=False)
+            DisplayMsg.show(msg)
+        else:
+            stop_search_and_clock()
+            interaction_mode = event.mode
+            engine_mode()
+            msg = Message.INTERACTION_MODE(mode=event.mode, mode_text=event.mode_text, show_ok=event.show_ok)
+            set_wait_state(msg)  # dont clear searchmoves here
+
+    def _event_set_opening_book(event):
+        nonlocal bookreader
+        write_picochess_ini('book', event.book['file'])
+        logging.debug('changing opening book [%s]', event.book['file'])
+        bookreader = book_readers.get(event.book['file'])
+        searchmoves.prefetch.reset()
+        DisplayMsg.show(Message.OPENING_BOOK(book_text=event.book_text, show_ok=event.show_ok))
+        stop_fen_timer()
 
-            elif isinstance(event, Event.REMOTE_ROOM):
-                DisplayMsg.show(Message.REMOTE_ROOM(inside=event.inside))
+    def _event_set_time_control(event):
+        nonlocal time_control
+        time_control.stop_internal(log=False)
+        tc_init = event.tc_init
+        time_control = TimeControl(**tc_init)
+        if time_control.mode == TimeMode.BLITZ:
+            write_picochess_ini('time', '{:d} 0'.format(tc_init['blitz']))
+        elif time_control.mode == TimeMode.FISCHER:
+            write_picochess_ini('time', '{:d} {:d}'.format(tc_init['blitz'], tc_init['fischer']))
+        elif time_control.mode == TimeMode.FIXED:
+            write_picochess_ini('time', '{:d}'.format(tc_init['fixed']))
+        text = Message.TIME_CONTROL(time_text=event.time_text, show_ok=event.show_ok, tc_init=tc_init)
+        DisplayMsg.show(text)
+        stop_fen_timer()
+
+    def _event_clock_time(event):
+        if dgtdispatcher.is_prio_device(event.dev, event.connect):  # transfer only the most prio clock's time
+            logging.debug('setting tc clock time - prio: %s w:%s b:%s', event.dev,
+                          hms_time(event.time_white), hms_time(event.time_black))
+            time_control.set_clock_times(white_time=event.time_white, black_time=event.time_black)
+            # find out, if we are in bullet time (<=60secs on users clock or lowest time if user side unknown)
+            time_u = event.time_white
+            time_c = event.time_black
+            if interaction_mode in (Mode.NORMAL, Mode.BRAIN):  # @todo handle Mode.REMOTE too
+                if play_mode == PlayMode.USER_BLACK:
+                    time_u, time_c = time_c, time_u
+            else:  # here, we use the lowest time
+                if time_c < time_u:
+                    time_u, time_c = time_c, time_u
+            dgtboard.low_time = time_u <= 60  # this is used for "piece sliding" factor
+            DisplayMsg.show(Message.CLOCK_TIME(time_white=event.time_white, time_black=event.time_black))
+        else:
+            logging.debug('ignore clock time - too low prio: %s', event.dev)
+
+    def _event_out_of_time(event):
+        stop_search_and_clock()
+        result = GameResult.OUT_OF_TIME
+        DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
+
+    def _event_shutdown(event):
+        result = GameResult.ABORT
+        DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
+        DisplayMsg.show(Message.SYSTEM_SHUTDOWN())
+        eval_cache.save()
+        shutdown(args.dgtpi, dev=event.dev)
+
+    def _event_reboot(event):
+        result = GameResult.ABORT
+        DisplayMsg.show(Message.GAME_ENDS(result=result, play_mode=play_mode, game=game.copy()))
+        DisplayMsg.show(Message.SYSTEM_REBOOT())
+        eval_cache.save()
+        reboot(args.dgtpi, dev=event.dev)
+
+    def _event_email_log(event):
+        email_logger = Emailer(email=args.email, mailgun_key=args.mailgun_key)
+        email_logger.set_smtp(sserver=args.smtp_server, suser=args.smtp_user, spass=args.smtp_pass,
+                              sencryption=args.smtp_encryption, sfrom=args.smtp_from)
+        body = 'You probably want to forward this file to a picochess developer ;-)'
+        email_logger.send('Picochess LOG', body, '/opt/picochess/logs/{}'.format(args.log_file))
+
+    def _event_set_voice(event):
+        DisplayMsg.show(Message.SET_VOICE(type=event.type, lang=event.lang, speaker=event.speaker,
+                                          speed=event.speed))
+
+    def _event_keyboard_button(event):
+        DisplayMsg.show(Message.DGT_BUTTON(button=event.button, dev=event.dev))
+
+    def _event_keyboard_fen(event):
+        DisplayMsg.show(Message.DGT_FEN(fen=event.fen, raw=False))
+
+    def _event_exit_menu(event):
+        DisplayMsg.show(Message.EXIT_MENU())
+
+    def _event_update_pico(event):
+        DisplayMsg.show(Message.UPDATE_PICO())
+        checkout_tag(event.tag)
+        DisplayMsg.show(Message.EXIT_MENU())
+
+    def _event_remote_room(event):
+        DisplayMsg.show(Message.REMOTE_ROOM(inside=event.inside))
+
+    # the event classes are unique per event type => dispatch by type instead of an isinstance() chain
+    event_handlers = {
+        Event.FEN: _event_fen,
+        Event.KEYBOARD_MOVE: _event_keyboard_move,
+        Event.LEVEL: _event_level,
+        Event.NEW_ENGINE: _event_new_engine,
+        Event.SETUP_POSITION: _event_setup_position,
+        Event.NEW_GAME: _event_new_game,
+        Event.PAUSE_RESUME: _event_pause_resume,
+        Event.ALTERNATIVE_MOVE: _event_alternative_move,
+        Event.SWITCH_SIDES: _event_switch_sides,
+        Event.DRAWRESIGN: _event_drawresign,
+        Event.REMOTE_MOVE: _event_remote_move,
+        Event.BEST_MOVE: _event_best_move,
+        Event.NEW_PV: _event_new_pv,
+        Event.NEW_SCORE: _event_new_score,
+        Event.NEW_DEPTH: _event_new_depth,
+        Event.NEW_MULTIPV: _event_new_multipv,
+        Event.ENGINE_RECOVERED: _event_engine_recovered,
+        Event.START_SEARCH: _event_start_search,
+        Event.STOP_SEARCH: _event_stop_search,
+        Event.SET_INTERACTION_MODE: _event_set_interaction_mode,
+        Event.SET_OPENING_BOOK: _event_set_opening_book,
+        Event.SET_TIME_CONTROL: _event_set_time_control,
+        Event.CLOCK_TIME: _event_clock_time,
+        Event.OUT_OF_TIME: _event_out_of_time,
+        Event.SHUTDOWN: _event_shutdown,
+        Event.REBOOT: _event_reboot,
+        Event.EMAIL_LOG: _event_email_log,
+        Event.SET_VOICE: _event_set_voice,
+        Event.KEYBOARD_BUTTON: _event_keyboard_button,
+        Event.KEYBOARD_FEN: _event_keyboard_fen,
+        Event.EXIT_MENU: _event_exit_menu,
+        Event.UPDATE_PICO: _event_update_pico,
+        Event.REMOTE_ROOM: _event_remote_room
+    }
 
+    # Event loop
+    logging.info('evt_queue ready')
+    while True:
+        try:
+            event = evt_queue.get()
+        except queue.Empty:
+            pass
+        else:
+            logging.debug('received event from evt_queue: %s', event)
+            event_handler = event_handlers.get(type(event))
+            if event_handler:
+                latency.begin(event.get_origin())
+                event_handler(event)
+                latency.finish()
             else:  # Default
                 logging.warning('event not handled : [%s]', event)
 
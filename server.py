@@ -28,6 +28,8 @@ import tornado.wsgi
 from tornado.ioloop import IOLoop
 from tornado.websocket import WebSocketHandler
 
+import latency
+import utilities
 from utilities import Observable, DisplayMsg, hms_time, RepeatedTimer
 from web.picoweb import picoweb as pw
 
@@ -150,6 +152,8 @@ class InfoHandler(ServerRequestHandler):
         if action == 'get_clock_text':
             if 'clock_text' in self.shared:
                 self.write(self.shared['clock_text'])
+        if action == 'get_latency':
+            self.write(latency.summary())
 
 
 class ChessBoardHandler(ServerRequestHandler):
@@ -175,7 +179,15 @@ class WebServer(threading.Thread):
             (r'/channel', ChannelHandler, dict(shared=shared)),
             (r'.*', tornado.web.FallbackHandler, {'fallback': wsgi_app})
         ])
-        application.listen(port)
+        if utilities.runtime_loop:
+            IOLoop.instance().add_callback(application.listen, port)
+        else:
+            application.listen(port)
+
+    def start(self):
+        """Start the IOLoop thread - not needed if tornado runs inside the asyncio runtime loop."""
+        if not utilities.runtime_loop:
+            super(WebServer, self).start()
 
     def run(self):
         """Call by threading.Thread start() function."""
@@ -187,6 +199,8 @@ class WebVr(DgtIface):
 
     """Handle the web (clock) communication."""
 
+    runs_on_loop = True
+
     def __init__(self, shared, dgtboard: DgtBoard):
         super(WebVr, self).__init__(dgtboard)
         self.shared = shared
@@ -348,16 +362,48 @@ class WebVr(DgtIface):
         """Return name."""
         return 'web'
 
+    def _process_web_message(self, msg):
+        self._process_message(msg)
+        if self.get_name() in msg.devs:
+            latency.span('web', msg.get_origin())  # the clock update is written to the web clients
+
     def _create_task(self, msg):
-        IOLoop.instance().add_callback(callback=lambda: self._process_message(msg))
+        IOLoop.instance().add_callback(callback=lambda: self._process_web_message(msg))
 
 
 class WebDisplay(DisplayMsg, threading.Thread):
+
+    runs_on_loop = True
+
     def __init__(self, shared):
         super(WebDisplay, self).__init__()
         self.shared = shared
         self.starttime = datetime.datetime.now().strftime('%H:%M:%S')
 
+        self.handlers = {
+            Message.START_NEW_GAME: self._process_start_new_game,
+            Message.IP_INFO: self._process_ip_info,
+            Message.SYSTEM_INFO: self._process_system_info,
+            Message.ENGINE_STARTUP: self._process_engine_startup,
+            Message.ENGINE_READY: self._process_engine_ready,
+            Message.STARTUP_INFO: self._process_startup_info,
+            Message.OPENING_BOOK: self._process_opening_book,
+            Message.INTERACTION_MODE: self._process_interaction_mode,
+            Message.PLAY_MODE: self._process_play_mode,
+            Message.TIME_CONTROL: self._process_time_control,
+            Message.LEVEL: self._process_level,
+            Message.DGT_CLOCK_VERSION: self._process_dgt_clock_version,
+            Message.COMPUTER_MOVE: self._process_computer_move,
+            Message.COMPUTER_MOVE_DONE: self._process_computer_move_done,
+            Message.USER_MOVE_DONE: self._process_user_move_done,
+            Message.REVIEW_MOVE_DONE: self._process_review_move_done,
+            Message.ALTERNATIVE_MOVE: self._process_reload,
+            Message.SWITCH_SIDES: self._process_switch_sides,
+            Message.TAKE_BACK: self._process_reload,
+            Message.NEW_MULTIPV: self._process_new_multipv,
+            Message.ENGINE_RECOVERED: self._process_engine_recovered
+        }
+
     def _create_game_info(self):
         if 'game_info' not in self.shared:
             self.shared['game_info'] = {}
@@ -421,207 +467,194 @@ class WebDisplay(DisplayMsg, threading.Thread):
 
         pgn_game.headers['Time'] = self.starttime
 
-    def task(self, message):
-        def _oldstyle_fen(game: chess.Board):
-            builder = []
-            builder.append(game.board_fen())
-            builder.append('w' if game.turn == chess.WHITE else 'b')
-            builder.append(game.castling_xfen())
-            builder.append(chess.SQUARE_NAMES[game.ep_square] if game.ep_square else '-')
-            builder.append(str(game.halfmove_clock))
-            builder.append(str(game.fullmove_number))
-            return ' '.join(builder)
-
-        def _build_headers():
-            self._create_headers()
-            pgn_game = pgn.Game()
-            self._build_game_header(pgn_game)
-            self.shared['headers'].update(pgn_game.headers)
-
-        def _send_headers():
-            EventHandler.write_to_clients({'event': 'Header', 'headers': self.shared['headers']})
-
-        def _send_title():
-            EventHandler.write_to_clients({'event': 'Title', 'ip_info': self.shared['ip_info']})
-
-        def _transfer(game: chess.Board):
-            pgn_game = pgn.Game().from_board(game)
-            self._build_game_header(pgn_game)
-            self.shared['headers'] = pgn_game.headers
-            return pgn_game.accept(pgn.StringExporter(headers=True, comments=False, variations=False))
-
-        def peek_uci(game: chess.Board):
-            """Return last move in uci format."""
-            try:
-                return game.peek().uci()
-            except IndexError:
-                return chess.Move.null().uci()
-
-        if False:  # switch-case
-            pass
-        elif isinstance(message, Message.START_NEW_GAME):
-            self.starttime = datetime.datetime.now().strftime('%H:%M:%S')
-            pgn_str = _transfer(message.game)
-            fen = message.game.fen()
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Game', 'move': '0000', 'play': 'newgame'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
-            _send_headers()  # don't need _build_headers()
-
-        elif isinstance(message, Message.IP_INFO):
-            self.shared['ip_info'] = message.info
-            _build_headers()
-            _send_headers()
-            _send_title()
-
-        elif isinstance(message, Message.SYSTEM_INFO):
-            self.shared['system_info'] = message.info
-            self.shared['system_info']['old_engine'] = self.shared['system_info']['engine_name']
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.ENGINE_STARTUP):
-            for index in range(0, len(message.installed_engines)):
-                eng = message.installed_engines[index]
-                if eng['file'] == message.file:
-                    self.shared['system_info']['engine_elo'] = eng['elo']
-                    break
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.ENGINE_READY):
-            self._create_system_info()
-            self.shared['system_info']['old_engine'] = self.shared['system_info']['engine_name'] = message.engine_name
-            self.shared['system_info']['engine_elo'] = message.eng['elo']
-            if not message.has_levels:
-                if 'level_text' in self.shared['game_info']:
-                    del self.shared['game_info']['level_text']
-                if 'level_name' in self.shared['game_info']:
-                    del self.shared['game_info']['level_name']
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.STARTUP_INFO):
-            self.shared['game_info'] = message.info.copy()
-            # change book_index to book_text
-            books = message.info['books']
-            book_index = message.info['book_index']
-            self.shared['game_info']['book_text'] = books[book_index]['text']
-            del self.shared['game_info']['book_index']
-
-            if message.info['level_text'] is None:
+    @staticmethod
+    def _oldstyle_fen(game: chess.Board):
+        builder = []
+        builder.append(game.board_fen())
+        builder.append('w' if game.turn == chess.WHITE else 'b')
+        builder.append(game.castling_xfen())
+        builder.append(chess.SQUARE_NAMES[game.ep_square] if game.ep_square else '-')
+        builder.append(str(game.halfmove_clock))
+        builder.append(str(game.fullmove_number))
+        return ' '.join(builder)
+
+    @staticmethod
+    def _peek_uci(game: chess.Board):
+        """Return last move in uci format."""
+        try:
+            return game.peek().uci()
+        except IndexError:
+            return chess.Move.null().uci()
+
+    def _build_headers(self):
+        self._create_headers()
+        pgn_game = pgn.Game()
+        self._build_game_header(pgn_game)
+        self.shared['headers'].update(pgn_game.headers)
+
+    def _send_headers(self):
+        EventHandler.write_to_clients({'event': 'Header', 'headers': self.shared['headers']})
+
+    def _send_title(self):
+        EventHandler.write_to_clients({'event': 'Title', 'ip_info': self.shared['ip_info']})
+
+    def _transfer(self, game: chess.Board):
+        pgn_game = pgn.Game().from_board(game.copy())  # from_board() pops & pushes all moves
+        self._build_game_header(pgn_game)
+        self.shared['headers'] = pgn_game.headers
+        return pgn_game.accept(pgn.StringExporter(headers=True, comments=False, variations=False))
+
+    def _send_fen(self, game: chess.Board, mov: str, play: str):
+        pgn_str = self._transfer(game)
+        fen = self._oldstyle_fen(game)
+        result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': play}
+        self.shared['last_dgt_move_msg'] = result
+        EventHandler.write_to_clients(result)
+
+    def _process_start_new_game(self, message):
+        self.starttime = datetime.datetime.now().strftime('%H:%M:%S')
+        pgn_str = self._transfer(message.game)
+        fen = message.game.fen()
+        result = {'pgn': pgn_str, 'fen': fen, 'event': 'Game', 'move': '0000', 'play': 'newgame'}
+        self.shared['last_dgt_move_msg'] = result
+        EventHandler.write_to_clients(result)
+        self._send_headers()  # don't need _build_headers()
+
+    def _process_ip_info(self, message):
+        self.shared['ip_info'] = message.info
+        self._build_headers()
+        self._send_headers()
+        self._send_title()
+
+    def _process_system_info(self, message):
+        self.shared['system_info'] = message.info.copy()
+        self.shared['system_info']['old_engine'] = self.shared['system_info']['engine_name']
+        self._build_headers()
+        self._send_headers()
+
+    def _process_engine_startup(self, message):
+        for index in range(0, len(message.installed_engines)):
+            eng = message.installed_engines[index]
+            if eng['file'] == message.file:
+                self.shared['system_info']['engine_elo'] = eng['elo']
+                break
+        self._build_headers()
+        self._send_headers()
+
+    def _process_engine_ready(self, message):
+        self._create_system_info()
+        self.shared['system_info']['old_engine'] = self.shared['system_info']['engine_name'] = message.engine_name
+        self.shared['system_info']['engine_elo'] = message.eng['elo']
+        if not message.has_levels:
+            if 'level_text' in self.shared['game_info']:
                 del self.shared['game_info']['level_text']
-            if message.info['level_name'] is None:
+            if 'level_name' in self.shared['game_info']:
                 del self.shared['game_info']['level_name']
+        self._build_headers()
+        self._send_headers()
+
+    def _process_startup_info(self, message):
+        self.shared['game_info'] = message.info.copy()
+        # change book_index to book_text
+        books = message.info['books']
+        book_index = message.info['book_index']
+        self.shared['game_info']['book_text'] = books[book_index]['text']
+        del self.shared['game_info']['book_index']
+
+        if message.info['level_text'] is None:
+            del self.shared['game_info']['level_text']
+        if message.info['level_name'] is None:
+            del self.shared['game_info']['level_name']
+
+    def _process_opening_book(self, message):
+        self._create_game_info()
+        self.shared['game_info']['book_text'] = message.book_text
+
+    def _process_interaction_mode(self, message):
+        self._create_game_info()
+        self.shared['game_info']['interaction_mode'] = message.mode
+        if self.shared['game_info']['interaction_mode'] == Mode.REMOTE:
+            self.shared['system_info']['engine_name'] = 'Remote Player'
+        else:
+            self.shared['system_info']['engine_name'] = self.shared['system_info']['old_engine']
+        self._build_headers()
+        self._send_headers()
+
+    def _process_play_mode(self, message):
+        self._create_game_info()
+        self.shared['game_info']['play_mode'] = message.play_mode
+        self._build_headers()
+        self._send_headers()
+
+    def _process_time_control(self, message):
+        self._create_game_info()
+        self.shared['game_info']['time_text'] = message.time_text
+        self.shared['game_info']['tc_init'] = message.tc_init
+
+    def _process_level(self, message):
+        self._create_game_info()
+        self.shared['game_info']['level_text'] = message.level_text
+        self.shared['game_info']['level_name'] = message.level_name
+        self._build_headers()
+        self._send_headers()
+
+    def _process_dgt_clock_version(self, message):
+        if message.dev == 'ser':
+            attached = 'serial'
+        elif message.dev == 'i2c':
+            attached = 'i2c-pi'
+        else:
+            attached = 'server'
+        result = {'event': 'Status', 'msg': 'Ok clock ' + attached}
+        EventHandler.write_to_clients(result)
 
-        elif isinstance(message, Message.OPENING_BOOK):
-            self._create_game_info()
-            self.shared['game_info']['book_text'] = message.book_text
-
-        elif isinstance(message, Message.INTERACTION_MODE):
-            self._create_game_info()
-            self.shared['game_info']['interaction_mode'] = message.mode
-            if self.shared['game_info']['interaction_mode'] == Mode.REMOTE:
-                self.shared['system_info']['engine_name'] = 'Remote Player'
-            else:
-                self.shared['system_info']['engine_name'] = self.shared['system_info']['old_engine']
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.PLAY_MODE):
-            self._create_game_info()
-            self.shared['game_info']['play_mode'] = message.play_mode
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.TIME_CONTROL):
-            self._create_game_info()
-            self.shared['game_info']['time_text'] = message.time_text
-            self.shared['game_info']['tc_init'] = message.tc_init
-
-        elif isinstance(message, Message.LEVEL):
-            self._create_game_info()
-            self.shared['game_info']['level_text'] = message.level_text
-            self.shared['game_info']['level_name'] = message.level_name
-            _build_headers()
-            _send_headers()
-
-        elif isinstance(message, Message.DGT_NO_CLOCK_ERROR):
-            # result = {'event': 'Status', 'msg': 'Error clock'}
-            # EventHandler.write_to_clients(result)
-            pass
-
-        elif isinstance(message, Message.DGT_CLOCK_VERSION):
-            if message.dev == 'ser':
-                attached = 'serial'
-            elif message.dev == 'i2c':
-                attached = 'i2c-pi'
-            else:
-                attached = 'server'
-            result = {'event': 'Status', 'msg': 'Ok clock ' + attached}
-            EventHandler.write_to_clients(result)
+    def _process_computer_move(self, message):
+        game_copy = message.game.copy()
+        game_copy.push(message.move)
+        pgn_str = self._transfer(game_copy)
+        fen = self._oldstyle_fen(game_copy)
+        mov = message.move.uci()
+        result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'computer'}
+        self.shared['last_dgt_move_msg'] = result  # not send => keep it for COMPUTER_MOVE_DONE
+
+    def _process_computer_move_done(self, message):
+        result = self.shared['last_dgt_move_msg']
+        EventHandler.write_to_clients(result)
+        latency.span('web', message.get_origin())
 
-        elif isinstance(message, Message.COMPUTER_MOVE):
-            game_copy = message.game.copy()
-            game_copy.push(message.move)
-            pgn_str = _transfer(game_copy)
-            fen = _oldstyle_fen(game_copy)
-            mov = message.move.uci()
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'computer'}
-            self.shared['last_dgt_move_msg'] = result  # not send => keep it for COMPUTER_MOVE_DONE
-
-        elif isinstance(message, Message.COMPUTER_MOVE_DONE):
-            result = self.shared['last_dgt_move_msg']
-            EventHandler.write_to_clients(result)
+    def _process_user_move_done(self, message):
+        self._send_fen(message.game, message.move.uci(), 'user')
+        latency.span('web', message.get_origin())
 
-        elif isinstance(message, Message.USER_MOVE_DONE):
-            pgn_str = _transfer(message.game)
-            fen = _oldstyle_fen(message.game)
-            mov = message.move.uci()
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'user'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
+    def _process_review_move_done(self, message):
+        self._send_fen(message.game, message.move.uci(), 'review')
+        latency.span('web', message.get_origin())
 
-        elif isinstance(message, Message.REVIEW_MOVE_DONE):
-            pgn_str = _transfer(message.game)
-            fen = _oldstyle_fen(message.game)
-            mov = message.move.uci()
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'review'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
-
-        elif isinstance(message, Message.ALTERNATIVE_MOVE):
-            pgn_str = _transfer(message.game)
-            fen = _oldstyle_fen(message.game)
-            mov = peek_uci(message.game)
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'reload'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
+    def _process_switch_sides(self, message):
+        self._send_fen(message.game, message.move.uci(), 'reload')
 
-        elif isinstance(message, Message.SWITCH_SIDES):
-            pgn_str = _transfer(message.game)
-            fen = _oldstyle_fen(message.game)
-            mov = message.move.uci()
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'reload'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
+    def _process_reload(self, message):
+        """Handle ALTERNATIVE_MOVE & TAKE_BACK."""
+        self._send_fen(message.game, self._peek_uci(message.game), 'reload')
 
-        elif isinstance(message, Message.TAKE_BACK):
-            pgn_str = _transfer(message.game)
-            fen = _oldstyle_fen(message.game)
-            mov = peek_uci(message.game)
-            result = {'pgn': pgn_str, 'fen': fen, 'event': 'Fen', 'move': mov, 'play': 'reload'}
-            self.shared['last_dgt_move_msg'] = result
-            EventHandler.write_to_clients(result)
+    def _process_new_multipv(self, message):
+        lines = [{'multipv': line['multipv'], 'score': line['score'], 'mate': line['mate'], 'depth': line['depth'],
+                  'pv': [move.uci() for move in line['pv']]} for line in message.lines]
+        result = {'event': 'MultiPV', 'fen': self._oldstyle_fen(message.game), 'lines': lines}
+        EventHandler.write_to_clients(result)
 
-        elif isinstance(message, Message.GAME_ENDS):
-            pass
+    def _process_engine_recovered(self, message):
+        result = {'event': 'Message', 'msg': 'Engine crashed - recovered in {:.0f}ms'.format(message.msecs)}
+        EventHandler.write_to_clients(result)
 
-        else:  # Default
-            pass
+    def _process_message(self, message):
+        """Process a message inside the tornado IOLoop."""
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
 
     def _create_task(self, msg):
-        IOLoop.instance().add_callback(callback=lambda: self.task(msg))
+        IOLoop.instance().add_callback(callback=lambda: self._process_message(msg))
 
     def run(self):
         """Call by threading.Thread start() function."""
@@ -28,6 +28,7 @@ from shutil import which
 
 import chess
 from utilities import DisplayMsg
+import latency
 from timecontrol import TimeControl
 from dgt.api import Message
 from dgt.util import GameResult, PlayMode, Voice
@@ -91,6 +92,27 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
     COMPUTER = 'computer'
     SYSTEM = 'system'
 
+    # messages which are only announced with a fixed sound
+    SOUNDS = {
+        Message.ENGINE_FAIL: ['error.ogg'],
+        Message.TIME_CONTROL: ['oktime.ogg'],
+        Message.INTERACTION_MODE: ['okmode.ogg'],
+        Message.OPENING_BOOK: ['okbook.ogg'],
+        Message.ENGINE_READY: ['okengine.ogg'],
+        Message.SYSTEM_SHUTDOWN: ['goodbye.ogg'],
+        Message.SYSTEM_REBOOT: ['pleasewait.ogg']
+    }
+    RESULT_SOUNDS = {
+        GameResult.INSUFFICIENT_MATERIAL: ['material.ogg', 'draw.ogg'],
+        GameResult.MATE: ['checkmate.ogg'],
+        GameResult.STALEMATE: ['stalemate.ogg'],
+        GameResult.ABORT: ['abort.ogg'],
+        GameResult.DRAW: ['draw.ogg'],
+        GameResult.WIN_WHITE: ['whitewins.ogg'],
+        GameResult.WIN_BLACK: ['blackwins.ogg'],
+        GameResult.FIVEFOLD_REPETITION: ['repetition.ogg', 'draw.ogg']
+    }
+
     def __init__(self, user_voice: str, computer_voice: str, speed_factor: int, setpieces_voice: bool):
         """
         Initialize a PicoTalkerDisplay with voices for the user and/or computer players.
@@ -106,6 +128,24 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
         self.low_time = False
         self.play_game = None  # saves the game after a computer move - used for "setpieces" to speak the move again
         self.setpieces_voice = setpieces_voice
+        self.previous_move = chess.Move.null()  # Ignore repeated broadcasts of a move
+
+        self.handlers = {
+            Message.START_NEW_GAME: self._process_start_new_game,
+            Message.COMPUTER_MOVE: self._process_computer_move,
+            Message.COMPUTER_MOVE_DONE: self._process_computer_move_done,
+            Message.USER_MOVE_DONE: self._process_user_move_done,
+            Message.REVIEW_MOVE_DONE: self._process_user_move_done,
+            Message.GAME_ENDS: self._process_game_ends,
+            Message.TAKE_BACK: self._process_take_back,
+            Message.LEVEL: self._process_level,
+            Message.PLAY_MODE: self._process_play_mode,
+            Message.STARTUP_INFO: self._process_startup_info,
+            Message.CLOCK_TIME: self._process_clock_time,
+            Message.ALTERNATIVE_MOVE: self._process_alternative_move,
+            Message.SET_VOICE: self._process_set_voice,
+            Message.WRONG_FEN: self._process_wrong_fen
+        }
 
         if user_voice:
             logging.debug('creating user voice: [%s]', str(user_voice))
@@ -147,159 +187,109 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
             if self.user_picotalker:
                 self.user_picotalker.talk(sounds)
 
+    def _process_start_new_game(self, message):
+        if message.newgame:
+            logging.debug('announcing START_NEW_GAME')
+            self.talk(['newgame.ogg'])
+            self.play_game = None
+
+    def _process_computer_move(self, message):
+        if message.move and message.game and message.move != self.previous_move:
+            logging.debug('announcing COMPUTER_MOVE [%s]', message.move)
+            game_copy = message.game.copy()
+            game_copy.push(message.move)
+            self.talk(self.say_last_move(game_copy), self.COMPUTER)
+            self.previous_move = message.move
+            self.play_game = game_copy
+
+    def _process_computer_move_done(self, _):
+        self.play_game = None
+
+    def _process_user_move_done(self, message):
+        if message.move and message.game and message.move != self.previous_move:
+            logging.debug('announcing %s [%s]', message, message.move)
+            latency.span('talker', message.get_origin())
+            self.talk(self.say_last_move(message.game), self.USER)
+            self.previous_move = message.move
+            self.play_game = None  # @todo why thats not set in dgtdisplay (for REVIEW_MOVE_DONE)?
+
+    def _process_take_back(self, _):
+        logging.debug('announcing TAKE_BACK')
+        self.talk(['takeback.ogg'])
+        self.play_game = None
+
+    def _process_game_ends(self, message):
+        if message.result == GameResult.OUT_OF_TIME:
+            logging.debug('announcing GAME_ENDS/TIME_CONTROL')
+            wins = 'whitewins.ogg' if message.game.turn == chess.BLACK else 'blackwins.ogg'
+            self.talk(['timelost.ogg', wins])
+        elif message.result in self.RESULT_SOUNDS:
+            logging.debug('announcing GAME_ENDS/%s', message.result.name)
+            self.talk(self.RESULT_SOUNDS[message.result])
+
+    def _process_level(self, message):
+        if message.do_speak:
+            logging.debug('announcing LEVEL')
+            self.talk(['oklevel.ogg'])
+        else:
+            logging.debug('dont announce LEVEL cause its also an engine message')
+
+    def _process_play_mode(self, message):
+        logging.debug('announcing PLAY_MODE')
+        self.play_mode = message.play_mode
+        userplay = 'userblack.ogg' if message.play_mode == PlayMode.USER_BLACK else 'userwhite.ogg'
+        self.talk([userplay])
+
+    def _process_startup_info(self, message):
+        self.play_mode = message.info['play_mode']
+        logging.debug('announcing PICOCHESS')
+        self.talk(['picoChess.ogg'])
+
+    def _process_clock_time(self, message):
+        time_u = message.time_white
+        time_c = message.time_black
+        if self.play_mode == PlayMode.USER_BLACK:
+            time_u, time_c = time_c, time_u
+        self.low_time = time_u < 60
+        if self.low_time:
+            logging.debug('time too low, disable voice - u: %i, c: %i', time_u, time_c)
+
+    def _process_alternative_move(self, message):
+        self.play_mode = message.play_mode
+        self.play_game = None
+
+    def _process_set_voice(self, message):
+        self.speed_factor = (90 + (message.speed % 10) * 5) / 100
+        picotalker = PicoTalker(message.lang + ':' + message.speaker, self.speed_factor)
+        if message.type == Voice.USER:
+            self.set_user(picotalker)
+        if message.type == Voice.COMP:
+            self.set_computer(picotalker)
+        if message.type == Voice.SPEED:
+            self.set_factor(self.speed_factor)
+
+    def _process_wrong_fen(self, _):
+        if self.play_game and self.setpieces_voice:
+            self.talk(self.say_last_move(self.play_game), self.COMPUTER)
+
+    def _process_message(self, message):
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
+            return
+        sounds = self.SOUNDS.get(type(message))
+        if sounds:
+            logging.debug('announcing %s', message)
+            self.talk(sounds)
+
     def run(self):
         """Start listening for Messages on our queue and generate speech as appropriate."""
-        previous_move = chess.Move.null()  # Ignore repeated broadcasts of a move
         logging.info('msg_queue ready')
         while True:
             try:
                 # Check if we have something to say
                 message = self.msg_queue.get()
-
-                if False:  # switch-case
-                    pass
-                elif isinstance(message, Message.ENGINE_FAIL):
-                    logging.debug('announcing ENGINE_FAIL')
-                    self.talk(['error.ogg'])
-
-                elif isinstance(message, Message.START_NEW_GAME):
-                    if message.newgame:
-                        logging.debug('announcing START_NEW_GAME')
-                        self.talk(['newgame.ogg'])
-                        self.play_game = None
-
-                elif isinstance(message, Message.COMPUTER_MOVE):
-                    if message.move and message.game and message.move != previous_move:
-                        logging.debug('announcing COMPUTER_MOVE [%s]', message.move)
-                        game_copy = message.game.copy()
-                        game_copy.push(message.move)
-                        self.talk(self.say_last_move(game_copy), self.COMPUTER)
-                        previous_move = message.move
-                        self.play_game = game_copy
-
-                elif isinstance(message, Message.COMPUTER_MOVE_DONE):
-                    self.play_game = None
-
-                elif isinstance(message, Message.USER_MOVE_DONE):
-                    if message.move and message.game and message.move != previous_move:
-                        logging.debug('announcing USER_MOVE_DONE [%s]', message.move)
-                        self.talk(self.say_last_move(message.game), self.USER)
-                        previous_move = message.move
-                        self.play_game = None
-
-                elif isinstance(message, Message.REVIEW_MOVE_DONE):
-                    if message.move and message.game and message.move != previous_move:
-                        logging.debug('announcing REVIEW_MOVE_DONE [%s]', message.move)
-                        self.talk(self.say_last_move(message.game), self.USER)
-                        previous_move = message.move
-                        self.play_game = None  # @todo why thats not set in dgtdisplay?
-
-                elif isinstance(message, Message.GAME_ENDS):
-                    if message.result == GameResult.OUT_OF_TIME:
-                        logging.debug('announcing GAME_ENDS/TIME_CONTROL')
-                        wins = 'whitewins.ogg' if message.game.turn == chess.BLACK else 'blackwins.ogg'
-                        self.talk(['timelost.ogg', wins])
-                    elif message.result == GameResult.INSUFFICIENT_MATERIAL:
-                        logging.debug('announcing GAME_ENDS/INSUFFICIENT_MATERIAL')
-                        self.talk(['material.ogg', 'draw.ogg'])
-                    elif message.result == GameResult.MATE:
-                        logging.debug('announcing GAME_ENDS/MATE')
-                        self.talk(['checkmate.ogg'])
-                    elif message.result == GameResult.STALEMATE:
-                        logging.debug('announcing GAME_ENDS/STALEMATE')
-                        self.talk(['stalemate.ogg'])
-                    elif message.result == GameResult.ABORT:
-                        logging.debug('announcing GAME_ENDS/ABORT')
-                        self.talk(['abort.ogg'])
-                    elif message.result == GameResult.DRAW:
-                        logging.debug('announcing GAME_ENDS/DRAW')
-                        self.talk(['draw.ogg'])
-                    elif message.result == GameResult.WIN_WHITE:
-                        logging.debug('announcing GAME_ENDS/WHITE_WIN')
-                        self.talk(['whitewins.ogg'])
-                    elif message.result == GameResult.WIN_BLACK:
-                        logging.debug('announcing GAME_ENDS/BLACK_WIN')
-                        self.talk(['blackwins.ogg'])
-                    elif message.result == GameResult.FIVEFOLD_REPETITION:
-                        logging.debug('announcing GAME_ENDS/FIVEFOLD_REPETITION')
-                        self.talk(['repetition.ogg', 'draw.ogg'])
-
-                elif isinstance(message, Message.TAKE_BACK):
-                    logging.debug('announcing TAKE_BACK')
-                    self.talk(['takeback.ogg'])
-                    self.play_game = None
-
-                elif isinstance(message, Message.TIME_CONTROL):
-                    logging.debug('announcing TIME_CONTROL')
-                    self.talk(['oktime.ogg'])
-
-                elif isinstance(message, Message.INTERACTION_MODE):
-                    logging.debug('announcing INTERACTION_MODE')
-                    self.talk(['okmode.ogg'])
-
-                elif isinstance(message, Message.LEVEL):
-                    if message.do_speak:
-                        logging.debug('announcing LEVEL')
-                        self.talk(['oklevel.ogg'])
-                    else:
-                        logging.debug('dont announce LEVEL cause its also an engine message')
-
-                elif isinstance(message, Message.OPENING_BOOK):
-                    logging.debug('announcing OPENING_BOOK')
-                    self.talk(['okbook.ogg'])
-
-                elif isinstance(message, Message.ENGINE_READY):
-                    logging.debug('announcing ENGINE_READY')
-                    self.talk(['okengine.ogg'])
-
-                elif isinstance(message, Message.PLAY_MODE):
-                    logging.debug('announcing PLAY_MODE')
-                    self.play_mode = message.play_mode
-                    userplay = 'userblack.ogg' if message.play_mode == PlayMode.USER_BLACK else 'userwhite.ogg'
-                    self.talk([userplay])
-
-                elif isinstance(message, Message.STARTUP_INFO):
-                    self.play_mode = message.info['play_mode']
-                    logging.debug('announcing PICOCHESS')
-                    self.talk(['picoChess.ogg'])
-
-                elif isinstance(message, Message.CLOCK_TIME):
-                    time_u = message.time_white
-                    time_c = message.time_black
-                    if self.play_mode == PlayMode.USER_BLACK:
-                        time_u, time_c = time_c, time_u
-                    self.low_time = time_u < 60
-                    if self.low_time:
-                        logging.debug('time too low, disable voice - u: %i, c: %i', time_u, time_c)
-
-                elif isinstance(message, Message.ALTERNATIVE_MOVE):
-                    self.play_mode = message.play_mode
-                    self.play_game = None
-
-                elif isinstance(message, Message.SYSTEM_SHUTDOWN):
-                    logging.debug('announcing SHUTDOWN')
-                    self.talk(['goodbye.ogg'])
-
-                elif isinstance(message, Message.SYSTEM_REBOOT):
-                    logging.debug('announcing REBOOT')
-                    self.talk(['pleasewait.ogg'])
-
-                elif isinstance(message, Message.SET_VOICE):
-                    self.speed_factor = (90 + (message.speed % 10) * 5) / 100
-                    picotalker = PicoTalker(message.lang + ':' + message.speaker, self.speed_factor)
-                    if message.type == Voice.USER:
-                        self.set_user(picotalker)
-                    if message.type == Voice.COMP:
-                        self.set_computer(picotalker)
-                    if message.type == Voice.SPEED:
-                        self.set_factor(self.speed_factor)
-
-                elif isinstance(message, Message.WRONG_FEN):
-                    if self.play_game and self.setpieces_voice:
-                        self.talk(self.say_last_move(self.play_game), self.COMPUTER)
-
-                else:  # Default
-                    pass
+                self._process_message(message)
             except queue.Empty:
                 pass
 
@@ -16,17 +16,46 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import time
-import threading
 import logging
 import copy
+import statistics
+from collections import deque
 from math import floor
 
-from utilities import Observable, hms_time
+from utilities import Observable, hms_time, create_timer
 import chess
 from dgt.api import Event
 from dgt.util import TimeMode
 
 
+class Overhead(object):
+
+    """Measured overhead per engine & transport - the clock time charged to the engine it didnt search for."""
+
+    SAMPLES = 20  # how many of the latest moves count
+    MAX_MARGIN = 5.0  # secs
+
+    def __init__(self):
+        super(Overhead, self).__init__()
+        self.samples = {}  # key => latest overheads in secs
+
+    def add(self, key, charged: float, searched: float):
+        """Add the clock time charged for one engine move and the time the engine searched."""
+        if charged is None or searched is None:
+            return
+        samples = self.samples.setdefault(key, deque(maxlen=self.SAMPLES))
+        samples.append(max(charged - searched, 0.0))
+        logging.debug('overhead for %s: %.0fms (charged %.3fs searched %.3fs)', key, samples[-1] * 1000,
+                      charged, searched)
+
+    def margin(self, key):
+        """Return the safety margin (secs) to keep back from the engine: mean overhead plus 2 std deviations."""
+        samples = self.samples.get(key)
+        if not samples:
+            return 0.0
+        return min(statistics.mean(samples) + 2 * statistics.pstdev(samples), self.MAX_MARGIN)
+
+
 class TimeControl(object):
 
     """Control the picochess internal clock."""
@@ -160,15 +189,15 @@ class TimeControl(object):
 
             # Only start thread if not already started for same color, and the player has not already lost on time
             if self.internal_time[color] > 0 and self.active_color is not None and self.run_color != self.active_color:
-                self.timer = threading.Timer(copy.copy(self.internal_time[color]), self._out_of_time,
-                                             [copy.copy(self.internal_time[color])])
+                self.timer = create_timer(copy.copy(self.internal_time[color]), self._out_of_time,
+                                          [copy.copy(self.internal_time[color])])
                 self.timer.start()
                 logging.debug('internal timer started - color: %s run: %s active: %s',
                               color, self.run_color, self.active_color)
                 self.run_color = self.active_color
 
     def stop_internal(self, log=True):
-        """Stop the internal clock."""
+        """Stop the internal clock. Return the used secs (None if it wasnt running)."""
         if self.internal_running() and self.mode in (TimeMode.BLITZ, TimeMode.FISCHER):
             if log:
                 w_hms, b_hms = self._log_time()
@@ -179,7 +208,8 @@ class TimeControl(object):
                 self.timer.join()
             else:
                 logging.warning('time=%s', self.internal_time)
-            used_time = floor((time.time() - self.start_time) * 10) / 10
+            secs = time.time() - self.start_time
+            used_time = floor(secs * 10) / 10
             if log:
                 logging.info('used time: %s secs', used_time)
             self.internal_time[self.active_color] -= used_time
@@ -190,22 +220,30 @@ class TimeControl(object):
                 w_hms, b_hms = self._log_time()
                 logging.info('new internal time w:%s b:%s', w_hms, b_hms)
             self.run_color = self.active_color = None
+            return secs
+        return None
 
     def internal_running(self):
         """Return if the internal clock is running."""
         return self.active_color is not None
 
-    def uci(self):
-        """Return remaining time for both players in an UCI dict."""
+    def uci(self, margin=0.0, color=None):
+        """Return remaining time for both players in an UCI dict - the engine side (color) reduced by the margin."""
+        def _budget(msecs: int):
+            return str(max(msecs - int(margin * 1000), msecs // 2))  # never take more than half of the time
+
         uci_dict = {}
         if self.mode in (TimeMode.BLITZ, TimeMode.FISCHER):
-            uci_dict['wtime'] = str(int(self.internal_time[chess.WHITE] * 1000))
-            uci_dict['btime'] = str(int(self.internal_time[chess.BLACK] * 1000))
+            for side, key in ((chess.WHITE, 'wtime'), (chess.BLACK, 'btime')):
+                msecs = int(self.internal_time[side] * 1000)
+                uci_dict[key] = _budget(msecs) if side == color else str(msecs)
 
             if self.mode == TimeMode.FISCHER:
                 uci_dict['winc'] = str(self.fisch_inc * 1000)
                 uci_dict['binc'] = str(self.fisch_inc * 1000)
-        elif self.mode == TimeMode.FIXED:
+        elif self.mode == TimeMode.FIXED:  # no clock to run out of - and stop_internal() measures no overhead here
             uci_dict['movetime'] = str(self.move_time * 1000)
 
+        if margin and self.mode in (TimeMode.BLITZ, TimeMode.FISCHER):
+            logging.info('overhead margin: %.0fms => %s', margin * 1000, uci_dict)
         return uci_dict
@@ -0,0 +1,163 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import json
+import copy
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import chess
+import chess.polyglot
+
+
+class EngineCache(object):
+
+    """Persistent cache for engine handshakes and engine ini files - only valid while their files are unchanged."""
+
+    def __init__(self, file: str):
+        super(EngineCache, self).__init__()
+        self.file = file
+        self.entries = None
+        self.lock = Lock()
+
+    @staticmethod
+    def _stamp(path: str):
+        """Return size & mtime of the file (or None if not existing)."""
+        try:
+            stat = os.stat(path)
+            return [stat.st_size, stat.st_mtime]
+        except OSError:
+            return None
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.file) as cache_file:
+                    self.entries = json.load(cache_file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def _save(self):
+        try:
+            with open(self.file + '.tmp', 'w') as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(self.file + '.tmp', self.file)
+        except OSError:
+            logging.warning('cant write engine cache %s', self.file)
+
+    def get(self, key: str):
+        """Return the cached value or None if missing or one of its files changed."""
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            for path, stamp in entry['stamps'].items():
+                if self._stamp(path) != stamp:
+                    logging.debug('engine cache outdated for %s - %s changed', key, path)
+                    return None
+            return copy.deepcopy(entry['value'])  # the caller might change it
+
+    def put(self, key: str, value, paths: list):
+        """Store the (json-able) value. It stays valid as long the given files dont change."""
+        with self.lock:
+            self._load()
+            self.entries[key] = {'stamps': {path: self._stamp(path) for path in paths}, 'value': value}
+            self._save()
+
+
+def eval_key(board: chess.Board, engine=''):
+    """Return the key of the position for the eval cache - engine is the key of the engine & its level."""
+    return '{}:{:016x}'.format(engine, chess.polyglot.zobrist_hash(board))
+
+
+def engine_key(file: str, options: dict):
+    """Return a short key of the engine file & its (level) options for the eval cache."""
+    text = repr((file, sorted((str(name), str(value)) for name, value in options.items())))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+class EvalCache(object):
+
+    """Bounded (LRU) cache of the engine evaluations - keyed by the zobrist hash of the searched position."""
+
+    def __init__(self, file: str, size: int):
+        super(EvalCache, self).__init__()
+        self.file = file
+        self.size = size  # max number of positions (0 = cache disabled)
+        self.entries = None  # key => {'pv': [uci moves], 'score':, 'mate':, 'depth':}, the least recently used first
+        self.dirty = False
+        self.lock = Lock()
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.file) as cache_file:
+                    self.entries = OrderedDict(json.load(cache_file))
+            except (OSError, ValueError, TypeError):
+                self.entries = OrderedDict()
+
+    def get(self, key: str):
+        """Return the stored evaluation or None."""
+        if not self.size:
+            return None
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                entry = dict(entry)
+            return entry
+
+    def put(self, key: str, pv: list, score, mate, depth: int):
+        """Store the evaluation - unless a deeper one is already known."""
+        if not self.size or not pv or depth is None or (score is None and mate is None):
+            return
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry is not None and entry['depth'] > depth:
+                self.entries.move_to_end(key)
+                return
+            if entry is not None and entry['depth'] == depth and entry['pv'][0] == pv[0].uci():
+                return  # nothing new (engines repeat their lines at the same depth)
+            self.entries[key] = {'pv': [move.uci() for move in pv], 'score': score, 'mate': mate, 'depth': depth}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def save(self):
+        """Write the cache to disk (if something changed)."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            entries = list(self.entries.items())
+        try:
+            with open(self.file + '.tmp', 'w') as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(self.file + '.tmp', self.file)
+        except OSError:
+            logging.warning('cant write eval cache %s', self.file)
+
+
+engine_cache = EngineCache(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'engines.cache')))
+eval_cache = EvalCache(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'evals.cache')), 10000)
@@ -17,68 +17,109 @@
 
 import logging
 import os
+import time
 import configparser
-import spur
-import paramiko
+import threading
 
 from subprocess import DEVNULL
 from dgt.api import Event
 from utilities import Observable
+import latency
 import chess.uci
 from chess import Board
 from uci.informer import Informer
 from uci.read import read_engine_ini
+from uci.cache import engine_cache, eval_key, engine_key
+from uci.remote import ssh_pool
+from uci.net import socket_spawn_engine
 
 
 class UciEngine(object):
 
     """Handle the uci engine communication."""
 
-    def __init__(self, file: str, hostname=None, username=None, key_file=None, password=None, home=''):
+    IDLE_TIMEOUT = 5.0  # max secs to wait for the engine to become idle (after a stop)
+    RESPAWN_TRIES = 3  # how often to try starting a terminated engine again (1sec apart)
+    MAX_CRASHES = 2  # how often a search on the same position is resumed after the engine crashed
+
+    def __init__(self, file: str, hostname=None, username=None, key_file=None, password=None, home='', server=None):
         super(UciEngine, self).__init__()
         try:
             self.shell = None
-            if hostname:
-                logging.info('connecting to [%s]', hostname)
-                if key_file:
-                    shell = spur.SshShell(hostname=hostname, username=username, private_key_file=key_file,
-                                          missing_host_key=paramiko.AutoAddPolicy())
-                else:
-                    shell = spur.SshShell(hostname=hostname, username=username, password=password,
-                                          missing_host_key=paramiko.AutoAddPolicy())
-                self.shell = shell
+            self.remote = None
+            self.server = server  # address of an engine server (see engineserver.py) - used instead of ssh
+            if hostname and not server:
+                self.remote = {'hostname': hostname, 'username': username, 'key_file': key_file, 'password': password}
                 if home:
                     file = home + os.sep + file
-                self.engine = chess.uci.spur_spawn_engine(shell, [file])
-            else:
-                self.engine = chess.uci.popen_engine(file, stderr=DEVNULL)
-
             self.file = file
+            self.engine = self._spawn()
+
+            self.handshake = None  # cached name & options (till the engine answered itself)
             if self.engine:
-                handler = Informer()
-                self.engine.info_handlers.append(handler)
-                self.engine.uci()
+                self.informer = Informer()
+                self.engine.info_handlers.append(self.informer)
+                handshake = None if self.is_remote() else engine_cache.get('uci:' + file)
+                if handshake:
+                    options = {name: chess.uci.Option(*values) for name, values in handshake['options'].items()}
+                    self.handshake = {'name': handshake['name'], 'options': options}
+                    self.engine.uci(async_callback=self._uci_done)  # dont wait for the engine
+                else:
+                    self.engine.uci()
+                    self._uci_done(None)
             else:
                 logging.error('engine executable [%s] not found', file)
             self.options = {}
+            self.sent_options = {}  # all options sent so far (to restore them on a respawned engine)
+            self.pos_board = None  # the board sent lately (only the moves since the last irreversible one)
+            self.pos_plies = 0
+            self.pos_last = None
+            self.pos_extra = 0
             self.future = None
+            self.last_go = None  # the arguments of the last search (to resume it on a respawned engine)
+            self.go_time = None
+            self.search_start = None  # go of the current search (not reset when its resumed after a crash)
+            self.search_time = None  # secs from go till bestmove of the last finished search
+            self.quitting = False
+            self.stop_requested = False  # stop() called for the current search - dont resume it after a crash
+            self.crash_key = None  # the position the engine crashed on lately
+            self.crashes = 0  # number of crashes on this position
+            self.respawn_lock = threading.RLock()
             self.show_best = True
+            self.idle_event = threading.Event()  # set by the search callbacks once the engine is idle again
+            self.idle_event.set()
+            self.stop_time = None
 
             self.res = None
             self.level_support = False
-            self.installed_engines = read_engine_ini(self.shell, (file.rsplit(os.sep, 1))[0])
+            self.installed_engines = read_engine_ini(self.shell, (file.rsplit(os.sep, 1))[0], self.server)
+            if self.engine:
+                self._supervise()
 
         except OSError:
             logging.exception('OS error in starting engine')
         except TypeError:
             logging.exception('engine executable not found')
 
+    def _uci_done(self, _):
+        """Store the handshake result inside the cache."""
+        if self.engine.name is None:
+            return
+        self.handshake = None
+        if not self.is_remote():
+            options = {name: list(option) for name, option in self.engine.options.items()}
+            engine_cache.put('uci:' + self.file, {'name': self.engine.name, 'options': options}, [self.file])
+
     def get_name(self):
         """Get engine name."""
+        if self.handshake:
+            return self.handshake['name']
         return self.engine.name
 
     def get_options(self):
         """Get engine options."""
+        if self.handshake:
+            return self.handshake['options']
         return self.engine.options
 
     def option(self, name, value):
@@ -87,7 +128,24 @@ class UciEngine(object):
 
     def send(self):
         """Send options to engine."""
-        self.engine.setoption(self.options)
+        self._setoption(self.options)
+
+    def _setoption(self, options: dict):
+        self.sent_options.update(options)
+        self.engine.setoption(options)
+
+    def reset_options(self):
+        """Set the options sent lately back to their engine defaults (for reusing a running engine)."""
+        defaults = {}
+        for name in self.options:
+            option = self.get_options().get(name)
+            if option and option.type != 'button':
+                defaults[name] = option.default
+        logging.debug('resetting engine options %s', defaults)
+        if defaults:
+            self._setoption(defaults)
+        self.options = {}
+        self.level_support = False
 
     def has_levels(self):
         """Return engine level support."""
@@ -96,27 +154,31 @@ class UciEngine(object):
 
     def has_skill_level(self):
         """Return engine skill level support."""
-        return 'Skill Level' in self.engine.options
+        return 'Skill Level' in self.get_options()
 
     def has_handicap_level(self):
         """Return engine handicap level support."""
-        return 'Handicap Level' in self.engine.options
+        return 'Handicap Level' in self.get_options()
 
     def has_limit_strength(self):
         """Return engine limit strength support."""
-        return 'UCI_LimitStrength' in self.engine.options
+        return 'UCI_LimitStrength' in self.get_options()
 
     def has_strength(self):
         """Return engine strength support."""
-        return 'Strength' in self.engine.options
+        return 'Strength' in self.get_options()
 
     def has_chess960(self):
         """Return chess960 support."""
-        return 'UCI_Chess960' in self.engine.options
+        return 'UCI_Chess960' in self.get_options()
 
     def has_ponder(self):
         """Return ponder support."""
-        return 'Ponder' in self.engine.options
+        return 'Ponder' in self.get_options()
+
+    def has_multipv(self):
+        """Return multipv support."""
+        return 'MultiPV' in self.get_options()
 
     def get_file(self):
         """Get File."""
@@ -126,12 +188,43 @@ class UciEngine(object):
         """Get installed engines."""
         return self.installed_engines
 
-    def position(self, game: Board):
-        """Set position."""
-        self.engine.position(game)
+    def _sync_position(self, game: Board):
+        """Bring the sent board up to the game by pushing the new moves. Return False if not possible."""
+        board = self.pos_board
+        if board is None or board.chess960 != game.chess960:
+            return False
+        for _ in range(self.pos_extra):  # take back the moves which are not part of the game
+            if not board.move_stack:
+                return False
+            board.pop()
+        stack = game.move_stack
+        if len(stack) < self.pos_plies or (self.pos_plies and stack[self.pos_plies - 1] != self.pos_last):
+            return False
+        for move in stack[self.pos_plies:]:
+            self._push_position(move)
+        return self.pos_board._transposition_key() == game._transposition_key()
+
+    def _push_position(self, move: chess.Move):
+        if self.pos_board.is_irreversible(move):  # the positions before cant repeat => no need to send them again
+            self.pos_board = self.pos_board.copy(stack=False)
+        self.pos_board.push(move)
+
+    def position(self, game: Board, extra_moves=()):
+        """Set position (plus the extra moves) - only the moves added since the last call need work, no copy."""
+        self._check_alive()
+        if not self._sync_position(game):
+            logging.debug('sending position from scratch')
+            self.pos_board = game.copy()
+        for move in extra_moves:
+            self.pos_board.push(move)  # no stack cut - these get taken back on the next call
+        self.pos_plies = len(game.move_stack)
+        self.pos_last = game.move_stack[-1] if game.move_stack else None
+        self.pos_extra = len(extra_moves)
+        self.engine.position(self.pos_board)  # python-chess pushes back all moves it pops
 
     def quit(self):
         """Quit engine."""
+        self.quitting = True
         if self.engine.quit():  # Ask nicely
             if self.engine.terminate():  # If you won't go nicely....
                 if self.engine.kill():  # Right that does it!
@@ -146,41 +239,176 @@ class UciEngine(object):
         """Stop engine."""
         logging.info('show_best old: %s new: %s', self.show_best, show_best)
         self.show_best = show_best
+        self.stop_requested = True  # before the check - the supervisor might be respawning a crashed engine
         if self.is_waiting():
             logging.info('engine already stopped')
             return self.res
+        self.stop_time = time.monotonic()
         try:
             self.engine.stop()
+            return self.future.result()
         except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
-        return self.future.result()
+            logging.error('engine terminated - nothing to stop')
+            self._set_idle()  # dont resume it
+            return self.res
+
+    def _spawn(self):
+        """Start the engine process - local, on an engine server or over ssh."""
+        if self.server:
+            return socket_spawn_engine(self.server, self.file)
+        if self.remote:
+            self.shell = ssh_pool.get(**self.remote)
+            return chess.uci.spur_spawn_engine(self.shell, [self.file])
+        return chess.uci.popen_engine(self.file, stderr=DEVNULL)
+
+    def get_transport(self):
+        """Return how the engine is reached."""
+        if self.server:
+            return 'net:' + self.server
+        if self.remote:
+            return 'ssh:' + self.remote['hostname']
+        return 'local'
+
+    def get_search_time(self):
+        """Return the secs from go till bestmove of the last search."""
+        return self.search_time
+
+    def is_remote(self):
+        """Return True if the engine doesnt run on this machine."""
+        return bool(self.server or self.remote)
+
+    def _supervise(self):
+        """Watch the engine process (in the background) for its termination."""
+        threading.Thread(target=self._watch, args=(self.engine,), daemon=True).start()
+
+    def _watch(self, engine: chess.uci.Engine):
+        engine.terminated.wait()
+        with self.respawn_lock:
+            if self.quitting or engine is not self.engine:
+                return  # wanted or already respawned
+            start = time.monotonic()
+            if not self._respawn():
+                return
+            if not self.idle_event.is_set():  # died while searching
+                if not self.stop_requested and self.last_go and self._count_crash():
+                    logging.info('resuming the interrupted search')
+                    self._go(**self._resume_times(self.last_go))
+                    if self.stop_requested:  # stop() came while resuming (and found the engine still idle)
+                        self.engine.stop()
+                else:
+                    self._set_idle()
+            msecs = (time.monotonic() - start) * 1000
+            logging.warning('engine [%s] recovered in %.0fms', self.file, msecs)
+            Observable.fire(Event.ENGINE_RECOVERED(msecs=msecs))
+
+    def _count_crash(self):
+        """Count the crash on the searched position. Return False if it crashed too often there."""
+        key = self.pos_board._transposition_key() if self.pos_board is not None else None
+        if key != self.crash_key:
+            self.crash_key = key
+            self.crashes = 0
+        self.crashes += 1
+        if self.crashes > self.MAX_CRASHES:
+            logging.error('engine [%s] crashed %i times on this position - search not resumed', self.file,
+                          self.crashes)
+            return False
+        return True
+
+    def _resume_times(self, go_args: dict):
+        """Return the search arguments with the time already used by the interrupted search taken off."""
+        used = int((time.monotonic() - self.go_time) * 1000)
+        go_args = dict(go_args)
+        side = 'wtime' if self.pos_board is None or self.pos_board.turn == chess.WHITE else 'btime'
+        for key in (side, 'movetime'):
+            if go_args.get(key) is not None:
+                go_args[key] = max(1, go_args[key] - used)
+        return go_args
+
+    def _check_alive(self):
+        """Respawn a terminated engine (if the supervisor didnt do it yet) - the last search isnt resumed."""
+        if not self.engine.terminated.is_set():
+            return
+        with self.respawn_lock:
+            if self.engine.terminated.is_set() and not self.quitting:
+                if not self._respawn():
+                    raise chess.uci.EngineTerminatedException()
+                if not self.idle_event.is_set():
+                    self._set_idle()  # the old search is gone
+
+    def _respawn(self):
+        """Start the terminated engine again and restore its options (incl. level) & position. Return success."""
+        logging.error('engine [%s] terminated - respawning it', self.file)
+        for _ in range(self.RESPAWN_TRIES):
+            try:
+                engine = self._spawn()
+                engine.info_handlers.append(self.informer)
+                engine.uci()
+                if self.sent_options:
+                    engine.setoption(self.sent_options)
+                if self.pos_board is not None:
+                    engine.position(self.pos_board)  # the new process gets the full (already cut) move list
+            except (OSError, chess.uci.EngineTerminatedException):
+                logging.exception('cant respawn engine [%s]', self.file)
+                if self.shell:
+                    ssh_pool.drop(self.shell)  # the spawn failed - maybe the connection is broken
+                time.sleep(1)
+                continue
+            self.engine = engine
+            self._supervise()
+            return True
+        logging.error('giving up to respawn engine [%s]', self.file)
+        self._set_idle()
+        return False
+
+    def _go(self, **kwargs):
+        self._check_alive()
+        self.last_go = kwargs
+        self.go_time = time.monotonic()
+        self.idle_event.clear()
+        if self.pos_board:
+            self.informer.search_key = eval_key(self.pos_board, engine_key(self.file, self.options))
+        else:
+            self.informer.search_key = None
+        try:
+            self.future = self.engine.go(**kwargs)
+        except chess.uci.EngineTerminatedException:
+            self.idle_event.set()  # no callback will come
+            raise
+        return self.future
+
+    def _start_search(self):
+        self.search_start = time.monotonic()
+        self.search_time = None
 
     def go(self, time_dict: dict):
         """Go engine."""
+        self.stop_requested = False
+        self._start_search()
         self.show_best = True
         time_dict['async_callback'] = self.callback
 
         # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(**time_dict)
-        return self.future
+        return self._go(**time_dict)
 
     def ponder(self):
         """Ponder engine."""
+        self.stop_requested = False
+        self._start_search()
         self.show_best = False
 
         # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(ponder=True, infinite=True, async_callback=self.callback)
-        return self.future
+        return self._go(ponder=True, infinite=True, async_callback=self.callback)
 
     def brain(self, time_dict: dict):
         """Permanent brain."""
+        self.stop_requested = False
+        self._start_search()
         self.show_best = True
         time_dict['ponder'] = True
         time_dict['async_callback'] = self.callback3
 
         # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(**time_dict)
-        return self.future
+        return self._go(**time_dict)
 
     def hit(self):
         """Send a ponder hit."""
@@ -188,13 +416,30 @@ class UciEngine(object):
         self.engine.ponderhit()
         self.show_best = True
 
+    def _set_idle(self):
+        if self.stop_time is not None:
+            msecs = (time.monotonic() - self.stop_time) * 1000
+            self.stop_time = None
+            latency.add('engine_stop', msecs)  # in the /info?action=get_latency summary
+            logging.info('stop to idle latency: %.0fms', msecs)
+        self.idle_event.set()
+
+    def wait_idle(self, timeout=IDLE_TIMEOUT):
+        """Wait (max timeout secs) for the engine becoming idle. Return True if so."""
+        if self.idle_event.wait(timeout):
+            return True
+        logging.warning('engine still not idle after %.1f secs', timeout)
+        return self.is_waiting()
+
     def callback(self, command):
         """Callback function."""
         try:
             self.res = command.result()
         except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
-            self.show_best = False
+            logging.error('engine terminated while searching')
+            return  # the supervisor resumes the search on the respawned engine
+        self.search_time = time.monotonic() - self.search_start
+        self._set_idle()
         logging.info('res: %s', self.res)
         # Observable.fire(Event.STOP_SEARCH())
         if self.show_best and self.res:
@@ -207,8 +452,10 @@ class UciEngine(object):
         try:
             self.res = command.result()
         except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
-            self.show_best = False
+            logging.error('engine terminated while searching')
+            return  # the supervisor resumes the search on the respawned engine
+        self.search_time = time.monotonic() - self.search_start
+        self._set_idle()
         logging.info('res: %s', self.res)
         # Observable.fire(Event.STOP_SEARCH())
         if self.show_best and self.res:
@@ -230,12 +477,17 @@ class UciEngine(object):
 
     def newgame(self, game: Board):
         """Engine sometimes need this to setup internal values."""
+        self._check_alive()
         self.engine.ucinewgame()
-        self.engine.position(game)
+        self.pos_board = None
+        self.position(game)
 
-    def mode(self, ponder: bool, analyse: bool):
+    def mode(self, ponder: bool, analyse: bool, multipv=1):
         """Set engine mode."""
-        self.engine.setoption({'Ponder': ponder, 'UCI_AnalyseMode': analyse})
+        options = {'Ponder': ponder, 'UCI_AnalyseMode': analyse}
+        if self.has_multipv():
+            options['MultiPV'] = multipv
+        self._setoption(options)
 
     def startup(self, options: dict, show=True):
         """Startup engine."""
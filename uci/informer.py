@@ -15,82 +15,207 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import Timer
+import logging
+import time
+from threading import Lock, Condition, Thread
 
+import utilities
 from utilities import Observable
 from dgt.api import Event
+from uci.cache import eval_cache
+import chess
 import chess.uci
 
 
+class Flusher(Thread):
+
+    """One long-lived worker firing the held back events of all throttles when their interval ends."""
+
+    def __init__(self):
+        super(Flusher, self).__init__(daemon=True)
+        self.condition = Condition()
+        self.deadlines = {}  # throttle => monotonic time its pending event is due
+
+    def schedule(self, throttle, deadline: float):
+        """Fire the pending event of the throttle at the deadline (if its not scheduled already)."""
+        with self.condition:
+            if throttle not in self.deadlines:
+                self.deadlines[throttle] = deadline
+                self.condition.notify()
+
+    def cancel(self, throttle):
+        """Forget the scheduled flush of the throttle."""
+        with self.condition:
+            self.deadlines.pop(throttle, None)
+
+    def run(self):
+        """Wait for the next deadline and flush the due throttles."""
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                due = [throttle for throttle, deadline in self.deadlines.items() if deadline <= now]
+                for throttle in due:
+                    del self.deadlines[throttle]
+                if not due:
+                    timeout = min(self.deadlines.values()) - now if self.deadlines else None
+                    self.condition.wait(timeout)
+                    continue
+            for throttle in due:  # outside of the condition - throttles call schedule() with their lock held
+                throttle.expired()
+
+
+_flusher = None
+_flusher_lock = Lock()
+
+
+def get_flusher():
+    """Return the shared flusher - started with its first use."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = Flusher()
+            _flusher.start()
+        return _flusher
+
+
+class Throttle(object):
+
+    """Let an event pass at most once per interval - the latest one held back is sent when the interval ends."""
+
+    def __init__(self, interval: float):
+        super(Throttle, self).__init__()
+        self.interval = interval
+        self.last = None  # monotonic time of the last fired event
+        self.pending = None
+        self.flusher = get_flusher()  # fires the pending event at the end of the interval (trailing edge)
+        self.lock = Lock()
+
+    def reset(self):
+        """Forget the pending event and let the next one pass at once."""
+        with self.lock:
+            self.flusher.cancel(self)
+            self.last = None
+            self.pending = None
+
+    def _due(self, now: float):
+        return self.last is None or now - self.last >= self.interval
+
+    def _fire(self, now: float, event):
+        self.flusher.cancel(self)
+        self.last = now
+        self.pending = None
+        Observable.fire(event)
+
+    def update(self, event):
+        """Fire the event if allowed, otherwise keep it (replacing an older one) till the interval ends."""
+        with self.lock:
+            now = time.monotonic()
+            if self._due(now):
+                self._fire(now, event)
+            else:
+                self.pending = event
+                self.flusher.schedule(self, self.last + self.interval)
+
+    def expired(self):
+        """Interval ended - fire the pending event (if still there)."""
+        self.flush()
+
+    def flush(self, force=False):
+        """Fire the pending event if its time has come (or forced)."""
+        with self.lock:
+            if self.pending is not None:
+                now = time.monotonic()
+                if force or self._due(now):
+                    self._fire(now, self.pending)
+
+
 class Informer(chess.uci.InfoHandler):
 
     """Internal uci engine info handler."""
 
-    def __init__(self):
+    def __init__(self, interval=None):
         super(Informer, self).__init__()
-        self.allow_score = True
-        self.allow_pv = True
-        self.allow_depth = True
+        if interval is None:
+            interval = utilities.info_interval
+        self.score_throttle = Throttle(interval)
+        self.pv_throttle = Throttle(interval)
+        self.depth_throttle = Throttle(interval)
+        self.lines_throttle = Throttle(interval)
+        self.throttles = (self.depth_throttle, self.score_throttle, self.pv_throttle, self.lines_throttle)
+        self.lines = {}  # multipv index => latest line of this index
+        self.line_started = False  # the current info line already changed its line (score & pv come in one)
+        self.search_key = None  # eval cache key of the searched position (incl. engine & level)
 
     def on_go(self):
         """Engine sends GO."""
-        self.allow_score = True
-        self.allow_pv = True
-        self.allow_depth = True
+        for throttle in self.throttles:
+            throttle.reset()
+        self.lines = {}
         Observable.fire(Event.START_SEARCH())
+        self._show_cached()
         super().on_go()
 
+    def _show_cached(self):
+        """Show the evaluation of an already searched position at once - till the engine sends its own values."""
+        entry = eval_cache.get(self.search_key) if self.search_key else None
+        if entry and (entry['score'] is not None or entry['mate'] is not None):
+            logging.debug('eval cache hit depth %i for %s', entry['depth'], self.search_key)
+            self.depth_throttle.update(Event.NEW_DEPTH(depth=entry['depth']))
+            self.score_throttle.update(Event.NEW_SCORE(score=entry['score'], mate=entry['mate']))
+            self.pv_throttle.update(Event.NEW_PV(pv=[chess.Move.from_uci(move) for move in entry['pv']]))
+
     def on_bestmove(self, bestmove, ponder):
+        with self.lock:
+            if len(self.lines) > 1:
+                self.lines_throttle.update(self._lines_event())
+            for throttle in self.throttles:  # the final values
+                throttle.flush(force=True)
         Observable.fire(Event.STOP_SEARCH())
         super().on_bestmove(bestmove, ponder)
 
-    def _reset_allow_score(self):
-        self.allow_score = True
-
-    def _reset_allow_pv(self):
-        self.allow_pv = True
-
-    def _reset_allow_depth(self):
-        self.allow_depth = True
-
-    def _allow_fire_score(self):
-        if self.allow_score:
-            self.allow_score = False
-            Timer(0.5, self._reset_allow_score).start()
-            return True
-        else:
-            return False
-
-    def _allow_fire_pv(self):
-        if self.allow_pv:
-            self.allow_pv = False
-            Timer(0.5, self._reset_allow_pv).start()
-            return True
-        else:
-            return False
-
-    def _allow_fire_depth(self):
-        if self.allow_depth:
-            self.allow_depth = False
-            Timer(0.5, self._reset_allow_depth).start()
-            return True
-        else:
-            return False
+    def _get_line(self):
+        """Return the line of the current multipv index."""
+        index = self.info.get('multipv', 1)
+        if index == 1 and len(self.lines) > 1 and not self.line_started:
+            # a new first line means the engine finished reporting all others => snapshot before it gets changed
+            self.lines_throttle.update(self._lines_event())
+        self.line_started = True
+        if index not in self.lines:
+            self.lines[index] = {'multipv': index, 'score': None, 'mate': None, 'depth': None, 'pv': []}
+        return self.lines[index]
+
+    def _lines_event(self):
+        """Return a snapshot event of all lines."""
+        lines = [dict(self.lines[index]) for index in sorted(self.lines) if self.lines[index]['pv']]
+        return Event.NEW_MULTIPV(lines=lines)
 
     def score(self, cp, mate, lowerbound, upperbound):
         """Engine sends SCORE."""
-        if self._allow_fire_score():
-            Observable.fire(Event.NEW_SCORE(score=cp, mate=mate))
+        line = self._get_line()
+        line['score'], line['mate'], line['depth'] = cp, mate, self.info.get('depth')
+        if line['multipv'] == 1:
+            self.score_throttle.update(Event.NEW_SCORE(score=cp, mate=mate))
         super().score(cp, mate, lowerbound, upperbound)
 
     def pv(self, moves):
         """Call when engine sends PV."""
-        if self._allow_fire_pv() and moves:
-            Observable.fire(Event.NEW_PV(pv=moves))
+        line = self._get_line()
+        line['pv'] = moves
+        if line['multipv'] == 1 and moves:
+            self.pv_throttle.update(Event.NEW_PV(pv=moves))
         super().pv(moves)
 
     def depth(self, dep):
         """Engine sends DEPTH."""
-        if self._allow_fire_depth():
-            Observable.fire(Event.NEW_DEPTH(depth=dep))
+        self.depth_throttle.update(Event.NEW_DEPTH(depth=dep))
         super().depth(dep)
+
+    def post_info(self):
+        """Engine info line processed - send the held back values if already due."""
+        self.line_started = False
+        line = self.lines.get(1)
+        if self.search_key and line:
+            eval_cache.put(self.search_key, line['pv'], line['score'], line['mate'], line['depth'])
+        for throttle in self.throttles:
+            throttle.flush()
+        super().post_info()
@@ -0,0 +1,120 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import socket
+import threading
+
+import chess.uci
+
+BUFFER_SIZE = 65536
+
+
+def connect(address: str):
+    """Connect to an engine server - address is 'host:port' or the path of an unix socket."""
+    if address.startswith('/') or ':' not in address:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    else:
+        host, port = address.rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def read_text(address: str, path: str):
+    """Read a (text) file from the engine server."""
+    with connect(address) as sock:
+        sock.sendall('read {}\n'.format(path).encode('utf-8'))
+        reply = sock.makefile('rb')
+        status = reply.readline().decode('utf-8').strip()
+        if status != 'ok':
+            raise FileNotFoundError(path)
+        return reply.read().decode('utf-8')
+
+
+class SocketProcess(object):
+
+    """A python-chess engine process running on an engine server."""
+
+    def __init__(self, engine: chess.uci.Engine, address: str, file: str):
+        super(SocketProcess, self).__init__()
+        self.engine = engine
+        self.address = address
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._receiving_thread = threading.Thread(target=self._receiving_thread_target)
+        self._receiving_thread.daemon = True
+
+        self.engine.on_process_spawned(self)
+        self.sock = connect(address)
+        self.sock.sendall('engine {}\n'.format(file).encode('utf-8'))
+        self._receiving_thread.start()
+
+    def _receiving_thread_target(self):
+        buffer = b''
+        while True:
+            try:
+                data = self.sock.recv(BUFFER_SIZE)
+            except OSError:
+                data = b''
+            if not data:
+                break
+            lines = (buffer + data).split(b'\n')  # the server sends all available lines at once
+            buffer = lines.pop()
+            for line in lines:
+                self.engine.on_line_received(line.decode('utf-8').rstrip())
+        self._closed.set()
+        self.sock.close()
+        self.engine.on_terminated()
+
+    def is_alive(self):
+        return not self._closed.is_set()
+
+    def terminate(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # the server stops the engine once the connection is gone
+        except OSError:
+            pass
+
+    def kill(self):
+        self.terminate()
+
+    def send_line(self, string):
+        try:
+            with self._send_lock:
+                self.sock.sendall((string + '\n').encode('utf-8'))
+        except OSError:
+            logging.warning('engine server [%s] connection lost', self.address)
+            self.terminate()
+
+    def wait_for_return_code(self):
+        self._closed.wait()
+        return 0
+
+    def pid(self):
+        return None
+
+    def __repr__(self):
+        return '<SocketProcess at {0} ({1})>'.format(hex(id(self)), self.address)
+
+
+def socket_spawn_engine(address: str, file: str, engine_cls=chess.uci.Engine):
+    """Start the engine file on the engine server."""
+    engine = engine_cls()
+    SocketProcess(engine, address, file)
+    return engine
@@ -0,0 +1,76 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+from collections import OrderedDict
+
+from uci.engine import UciEngine
+
+
+class EnginePool(object):
+
+    """Keep recently used (local) engines alive and idle, so switching back to them is nearly instant."""
+
+    def __init__(self, memory_budget: int):
+        super(EnginePool, self).__init__()
+        self.memory_budget = memory_budget * 1024 * 1024  # given in MB
+        self.engines = OrderedDict()  # file => idle engine, the least recently used first
+
+    @staticmethod
+    def _get_memory(engine: UciEngine):
+        """Return the resident memory (in bytes) of the engine process."""
+        try:
+            pid = engine.engine.process.process.pid
+            with open('/proc/{}/statm'.format(pid)) as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, OSError, ValueError, IndexError):
+            return 0
+
+    def _evict(self):
+        total = 0
+        for file, engine in reversed(list(self.engines.items())):  # keep the most recently used ones
+            total += self._get_memory(engine)
+            if total > self.memory_budget:
+                logging.debug('engine pool over budget => quit engine [%s]', file)
+                del self.engines[file]
+                if not engine.quit():
+                    logging.error('engine shutdown failure')
+
+    def release(self, engine: UciEngine):
+        """Park the (stopped) engine - or quit it in case it cant be pooled. Return False on a shutdown failure."""
+        if not self.memory_budget or engine.is_remote() or not engine.is_waiting():
+            return engine.quit()
+        file = engine.get_file()
+        old_engine = self.engines.pop(file, None)
+        if old_engine and old_engine is not engine:
+            old_engine.quit()
+        self.engines[file] = engine
+        logging.debug('engine [%s] parked in pool', file)
+        self._evict()
+        return True
+
+    def acquire(self, file: str):
+        """Return the parked engine (with reset options) for this file or None."""
+        engine = self.engines.pop(file, None)
+        if engine:
+            if engine.engine.is_alive():
+                logging.debug('engine [%s] taken from pool', file)
+                engine.reset_options()
+                return engine
+            logging.warning('pooled engine [%s] died', file)
+        return None
@@ -19,25 +19,26 @@ import platform
 import configparser
 import os
 from dgt.api import Dgt
+from uci.cache import engine_cache
+from uci.remote import ssh_pool
+from uci.net import read_text
 
 
-def read_engine_ini(engine_shell=None, engine_path=None):
-    """Read engine.ini and creates a library list out of it."""
+def _parse_engine_ini(engine_shell, engine_path: str, engine_server=None):
+    """Parse engine.ini and the engine level files into (json-able) dicts."""
     config = configparser.ConfigParser()
     config.optionxform = str
     try:
-        if engine_shell is None:
-            if not engine_path:
-                program_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-                engine_path = program_path + os.sep + 'engines' + os.sep + platform.machine()
+        if engine_server:
+            config.read_string(read_text(engine_server, engine_path + os.sep + 'engines.ini'))
+        elif engine_shell is None:
             config.read(engine_path + os.sep + 'engines.ini')
         else:
-            with engine_shell.open(engine_path + os.sep + 'engines.ini', 'r') as file:
-                config.read_file(file)
+            config.read_string(ssh_pool.read_text(engine_shell, engine_path + os.sep + 'engines.ini'))
     except FileNotFoundError:
         pass
 
-    library = []
+    sections = []
     for section in config.sections():
         parser = configparser.ConfigParser()
         parser.optionxform = str
@@ -47,13 +48,36 @@ def read_engine_ini(engine_shell=None, engine_path=None):
                 level_dict[p_section] = {}
                 for option in parser.options(p_section):
                     level_dict[p_section][option] = parser[p_section][option]
-        confsect = config[section]
+        sections.append({'section': section, 'config': dict(config[section]), 'level_dict': level_dict})
+    return sections
+
+
+def read_engine_ini(engine_shell=None, engine_path=None, engine_server=None):
+    """Read engine.ini and creates a library list out of it."""
+    if not engine_path:
+        program_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+        engine_path = program_path + os.sep + 'engines' + os.sep + platform.machine()
+
+    if engine_shell is None and engine_server is None:  # only local files can be checked (cheaply) for changes
+        key = 'ini:' + engine_path
+        sections = engine_cache.get(key)
+        if sections is None:
+            sections = _parse_engine_ini(engine_shell, engine_path)
+            paths = [engine_path + os.sep + 'engines.ini']
+            paths.extend(engine_path + os.sep + sect['section'] + '.uci' for sect in sections)
+            engine_cache.put(key, sections, paths)
+    else:
+        sections = _parse_engine_ini(engine_shell, engine_path, engine_server)
+
+    library = []
+    for sect in sections:
+        confsect = sect['config']
         text = Dgt.DISPLAY_TEXT(l=confsect['large'], m=confsect['medium'], s=confsect['small'], wait=True, beep=False,
                                 maxtime=0, devs={'ser', 'i2c', 'web'})
         library.append(
             {
-                'file': engine_path + os.sep + section,
-                'level_dict': level_dict,
+                'file': engine_path + os.sep + sect['section'],
+                'level_dict': sect['level_dict'],
                 'text': text,
                 'name': confsect['name'],
                 'elo': confsect['elo']
@@ -0,0 +1,147 @@
+# Copyright (C) 2013-2017 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import time
+import queue
+from threading import Lock, Thread, Event
+
+import spur
+import paramiko
+
+
+class SshPool(object):
+
+    """One shared ssh connection per remote server - for the engine processes and the file reads."""
+
+    KEEPALIVE = 15  # secs between the keepalive packets (keeps NAT/firewalls open & finds dead links)
+    ROUND_TRIP_TIMEOUT = 5.0  # secs to wait for the answer of a keepalive request - a link without is dead
+
+    def __init__(self):
+        super(SshPool, self).__init__()
+        self.shells = {}  # (hostname, username) => connected spur shell
+        self.sftps = {}  # shell => its sftp client (spur opens a new one per file)
+        self.round_trips = {}  # hostname => last measured round trip in ms
+        self.lock = Lock()
+        self.requests = queue.Queue()  # (transport, answered event) for the keepalive checker
+        self.checker = None
+
+    @staticmethod
+    def _transport(shell: spur.SshShell):
+        """Return the paramiko transport of the shell (connects if needed)."""
+        return shell._get_ssh_transport()  # spur has no public api for it
+
+    def _connect(self, hostname: str, username: str, key_file: str, password: str):
+        logging.info('connecting to [%s]', hostname)
+        if key_file:
+            shell = spur.SshShell(hostname=hostname, username=username, private_key_file=key_file,
+                                  missing_host_key=paramiko.AutoAddPolicy())
+        else:
+            shell = spur.SshShell(hostname=hostname, username=username, password=password,
+                                  missing_host_key=paramiko.AutoAddPolicy())
+        self._transport(shell).set_keepalive(self.KEEPALIVE)
+        return shell
+
+    def is_alive(self, shell: spur.SshShell):
+        """Return True if the connection of the shell is still up."""
+        try:
+            return self._transport(shell).is_active()
+        except (spur.ssh.ConnectionError, EOFError, OSError, paramiko.SSHException):
+            return False
+
+    def get(self, hostname: str, username=None, key_file=None, password=None):
+        """Return the (connected) shell for this server - reusing a living connection."""
+        key = (hostname, username)
+        with self.lock:
+            shell = self.shells.get(key)
+            if shell is None or not self.is_alive(shell):
+                if shell is not None:
+                    logging.warning('connection to [%s] lost - reconnecting', hostname)
+                    self._close(shell)
+                shell = self.shells[key] = self._connect(hostname, username, key_file, password)
+            return shell
+
+    @staticmethod
+    def _close(shell: spur.SshShell):
+        try:
+            shell.close()
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+
+    def drop(self, shell: spur.SshShell):
+        """Close a (broken) connection - the next get() connects again."""
+        with self.lock:
+            for key, pooled in list(self.shells.items()):
+                if pooled is shell:
+                    del self.shells[key]
+            self.sftps.pop(shell, None)
+        self._close(shell)
+
+    def read_text(self, shell: spur.SshShell, path: str):
+        """Read a remote (text) file over the sftp channel of the shared connection."""
+        with self.lock:
+            sftp = self.sftps.get(shell)
+            if sftp is None:
+                sftp = self.sftps[shell] = self._transport(shell).open_sftp_client()
+        with sftp.open(path, 'rb') as remote_file:
+            return remote_file.read().decode('utf-8')
+
+    def round_trip(self, shell: spur.SshShell):
+        """Measure the round trip time (in ms) of the connection or None if the link is down (or no answer)."""
+        try:
+            transport = self._transport(shell)
+        except (spur.ssh.ConnectionError, EOFError, OSError, paramiko.SSHException):
+            return None
+        answered = Event()
+        with self.lock:
+            if self.checker is None:
+                self.checker = Thread(target=self._check_forever, name='ssh_checker', daemon=True)
+                self.checker.start()
+        # paramiko has no timeout for this request - a dead link would block the caller forever
+        start = time.monotonic()
+        self.requests.put((transport, answered))
+        if not answered.wait(self.ROUND_TRIP_TIMEOUT):
+            return None
+        msecs = (time.monotonic() - start) * 1000
+        return msecs if transport.is_active() else None
+
+    def _check_forever(self):
+        """Send the keepalive requests - one stuck on a dead link ends once check() closed its transport."""
+        while True:
+            transport, answered = self.requests.get()
+            try:
+                transport.global_request('keepalive@openssh.com', wait=True)  # the server answers even if unknown
+            except (EOFError, OSError, paramiko.SSHException):
+                continue
+            answered.set()
+
+    def check(self):
+        """Log the round trip of all connections and drop the dead ones."""
+        with self.lock:
+            shells = list(self.shells.items())
+        for (hostname, _), shell in shells:
+            msecs = self.round_trip(shell)
+            if msecs is None:
+                logging.warning('connection to [%s] is down', hostname)
+                self.round_trips.pop(hostname, None)
+                self.drop(shell)
+            else:
+                logging.info('round trip to [%s]: %.1fms', hostname, msecs)
+                self.round_trips[hostname] = msecs
+
+
+ssh_pool = SshPool()
@@ -24,13 +24,19 @@ import socket
 import json
 import time
 import copy
+import random
 import configparser
+import asyncio
 
-from threading import Timer
+from threading import Timer, Thread, Event, Condition, current_thread
 from subprocess import Popen, PIPE
 
 from dgt.translate import DgtTranslate
 from dgt.api import Dgt
+from dgt.util import GameResult
+
+import chess
+import chess.polyglot
 
 from configobj import ConfigObj, ConfigObjError, DuplicateError
 
@@ -43,6 +49,90 @@ dispatch_queue = queue.Queue()
 msgdisplay_devices = []
 dgtdisplay_devices = []
 
+# share one frozen message instance between all consumers instead of deep copying it for each of them
+shared_messages = False
+
+# minimal time (secs) between two updates of the same engine info (score, pv, depth, lines) on the displays
+info_interval = 0.5
+
+# the asyncio loop (shared with tornado) in case of "asyncio" runtime - otherwise each consumer runs an own thread
+runtime_loop = None
+runtime_thread = None
+
+
+def start_runtime_loop():
+    """Create the asyncio loop, let tornado share it and run it inside one thread."""
+    global runtime_loop, runtime_thread
+    from tornado.platform.asyncio import AsyncIOMainLoop
+
+    runtime_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(runtime_loop)
+    AsyncIOMainLoop().install()  # from now on IOLoop.instance() runs inside runtime_loop
+    runtime_thread = Thread(target=runtime_loop.run_forever, name='runtime_loop')
+    runtime_thread.start()
+    logging.debug('asyncio runtime loop started')
+
+
+class LoopTimer(object):
+
+    """A threading.Timer replacement which calls the function inside the runtime loop (or its executor)."""
+
+    def __init__(self, interval, function, args=None, kwargs=None, blocking=False):
+        self.interval = interval
+        self.function = function
+        self.args = args if args is not None else []
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.blocking = blocking  # a function doing (disk, network) io mustnt stall the loop => run it in a thread
+        self._handle = None
+        self._cancelled = False
+        self._started = False
+        self._finished = Event()
+
+    def _schedule(self):
+        if not self._cancelled:
+            self._handle = runtime_loop.call_later(self.interval, self._run)
+
+    def _call(self):
+        try:
+            self.function(*self.args, **self.kwargs)
+        finally:
+            self._finished.set()
+
+    def _run(self):
+        if self._cancelled:
+            return
+        self._started = True
+        if self.blocking:
+            runtime_loop.run_in_executor(None, self._call)
+        else:
+            self._call()
+
+    def start(self):
+        """Start the timer."""
+        runtime_loop.call_soon_threadsafe(self._schedule)
+
+    def cancel(self):
+        """Stop the timer, if its function isnt called yet."""
+        self._cancelled = True
+        if self._handle:
+            runtime_loop.call_soon_threadsafe(self._handle.cancel)
+
+    def is_alive(self):
+        """Return True until the function has been called or the timer got cancelled."""
+        return not self._finished.is_set() and not (self._cancelled and not self._started)
+
+    def join(self, timeout=None):
+        """Wait for a running function - same as the Thread.join() of a threading.Timer."""
+        if self._started and current_thread() is not runtime_thread:
+            self._finished.wait(timeout)
+
+
+def create_timer(interval, function, args=None, kwargs=None, blocking=False):
+    """Return a LoopTimer in asyncio runtime - otherwise a threading.Timer. Set blocking for functions doing io."""
+    if runtime_loop:
+        return LoopTimer(interval, function, args, kwargs, blocking)
+    return Timer(interval, function, args, kwargs)
+
 
 class Observable(object):
 
@@ -54,7 +144,7 @@ class Observable(object):
     @staticmethod
     def fire(event):
         """Put an event on the Queue."""
-        evt_queue.put(copy.deepcopy(event))
+        evt_queue.put(event.freeze() if shared_messages else copy.deepcopy(event))
 
 
 class DispatchDgt(object):
@@ -67,49 +157,120 @@ class DispatchDgt(object):
     @staticmethod
     def fire(dgt):
         """Put an event on the Queue."""
-        dispatch_queue.put(copy.deepcopy(dgt))
+        # the dgt fields are immutable values, only "devs" gets replaced later on => a shallow copy is enough
+        dispatch_queue.put(copy.copy(dgt) if shared_messages else copy.deepcopy(dgt))
 
 
 class DisplayMsg(object):
 
     """Display devices (DGT XL clock, Piface LCD, pgn file...)."""
 
+    runs_on_loop = False  # True for displays which never block, so they can run inside the asyncio runtime
+
     def __init__(self):
         super(DisplayMsg, self).__init__()
         self.msg_queue = queue.Queue()
+        self.msg_loop = None
         msgdisplay_devices.append(self)
 
+    def start(self):
+        """Start the display - as callbacks inside the runtime loop or as an own thread."""
+        if runtime_loop and self.runs_on_loop:
+            logging.info('msg_queue ready (runtime loop)')
+            self.msg_loop = runtime_loop
+        else:
+            super(DisplayMsg, self).start()
+
     @staticmethod
     def show(message):
         """Send a message on each display device."""
+        if shared_messages:
+            message.freeze()
         for display in msgdisplay_devices:
-            display.msg_queue.put(copy.deepcopy(message))
+            msg = message if shared_messages else copy.deepcopy(message)
+            if display.msg_loop:
+                display.msg_loop.call_soon_threadsafe(display._process_message, msg)
+            else:
+                display.msg_queue.put(msg)
 
 
 class DisplayDgt(object):
 
     """Display devices (DGT XL clock, Piface LCD, pgn file...)."""
 
+    runs_on_loop = False  # True for displays which never block, so they can run inside the asyncio runtime
+
     def __init__(self):
         super(DisplayDgt, self).__init__()
         self.dgt_queue = queue.Queue()
+        self.dgt_loop = None
         dgtdisplay_devices.append(self)
 
+    def start(self):
+        """Start the display - as callbacks inside the runtime loop or as an own thread."""
+        if runtime_loop and self.runs_on_loop:
+            logging.info('dgt_queue ready (runtime loop)')
+            self.dgt_loop = runtime_loop
+        else:
+            super(DisplayDgt, self).start()
+
     @staticmethod
     def show(message):
         """Send a message on each display device."""
         for display in dgtdisplay_devices:
-            display.dgt_queue.put(copy.deepcopy(message))
+            msg = message if shared_messages else copy.deepcopy(message)
+            if display.dgt_loop:
+                display.dgt_loop.call_soon_threadsafe(display._create_task, msg)
+            else:
+                display.dgt_queue.put(msg)
+
+
+class ClockAck(object):
+
+    """Let the main loop wait until the clock devices really processed a start/stop command."""
+
+    TIMEOUT = 1.0  # the serial clock normally acks after 0.1-0.3secs
+
+    condition = Condition()
+    pending = set()
+    round = 0  # id of the current command round - the command carries it, so late acks of older rounds dont count
+
+    @classmethod
+    def expect(cls, devs: set):
+        """Start a new command round for these devices - call it before sending the command. Returns the round id."""
+        with cls.condition:
+            cls.round += 1
+            cls.pending = set(devs)
+            return cls.round
+
+    @classmethod
+    def done(cls, dev: str, ack):
+        """Mark the command (of round ack) as done for this device."""
+        with cls.condition:
+            if ack != cls.round:
+                logging.debug('(%s) clock ack of round %s ignored - waiting for round %i', dev, ack, cls.round)
+                return
+            if dev in cls.pending:
+                cls.pending.discard(dev)
+                if not cls.pending:
+                    cls.condition.notify_all()
+
+    @classmethod
+    def wait(cls, timeout=TIMEOUT):
+        """Wait till all devices acked or timeout. Returns False in case of a timeout."""
+        with cls.condition:
+            return cls.condition.wait_for(lambda: not cls.pending, timeout)
 
 
 class RepeatedTimer(object):
 
     """Call function on a given interval."""
 
-    def __init__(self, interval, function, *args, **kwargs):
+    def __init__(self, interval, function, *args, blocking=False, **kwargs):
         self._timer = None
         self.interval = interval
         self.function = function
+        self.blocking = blocking  # see create_timer()
         self.args = args
         self.kwargs = kwargs
         self.timer_running = False
@@ -126,7 +287,7 @@ class RepeatedTimer(object):
     def start(self):
         """Start the RepeatedTimer."""
         if not self.timer_running:
-            self._timer = Timer(self.interval, self._run)
+            self._timer = create_timer(self.interval, self._run, blocking=self.blocking)
             self._timer.start()
             self.timer_running = True
         else:
@@ -141,6 +302,217 @@ class RepeatedTimer(object):
             logging.info('repeated timer already stopped - strange!')
 
 
+class LegalFens(object):
+
+    """A (lazy) index of all positions reachable by one legal move: board fen => move."""
+
+    def __init__(self, game=None):
+        self._game = game  # a private copy - the index is build on first lookup
+        self._index = {} if game is None else None
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = {}
+            for move in self._game.legal_moves:
+                self._game.push(move)
+                self._index[self._game.board_fen()] = move
+                self._game.pop()
+            self._game = None
+        return self._index
+
+    def __contains__(self, fen: str):
+        return fen in self._get_index()
+
+    def __getitem__(self, fen: str):
+        return self._get_index()[fen]
+
+    def __len__(self):
+        return len(self._get_index())
+
+
+class ReachableFens(object):
+
+    """
+    A (lazy) index of the positions reachable by 2..plies legal moves: board fen => move list.
+
+    With the computer move as first_move, 3 plies cover the user reply plus one more move done quickly
+    (e.g. a capture executed in the wrong order after the computer move). Without (analysis modes) the
+    search only goes as deep as max_nodes allows - a ply is skipped if its estimated size doesnt fit.
+    """
+
+    def __init__(self, game, plies=3, first_move=None, max_nodes=3000):
+        self.key = (game.fen(), first_move)
+        self._game = game  # a private copy - the index is build on first lookup
+        self._plies = plies
+        self._first_move = first_move
+        self._max_nodes = max_nodes
+        self._index = None
+
+    def _build(self):
+        """Search breadth first, so the shortest move list for a position is kept."""
+        nodes = 0
+        branching = 0
+        frontier = [[]]
+        for ply in range(self._plies):
+            if nodes + len(frontier) * branching > self._max_nodes:
+                logging.debug('reachable fens stopped before ply %i after %i positions', ply + 1, nodes)
+                return
+            next_frontier = []
+            for moves in frontier:
+                for move in moves:
+                    self._game.push(move)
+                next_moves = [self._first_move] if not moves and self._first_move else list(self._game.legal_moves)
+                for move in next_moves:
+                    self._game.push(move)
+                    if moves:
+                        self._index.setdefault(self._game.board_fen(), moves + [move])
+                    self._game.pop()
+                    next_frontier.append(moves + [move])
+                for _ in moves:
+                    self._game.pop()
+            nodes += len(next_frontier)
+            branching = len(next_frontier) / len(frontier)
+            frontier = next_frontier
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = {}
+            self._build()
+            self._game = None
+            logging.debug('reachable fens computed: %i positions', len(self._index))
+        return self._index
+
+    def __contains__(self, fen: str):
+        return fen in self._get_index()
+
+    def __getitem__(self, fen: str):
+        return self._get_index()[fen]
+
+
+class GameEndTracker(object):
+
+    """Check for the game end with one move generation - the positions are tracked incrementally."""
+
+    def __init__(self):
+        self._moves = []  # the move stack the keys belong to
+        self._keys = []  # transposition key after each ply (index 0: the root position)
+
+    def _rebuild(self, game):
+        board = game.copy()
+        keys = [board._transposition_key()]
+        while board.move_stack:
+            board.pop()
+            keys.append(board._transposition_key())
+        keys.reverse()
+        self._keys = keys
+        self._moves = list(game.move_stack)
+
+    def _sync(self, game):
+        stack = game.move_stack
+        plies = len(stack)
+        tracked = len(self._moves)
+        key = game._transposition_key()
+        if self._keys and plies <= tracked + 1:
+            known = min(plies, tracked)
+            if known == 0 or stack[known - 1] == self._moves[known - 1]:
+                del self._moves[known:]
+                del self._keys[known + 1:]
+                if plies > known:  # one new ply pushed
+                    self._moves.append(stack[-1])
+                    self._keys.append(key)
+                if self._keys[-1] == key:
+                    return
+        logging.debug('game end tracker rebuild - plies: %i tracked: %i', plies, tracked)
+        self._rebuild(game)
+
+    def _is_fivefold_repetition(self):
+        if len(self._moves) < 16:
+            return False
+        key = self._keys[-1]
+        return all(self._keys[-1 - back] == key for back in (4, 8, 12, 16))
+
+    def result(self, game):
+        """Return the GameResult or None if the game continues."""
+        self._sync(game)
+        has_moves = any(game.generate_legal_moves())
+        in_check = game.is_check()
+
+        result = None
+        if not has_moves and not in_check:
+            result = GameResult.STALEMATE
+        if game.is_insufficient_material():
+            result = GameResult.INSUFFICIENT_MATERIAL
+        if has_moves and game.halfmove_clock >= 150:
+            result = GameResult.SEVENTYFIVE_MOVES
+        if self._is_fivefold_repetition():
+            result = GameResult.FIVEFOLD_REPETITION
+        if not has_moves and in_check:
+            result = GameResult.MATE
+        return result
+
+
+class BookPrefetch(object):
+
+    """Book entries of the positions after each legal user move (and after their book replies) - read in background."""
+
+    def __init__(self):
+        self._reader = None
+        self._entries = {}  # zobrist hash => list of book entries, an empty list for "out of book"
+
+    def start(self, bookreader, game):
+        """Read the book replies for all legal moves of the game position in a background thread."""
+        entries = {}
+        self._reader = bookreader
+        self._entries = entries  # a still running thread stops as soon it notices its dict is outdated
+        thread = Thread(target=self._prefetch, args=(bookreader, game.copy(), entries))
+        thread.daemon = True
+        thread.start()
+
+    def reset(self):
+        """Forget all prefetched entries (for example after the book has changed)."""
+        self._reader = None
+        self._entries = {}
+
+    def _read(self, bookreader, board, entries: dict):
+        key = chess.polyglot.zobrist_hash(board)
+        if key not in entries:
+            entries[key] = list(bookreader.find_all(board))
+        return entries[key]
+
+    def _prefetch(self, bookreader, board, entries: dict):
+        start = time.monotonic()
+        try:
+            for move in list(board.legal_moves):
+                if self._entries is not entries:
+                    return
+                board.push(move)
+                for entry in self._read(bookreader, board, entries):
+                    board.push(entry.move(chess960=board.chess960))
+                    self._read(bookreader, board, entries)  # the ponder move
+                    board.pop()
+                board.pop()
+        except (ValueError, OSError):  # the book got closed meanwhile
+            return
+        logging.debug('book prefetch done: %i positions in %.0fms', len(entries), (time.monotonic() - start) * 1000)
+
+    def weighted_choice(self, bookreader, board, exclude_moves=()):
+        """Same as bookreader.weighted_choice() - but served from memory in case the position was prefetched."""
+        entries = self._entries.get(chess.polyglot.zobrist_hash(board)) if bookreader is self._reader else None
+        if entries is None:
+            return bookreader.weighted_choice(board, exclude_moves)
+        if exclude_moves:
+            entries = [entry for entry in entries if entry.move(chess960=board.chess960) not in exclude_moves]
+        total_weights = sum(entry.weight for entry in entries)
+        if not total_weights:
+            raise IndexError()
+        choice = random.randint(0, total_weights - 1)
+        current_sum = 0
+        for entry in entries:
+            current_sum += entry.weight
+            if current_sum > choice:
+                return entry
+
+
 def get_opening_books():
     """Build an opening book lib."""
     config = configparser.ConfigParser()
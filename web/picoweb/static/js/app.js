@@ -1381,6 +1381,21 @@ function formatEngineOutput(line) {
     }
 }
 
+function updateMultiPv(data) {
+    if (window.analysis || !currentPosition || currentPosition.fen !== data.fen) {
+        return;  // the browser engine runs or the lines belong to an old position
+    }
+    for (var i = 0; i < data.lines.length; i++) {
+        var line = data.lines[i];
+        var score = line.mate === null ? 'cp ' + line.score : 'mate ' + line.mate;
+        var output = formatEngineOutput('info depth ' + line.depth + ' multipv ' + line.multipv + ' score ' + score + ' pv ' + line.pv.join(' '));
+        if ($('#pv_' + line.multipv).length === 0) {
+            $('#pv_output').append('<div id="pv_' + line.multipv + '" style="margin-bottom: 3vh;"></div>');
+        }
+        $('#pv_' + line.multipv).html(output.line);
+    }
+}
+
 function multiPvIncrease() {
     if (window.stockfish) {
         window.multipv += 1;
@@ -1777,6 +1792,9 @@ $(function() {
                 case 'Broadcast':
                     boardStatusEl.html(data.msg);
                     break;
+                case 'MultiPV':
+                    updateMultiPv(data);
+                    break;
                 default:
                     console.warn(data);
             }